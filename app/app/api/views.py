@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 
 from app import task
 
@@ -10,14 +10,55 @@ api = Blueprint("api", __name__, url_prefix="/api")
 @api.route("/monitor", methods=["GET"])
 def strat_status():
     strat_id = request.args["strat_id"]
-    queue_name = request.args.get("queue_name")
 
-    current_app.logger.info(f"Fetching strat {strat_id} from {queue_name} queue")
-    data = task.get_job_data(strat_id, queue_name)
+    current_app.logger.info(f"Fetching strat {strat_id}")
+    data = task.get_job_data(strat_id)
 
     return jsonify(strat_info=data)
 
 
+@api.route("/stream", methods=["GET"])
+def stream_status():
+    """Streams the progress of one or many strategies as server-sent events
+
+    Strategies are passed as repeated strat_id params or as a comma separated list
+    """
+    strat_ids = []
+    for arg in request.args.getlist("strat_id"):
+        strat_ids.extend(i for i in arg.split(",") if i)
+
+    if not strat_ids:
+        return jsonify(error="strat_id is required"), 400
+
+    current_app.logger.info(f"Streaming progress of {len(strat_ids)} strats")
+    return Response(
+        stream_with_context(task.stream_progress(strat_ids)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.route("/leaderboard", methods=["GET"])
+def leaderboard():
+    """Ranks finished strategies by a metric
+
+    Query params: sort, order (asc or desc), page, per_page,
+    and asset, exchange, data_freq or mode filters
+    """
+    filters = {k: request.args.get(k) for k in ["asset", "exchange", "data_freq", "mode"]}
+    try:
+        data = task.leaderboard(
+            sort=request.args.get("sort", "net_profit_pct"),
+            descending=request.args.get("order", "desc") != "asc",
+            page=request.args.get("page", 1, type=int),
+            per_page=min(request.args.get("per_page", 20, type=int), 100),
+            **filters,
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(data)
+
+
 @api.route("/strat", methods=["POST"])
 def run_strat():
     data = request.json
@@ -40,6 +81,34 @@ def run_strat():
     return jsonify(strat_id=job_id)
 
 
+@api.route("/strat/bulk", methods=["POST"])
+def run_strats():
+    """Queues many strategies in one request
+
+    Takes a strat_jsons list, or a strat_json template and a grid of
+    dotted config paths to lists of values, one strategy per combination
+    """
+    data = request.json
+    queue_name = data.get("queue_name")
+    user_id = data.get("user_id")
+
+    live = queue_name in ["paper", "live"]
+    simulate_orders = queue_name != "live"
+
+    try:
+        strat_jsons = task.bulk_strat_jsons(
+            data.get("strat_jsons"), data.get("strat_json"), data.get("grid")
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    current_app.logger.info(f"Enqueuing {len(strat_jsons)} strats to {queue_name} queue")
+    queued = task.queue_strats(
+        strat_jsons, user_id=user_id, live=live, simulate_orders=simulate_orders
+    )
+    return jsonify(strat_ids=[strat_id for strat_id, _ in queued])
+
+
 @api.route("/strat/delete", methods=["POST"])
 def delete_strat():
     data = request.json
@@ -10,7 +10,7 @@ import rq_dashboard
 
 from app import api, bot, models, task
 from app.web import account, strategy, public
-from app.extensions import cors, db, migrate, sentry
+from app.extensions import cors, db, migrate, sentry, metadata
 from app.settings import DockerDevConfig, ProdConfig
 
 
@@ -74,6 +74,7 @@ def register_extensions(app):
     cors.init_app(app, resources={r"*": {"origins": "*"}})
     db.init_app(app)
     migrate.init_app(app, db, directory=app.config["MIGRATIONS_DIR"])
+    metadata.init_app(app)
 
     # Setup Flask-User and specify the User data-model
     UserManager(app, db, models.User)
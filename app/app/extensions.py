@@ -5,8 +5,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from raven.contrib.flask import Sentry
 
+from app.utils.metadata import MetadataService
+
 
 cors = CORS()
 db = SQLAlchemy()
 migrate = Migrate()
-sentry = Sentry()
\ No newline at end of file
+sentry = Sentry()
+metadata = MetadataService()
@@ -1 +1 @@
-from .user import User, StrategyModel, UserExchangeAuth
+from .user import User, StrategyModel, StrategyMetrics, UserExchangeAuth
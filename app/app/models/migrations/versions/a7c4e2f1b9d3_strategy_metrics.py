@@ -0,0 +1,92 @@
+"""strategy metrics
+
+Revision ID: a7c4e2f1b9d3
+Revises: 4814369ad5cc
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c4e2f1b9d3'
+down_revision = '4814369ad5cc'
+branch_labels = None
+depends_on = None
+
+
+INDEXED = ['net_profit_pct', 'sharpe_ratio_avg', 'max_drawdown', 'number_of_trades',
+           'asset', 'exchange', 'data_freq', 'mode', 'updated_at']
+
+
+def _number(val, cast=float):
+    try:
+        return cast(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def _backfill():
+    """Fills the metrics of strategies finished before the table existed"""
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT id, result_json, trading_config FROM strategies WHERE result_json IS NOT NULL"
+    ))
+
+    metrics = []
+    for strat_id, result_json, trading in rows:
+        try:
+            result = json.loads(result_json) if isinstance(result_json, str) else result_json
+            if isinstance(result, str):
+                result = json.loads(result)
+        except ValueError:
+            continue
+        result = {k: v.get('Backtest') if isinstance(v, dict) else v for k, v in result.items()}
+        trading = trading or {}
+        metrics.append({
+            'strategy_id': strat_id,
+            'net_profit_pct': _number(result.get('net_profit_pct')),
+            'sharpe_ratio_avg': _number(result.get('sharpe_ratio_avg')),
+            'max_drawdown': _number(result.get('max_drawdown_pct_catalyst')),
+            'number_of_trades': _number(result.get('number_of_trades'), int),
+            'asset': trading.get('ASSET'),
+            'exchange': trading.get('EXCHANGE'),
+            'data_freq': trading.get('DATA_FREQ'),
+            'mode': None,
+        })
+
+    if metrics:
+        table = sa.table('strategy_metrics', *[sa.column(c) for c in metrics[0]])
+        op.bulk_insert(table, metrics)
+
+
+def upgrade():
+    op.create_table('strategy_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('strategy_id', sa.Integer(), nullable=False),
+    sa.Column('net_profit_pct', sa.Float(), nullable=True),
+    sa.Column('sharpe_ratio_avg', sa.Float(), nullable=True),
+    sa.Column('max_drawdown', sa.Float(), nullable=True),
+    sa.Column('number_of_trades', sa.Integer(), nullable=True),
+    sa.Column('asset', sa.String(), nullable=True),
+    sa.Column('exchange', sa.String(), nullable=True),
+    sa.Column('data_freq', sa.String(), nullable=True),
+    sa.Column('mode', sa.String(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['strategy_id'], ['strategies.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('strategy_id')
+    )
+    for column in INDEXED:
+        op.create_index(op.f('ix_strategy_metrics_{}'.format(column)), 'strategy_metrics', [column], unique=False)
+
+    _backfill()
+
+
+def downgrade():
+    for column in INDEXED:
+        op.drop_index(op.f('ix_strategy_metrics_{}'.format(column)), table_name='strategy_metrics')
+    op.drop_table('strategy_metrics')
@@ -67,6 +67,8 @@ class StrategyModel(db.Model):
 
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
 
+    metrics = db.relationship("StrategyMetrics", backref="strategy", uselist=False, lazy=True)
+
     @classmethod
     def from_json(cls, strat_json, user_id=None):
         d = json.loads(strat_json)
@@ -90,6 +92,7 @@ class StrategyModel(db.Model):
         if job.result:
             current_app.logger.debug(f"Strategy {self.id} job has finished")
             self.result_json = job.result
+            StrategyMetrics.update_from_strategy(self, mode=job.origin)
 
         db.session.commit()
 
@@ -108,21 +111,99 @@ class StrategyModel(db.Model):
     def parsed_result_json(self):
         if self.result_json is None:
             return {}
+        # parsed once per loaded result
+        cached = getattr(self, "_parsed_result", None)
+        if cached is not None and cached[0] is self.result_json:
+            return cached[1]
+
         d = json.loads(self.result_json)
         clean_result = {}
         for k, v in d.items():
             # nested dict with trading type as key
             metric, val = k, v.get("Backtest", v)
             clean_result[metric] = val
+        self._parsed_result = (self.result_json, clean_result)
         return clean_result
 
     def pretty_result(self):
         string = ""
         if self.result_json is None:
             return None
-        result_dict = json.loads(self.result_json)
-        for k, v in result_dict.items():
-            # nested dict with trading type as key
-            metric, val = k, v["Backtest"]
+        for metric, val in self.parsed_result_json.items():
             string += f"{metric}: {val}\n"
         return string
+
+
+class StrategyMetrics(db.Model):
+    __tablename__ = "strategy_metrics"
+
+    # typed copy of a finished strategy's summary, for sorting and filtering in SQL
+    SORTABLE = ["net_profit_pct", "sharpe_ratio_avg", "max_drawdown", "number_of_trades", "updated_at"]
+    FILTERABLE = ["asset", "exchange", "data_freq", "mode"]
+
+    id = db.Column(db.Integer, primary_key=True)
+    strategy_id = db.Column(db.Integer, db.ForeignKey("strategies.id"), nullable=False, unique=True)
+
+    net_profit_pct = db.Column(db.Float(), nullable=True, index=True)
+    sharpe_ratio_avg = db.Column(db.Float(), nullable=True, index=True)
+    max_drawdown = db.Column(db.Float(), nullable=True, index=True)
+    number_of_trades = db.Column(db.Integer(), nullable=True, index=True)
+
+    asset = db.Column(db.String(), nullable=True, index=True)
+    exchange = db.Column(db.String(), nullable=True, index=True)
+    data_freq = db.Column(db.String(), nullable=True, index=True)
+    mode = db.Column(db.String(), nullable=True, index=True)
+
+    updated_at = db.Column(db.DateTime(), default=datetime.datetime.utcnow, index=True)
+
+    @staticmethod
+    def _number(val, cast=float):
+        try:
+            return cast(val)
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def update_from_strategy(cls, strat, mode=None):
+        """Creates or updates the metrics of a finished strategy, committed with the strategy"""
+        result = strat.parsed_result_json
+        trading = strat.trading_config or {}
+
+        metrics = strat.metrics or cls(strategy=strat)
+        metrics.net_profit_pct = cls._number(result.get("net_profit_pct"))
+        metrics.sharpe_ratio_avg = cls._number(result.get("sharpe_ratio_avg"))
+        metrics.max_drawdown = cls._number(result.get("max_drawdown_pct_catalyst"))
+        metrics.number_of_trades = cls._number(result.get("number_of_trades"), int)
+        metrics.asset = result.get("asset") or trading.get("ASSET")
+        metrics.exchange = result.get("exchange") or trading.get("EXCHANGE")
+        metrics.data_freq = result.get("data_freq") or trading.get("DATA_FREQ")
+        metrics.mode = mode or metrics.mode
+        metrics.updated_at = datetime.datetime.utcnow()
+        db.session.add(metrics)
+        return metrics
+
+    @classmethod
+    def leaderboard(cls, sort="net_profit_pct", descending=True, page=1, per_page=20, **filters):
+        """Returns a page of strategies ranked by one metric
+
+        Keyword Arguments:
+            sort {str} -- one of SORTABLE (default: {"net_profit_pct"})
+            descending {bool} -- (default: {True})
+            **filters -- exact matches on FILTERABLE columns, None values are ignored
+
+        Returns:
+            flask_sqlalchemy.Pagination -- of (StrategyMetrics, StrategyModel) rows
+        """
+        if sort not in cls.SORTABLE:
+            raise ValueError(f"Can't sort by {sort}, use one of {cls.SORTABLE}")
+
+        query = db.session.query(cls, StrategyModel).join(StrategyModel, cls.strategy_id == StrategyModel.id)
+        for k, v in filters.items():
+            if k not in cls.FILTERABLE:
+                raise ValueError(f"Can't filter by {k}, use one of {cls.FILTERABLE}")
+            if v is not None:
+                query = query.filter(getattr(cls, k) == v)
+
+        column = getattr(cls, sort)
+        order = column.desc().nullslast() if descending else column.asc().nullslast()
+        return query.order_by(order, cls.id).paginate(page=page, per_page=per_page, error_out=False)
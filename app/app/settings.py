@@ -66,6 +66,9 @@ class Config(object):
     REDIS_HOST = os.getenv("REDIS_HOST")
     REDIS_PORT = os.getenv("REDIS_PORT")
 
+    # seconds before the cached exchange markets are refreshed, see app.utils.metadata
+    METADATA_MARKETS_TTL = 3600
+
 
 class ProdConfig(Config):
     """Production configuration."""
@@ -1,12 +1,18 @@
 import os
+import copy
+import time
+import hashlib
+import itertools
+from datetime import datetime
 from typing import Set
 import json
 import redis
 from rq import Queue
+from rq.job import Job
 from flask import current_app
 
-from app.models.user import StrategyModel, User
-from app.extensions import db
+from app.models.user import StrategyModel, StrategyMetrics, User
+from app.extensions import db, metadata
 
 
 QUEUE_NAMES = ["paper", "live", "backtest"]
@@ -14,11 +20,80 @@ REDIS_HOST, REDIS_PORT = os.getenv("REDIS_HOST"), os.getenv("REDIS_PORT")
 
 CONN = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
 
+# notifies the core worker manager of new jobs
+ENQUEUED_CHANNEL = "rq:enqueued"
+
+# queue, job key and last status saved to the DB of a strat_id, refreshed
+# on every update and dropped once the strategy hasn't been seen for a while
+STRAT_INDEX_KEY = "strat:jobs:{}"
+STRAT_INDEX_TTL = 60 * 60 * 24 * 7
+
+# progress published by strategy jobs, see kryptos.utils.tasks.publish_progress
+STRAT_PROGRESS_CHANNEL = "strat:progress:{}"
+
+# ids of completed strategy jobs pushed by the workers, same as
+# kryptos.settings.STRAT_COMPLETED_KEY, moved to the processing list while saved
+STRAT_COMPLETED_KEY = "strat:completed"
+STRAT_COMPLETED_PROCESSING_KEY = "strat:completed:processing"
+STREAM_HEARTBEAT = 15
+# seconds a stream waits for the plots of finished strategies
+STREAM_PLOTS_TIMEOUT = 600
+
+# backtest results cached by the workers, see kryptos.utils.result_cache
+BACKTEST_CACHE_VERSION = 1
+BACKTEST_RESULT_KEY = "backtest:result:{}"
+BACKTEST_VOLATILE_FIELDS = ["id", "name"]
+BACKTEST_CHECK_KEY = "backtest:check"
+BACKTEST_CHECK_STRAT = {
+    "name": "check",
+    "trading": {"EXCHANGE": "binance", "ASSET": "btc_usdt", "CAPITAL_BASE": 5000.0},
+    "indicators": [{"name": "EMA", "params": {"timeperiod": 30}}],
+}
+
+# strategies accepted by a single bulk request
+MAX_BULK_STRATS = 1000
+
+
+class NotifyingQueue(Queue):
+
+    def enqueue_job(self, job, pipeline=None, at_front=False):
+        job = super().enqueue_job(job, pipeline=pipeline, at_front=at_front)
+        # published with the pipeline so workers are notified once the job exists
+        conn = pipeline if pipeline is not None else self.connection
+        conn.publish(ENQUEUED_CHANNEL, self.name)
+        return job
+
 
 def get_queue(queue_name):
     # if queue_name == 'ta':
     #     return Queue(queue_name, connection=CONN, async=False)
-    return Queue(queue_name, connection=CONN)
+    return NotifyingQueue(queue_name, connection=CONN)
+
+
+def _strat_queue(live, simulate_orders):
+    if live and simulate_orders:
+        return get_queue("paper")
+    elif live:
+        return get_queue("live")
+    return get_queue("backtest")
+
+
+def _telegram_id(user_id):
+    if user_id is None:
+        return None
+    user = User.query.get(user_id)
+    return user.telegram_id
+
+
+def _run_strat_kwargs(strat_json, strat_model, telegram_id, live, user_id, simulate_orders):
+    return {
+        "strat_json": strat_json,
+        "strat_id": strat_model.uuid,
+        "telegram_id": telegram_id,  # allows worker to queue notfication w/o db
+        "live": live,
+        "user_id": user_id,
+        "simulate_orders": simulate_orders,
+    }
 
 
 def queue_strat(
@@ -26,49 +101,225 @@ def queue_strat(
 ):
     current_app.logger.info(f"Queueing new strat with user_id {user_id}")
     strat_model = StrategyModel.from_json(strat_json, user_id=user_id)
+    telegram_id = _telegram_id(user_id)
+    q = _strat_queue(live, simulate_orders)
 
-    telegram_id = None
-    if user_id is not None:
-        user = User.query.get(user_id)
-        telegram_id = user.telegram_id
-
-    if live and simulate_orders:
-        q = get_queue("paper")
-
-    elif live:
-        q = get_queue("live")
-
-    else:
-        q = get_queue("backtest")
+    cached = None if live else cached_backtest(json.loads(strat_json))
+    if cached is not None:
+        current_app.logger.info(f"Using cached backtest result for strat {strat_model.uuid}")
+        job = _finished_job(strat_model.uuid, q, cached)
+        return _save_strat(strat_model, q, job, user_id, status="finished")
 
     job = q.enqueue(
         "kryptos.worker.jobs.run_strat",
         job_id=strat_model.uuid,
-        kwargs={
-            "strat_json": strat_json,
-            "strat_id": strat_model.uuid,
-            "telegram_id": telegram_id,  # allows worker to queue notfication w/o db
-            "live": live,
-            "user_id": user_id,
-            "simulate_orders": simulate_orders,
-        },
+        kwargs=_run_strat_kwargs(strat_json, strat_model, telegram_id, live, user_id, simulate_orders),
         timeout=86400,
         depends_on=depends_on,
     )
+    return _save_strat(strat_model, q, job, user_id)
+
+
+def queue_strats(strat_jsons, user_id=None, live=False, simulate_orders=True):
+    """Queues many strategies with one DB transaction and one redis pipeline
+
+    Backtests with a cached result are saved as finished jobs, like queue_strat.
+
+    Returns:
+        list -- (strat_id, queue_name) of each strategy, in the order of strat_jsons
+    """
+    current_app.logger.info(f"Queueing {len(strat_jsons)} strats with user_id {user_id}")
+    models = [StrategyModel.from_json(s, user_id=user_id) for s in strat_jsons]
+    telegram_id = _telegram_id(user_id)
+    q = _strat_queue(live, simulate_orders)
+
+    if live:
+        cached = [None] * len(models)
+    else:
+        cached = cached_backtests([json.loads(s) for s in strat_jsons])
+
+    pipe = CONN.pipeline()
+    jobs = []
+    for strat_json, strat_model, entry in zip(strat_jsons, models, cached):
+        if entry is not None:
+            job, status = _finished_job(strat_model.uuid, q, entry, pipeline=pipe), "finished"
+        else:
+            job = q.job_class.create(
+                "kryptos.worker.jobs.run_strat",
+                kwargs=_run_strat_kwargs(
+                    strat_json, strat_model, telegram_id, live, user_id, simulate_orders
+                ),
+                connection=CONN,
+                id=strat_model.uuid,
+                timeout=86400,
+                origin=q.name,
+            )
+            job, status = q.enqueue_job(job, pipeline=pipe), None
+        index_strat_job(strat_model.uuid, q.name, job, status=status, pipeline=pipe)
+        jobs.append((job, status))
+    pipe.execute()
+
+    if user_id is None:
+        current_app.logger.warn("Not Saving Strategies to DB because no User specified")
+    else:
+        for strat_model, (job, status) in zip(models, jobs):
+            _set_finished(strat_model, q, job, status)
+        db.session.add_all(models)
+        db.session.commit()
+
+    return [(m.uuid, q.name) for m in models]
+
+
+def _set_finished(strat_model, q, job, status):
+    if status is not None:
+        strat_model.status = status
+        strat_model.result_json = job.result
+        StrategyMetrics.update_from_strategy(strat_model, mode=q.name)
+
+
+def _save_strat(strat_model, q, job, user_id, status=None):
+    index_strat_job(strat_model.uuid, q.name, job, status=status)
 
     if user_id is None:
         current_app.logger.warn("Not Saving Strategy to DB because no User specified")
         return job.id, q.name
 
     current_app.logger.info(f"Creating Strategy {strat_model.name} with user {user_id}")
+    _set_finished(strat_model, q, job, status)
     db.session.add(strat_model)
     db.session.commit()
 
     return job.id, q.name
 
 
+def _set_path(d, path, value):
+    """Sets a value in nested dicts and lists from a dotted path, list indexes are numbers"""
+    keys = path.split(".")
+    try:
+        for key in keys[:-1]:
+            d = d[int(key)] if isinstance(d, list) else d[key]
+        last = keys[-1]
+        if isinstance(d, list):
+            d[int(last)] = value
+        else:
+            d[last] = value
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise ValueError(f"Invalid grid path {path}")
+
+
+def expand_grid(template, grid):
+    """Returns one strategy dict per combination of the grid's values
+
+    Arguments:
+        template {dict} -- strategy dict the combinations are applied to
+        grid {dict} -- dotted paths in the template, such as "trading.MAX_HISTORY"
+            or "indicators.0.params.timeperiod", to lists of values
+
+    Returns:
+        list -- strategy dicts, named after the template and their values
+    """
+    paths = sorted(grid)
+    strats = []
+    for values in itertools.product(*(grid[p] for p in paths)):
+        d = copy.deepcopy(template)
+        for path, value in zip(paths, values):
+            _set_path(d, path, value)
+        params = ", ".join(f"{p}={v}" for p, v in zip(paths, values))
+        d["name"] = f"{template.get('name') or 'Strategy'} ({params})"
+        strats.append(d)
+    return strats
+
+
+def bulk_strat_jsons(strat_jsons=None, template=None, grid=None):
+    """Returns the strat_json of each strategy of a bulk request
+
+    Takes a list of strategies, or a template strategy and a parameter grid.
+    Strategies may be dicts or JSON strings.
+    """
+    def loaded(s):
+        return json.loads(s) if isinstance(s, str) else s
+
+    if strat_jsons:
+        strats = [loaded(s) for s in strat_jsons]
+    elif template and grid:
+        n = 1
+        for values in grid.values():
+            n *= len(values)
+        if n > MAX_BULK_STRATS:
+            raise ValueError(f"Grid has {n} combinations, the limit is {MAX_BULK_STRATS}")
+        strats = expand_grid(loaded(template), grid)
+    else:
+        raise ValueError("strat_jsons, or strat_json and grid are required")
+
+    if len(strats) > MAX_BULK_STRATS:
+        raise ValueError(f"{len(strats)} strategies submitted, the limit is {MAX_BULK_STRATS}")
+    return [json.dumps(s) for s in strats]
+
+
+def backtest_cache_key(strat_dict):
+    """Returns the key of the strategy's cached backtest
+
+    Must match kryptos.utils.result_cache.strat_hash, which the app can't
+    import. The workers store the key of BACKTEST_CHECK_STRAT, cached
+    results are only used while this function produces the same key.
+    """
+    d = {k: v for k, v in strat_dict.items() if k not in BACKTEST_VOLATILE_FIELDS}
+    canonical = json.dumps(d, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{BACKTEST_CACHE_VERSION}:{canonical}".encode()).hexdigest()
+
+
+def _decoded_entry(entry):
+    if not entry:
+        return None
+    return {k.decode(): v.decode() for k, v in entry.items()}
+
+
+def _cache_key_matches(worker_key):
+    """Checks the workers' key of BACKTEST_CHECK_STRAT against backtest_cache_key"""
+    if worker_key is None:
+        return True
+    if worker_key.decode() != backtest_cache_key(BACKTEST_CHECK_STRAT):
+        current_app.logger.error(
+            "backtest_cache_key differs from the workers' result_cache.strat_hash, "
+            "check BACKTEST_CACHE_VERSION. Ignoring cached backtests"
+        )
+        return False
+    return True
+
+
+def cached_backtest(strat_dict):
+    """Returns the cached result and urls of an identical backtest, or None"""
+    return cached_backtests([strat_dict])[0]
+
+
+def cached_backtests(strat_dicts):
+    """Looks up the cached backtests of many strategies in one round trip"""
+    pipe = CONN.pipeline()
+    pipe.get(BACKTEST_CHECK_KEY)
+    for strat_dict in strat_dicts:
+        pipe.hgetall(BACKTEST_RESULT_KEY.format(backtest_cache_key(strat_dict)))
+    worker_key, *entries = pipe.execute()
+    if not _cache_key_matches(worker_key):
+        return [None] * len(strat_dicts)
+    return [_decoded_entry(entry) for entry in entries]
+
+
+def _finished_job(job_id, q, cached, pipeline=None):
+    """Saves a finished job holding the cached result, without running the strategy"""
+    job = Job.create("kryptos.worker.jobs.run_strat", id=job_id, connection=CONN, origin=q.name)
+    for field in ["plot_url", "plot_data_url", "analysis_url"]:
+        if cached.get(field):
+            job.meta[field] = cached[field]
+    job.meta["cached_result"] = True
+    job._result = cached["result"]
+    job._status = "finished"
+    job.ended_at = datetime.utcnow()
+    job.save(pipeline=pipeline)
+    job.cleanup(ttl=500, pipeline=pipeline)
+    return job
+
+
 def kill_strat(strat_id):
-    kill_key = "rq:jobs:kill"
     job = job_by_strat_id(strat_id)
 
     if job is None:
@@ -78,7 +329,12 @@ def kill_strat(strat_id):
     # bc returned job will be Job not StratJob
     if job.is_started:
         current_app.logger.info(f"Killing strat {strat_id}")
-        job.connection.sadd(kill_key, job.get_id())
+        # the job blocks on its own control list, see kryptos.worker.worker.kill_job
+        kill_key = f"rq:jobs:kill:{job.get_id()}"
+        pipe = job.connection.pipeline()
+        pipe.rpush(kill_key, json.dumps({"action": "kill", "requested_at": time.time()}))
+        pipe.expire(kill_key, 60 * 60 * 24)
+        pipe.execute()
         return True
 
     else:
@@ -99,36 +355,138 @@ def pretty_result(result_json):
     return string
 
 
+def index_strat_job(strat_id, queue_name, job, status=None, pipeline=None):
+    key = job.key.decode() if isinstance(job.key, bytes) else job.key
+    entry = {"queue": queue_name, "job_key": key, "status": status}
+    conn = pipeline if pipeline is not None else CONN
+    conn.set(STRAT_INDEX_KEY.format(strat_id), json.dumps(entry), ex=STRAT_INDEX_TTL)
+
+
 def job_by_strat_id(strat_id):
+    entry = CONN.get(STRAT_INDEX_KEY.format(strat_id))
+    if entry is not None:
+        job = get_queue(json.loads(entry)["queue"]).fetch_job(strat_id)
+        if job is not None:
+            return job
+
+    # strats enqueued before the index existed
     for q_name in QUEUE_NAMES:
         current_app.logger.info(f"Checking if strat in {q_name}")
         q = get_queue(q_name)
         job = q.fetch_job(strat_id)
         if job is not None:
+            index_strat_job(strat_id, q_name, job)
             return job
 
     current_app.logger.error("Strategy not Found in Job")
 
 
-def get_job_data(strat_id, queue_name=None):
-    if queue_name is None:
-        job = job_by_strat_id(strat_id)
+def _fetch_indexed_job(strat_id):
+    """Reads the strat's index entry and job hash in a single round trip
+
+    Returns:
+        tuple -- (index entry dict or None, Job or None, job status or None)
+    """
+    pipe = CONN.pipeline()
+    pipe.get(STRAT_INDEX_KEY.format(strat_id))
+    pipe.hgetall(Job.key_for(strat_id))
+    entry, raw = pipe.execute()
+
+    entry = json.loads(entry) if entry is not None else None
+    if not raw:
+        if entry is not None:
+            # the job has expired, its entry is of no more use
+            CONN.delete(STRAT_INDEX_KEY.format(strat_id))
+        return None, None, None
+
+    job = Job(strat_id, connection=CONN)
+    job.restore(raw)
+    # the status read with the job, rq 0.12's get_status always queries it again
+    status = raw.get(b"status")
+    return entry, job, status.decode() if status is not None else None
+
 
+def _save_status(strat_id, job, entry, status):
+    """Updates the DB only when the job status differs from the last saved one"""
+    if entry is not None and entry.get("status") == status:
+        return status
+
+    strat = StrategyModel.query.filter_by(uuid=strat_id).first()
+    if strat is not None:
+        strat.update_from_job(job)
     else:
-        q = get_queue(queue_name)
-        job = q.fetch_job(strat_id)
+        current_app.logger.warn("Fetching strat from RQ that is not in DB")
+
+    queue_name = entry["queue"] if entry is not None else job.origin
+    index_strat_job(strat_id, queue_name, job, status=status)
+    return status
+
+
+def recover_completed_strats():
+    """Requeues the completions left in the processing list by a stopped consumer"""
+    count = 0
+    while CONN.rpoplpush(STRAT_COMPLETED_PROCESSING_KEY, STRAT_COMPLETED_KEY) is not None:
+        count += 1
+    return count
+
+
+def save_completed_strat(timeout):
+    """Saves the status, result and metrics of the next completed strategy job
+
+    Completions stay in the processing list until saved, so a failure
+    leaves them to recover_completed_strats.
+
+    Returns:
+        str -- id of the saved strategy, None if none completed within timeout seconds
+    """
+    raw = CONN.brpoplpush(STRAT_COMPLETED_KEY, STRAT_COMPLETED_PROCESSING_KEY, timeout=timeout)
+    if raw is None:
+        return None
+
+    strat_id = raw.decode()
+    # saves the status and metrics to the DB, like a poll of the strategy
+    data = get_job_data(strat_id)
+    if data["status"] == "Not Found":
+        current_app.logger.warn(f"Completed strat {strat_id} expired before it was saved")
+    CONN.lrem(STRAT_COMPLETED_PROCESSING_KEY, 1, raw)
+    return strat_id
+
+
+def leaderboard(sort="net_profit_pct", descending=True, page=1, per_page=20, **filters):
+    """Returns a page of finished strategies ranked by a metric, as dicts"""
+    pagination = StrategyMetrics.leaderboard(
+        sort=sort, descending=descending, page=page, per_page=per_page, **filters
+    )
+    rows = []
+    for metrics, strat in pagination.items:
+        rows.append(
+            {
+                "strat_id": strat.uuid,
+                "name": strat.name,
+                "user_id": strat.user_id,
+                "net_profit_pct": metrics.net_profit_pct,
+                "sharpe_ratio_avg": metrics.sharpe_ratio_avg,
+                "max_drawdown": metrics.max_drawdown,
+                "number_of_trades": metrics.number_of_trades,
+                "asset": metrics.asset,
+                "exchange": metrics.exchange,
+                "data_freq": metrics.data_freq,
+                "mode": metrics.mode,
+            }
+        )
+    return {"strategies": rows, "page": pagination.page, "pages": pagination.pages, "total": pagination.total}
+
+
+def get_job_data(strat_id):
+    entry, job, status = _fetch_indexed_job(strat_id)
 
     if job is None:
         data = {"status": "Not Found"}
 
     else:
-        strat = StrategyModel.query.filter_by(uuid=strat_id).first()
-        if strat is not None:
-            strat.update_from_job(job)
-        else:
-            current_app.logger.warn("Fetching strat from RQ that is not in DB")
+        status = _save_status(strat_id, job, entry, status)
         data = {
-            "status": job.status,
+            "status": status,
             "meta": job.meta,
             "started_at": job.started_at,
             "result": pretty_result(job.result),
@@ -137,108 +495,90 @@ def get_job_data(strat_id, queue_name=None):
     return data
 
 
+def _sse(data):
+    return f"data: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_progress(strat_ids):
+    """Yields server-sent events with the progress of the strategies
+
+    The current job data of each strategy is sent first, followed by
+    the updates published by the workers: status changes (with refreshed
+    job data), iteration dates, log lines and result urls.
+
+    The stream ends with an "end" event once every strategy has failed, was
+    not found, or has finished and either has its plots or waited
+    STREAM_PLOTS_TIMEOUT seconds for them, so it doesn't hold a thread forever.
+    """
+    finished_at = {}
+    done = set()
+
+    def update(event):
+        strat_id, status = event["strat_id"], event.get("status")
+        if status in ["failed", "Not Found"] or event.get("plot_url"):
+            done.add(strat_id)
+        elif status == "finished":
+            if event.get("meta", {}).get("plot_url"):
+                done.add(strat_id)
+            finished_at.setdefault(strat_id, time.time())
+
+    pubsub = CONN.pubsub(ignore_subscribe_messages=True)
+    # subscribe before reading the job data so no update is missed in between
+    pubsub.subscribe(*[STRAT_PROGRESS_CHANNEL.format(i) for i in strat_ids])
+    try:
+        for strat_id in strat_ids:
+            event = dict(get_job_data(strat_id), strat_id=strat_id)
+            update(event)
+            yield _sse(event)
+
+        while True:
+            now = time.time()
+            done.update(i for i, t in finished_at.items() if now - t > STREAM_PLOTS_TIMEOUT)
+            if done.issuperset(strat_ids):
+                yield "event: end\ndata: {}\n\n"
+                return
+
+            msg = pubsub.get_message(timeout=STREAM_HEARTBEAT)
+            if msg is None:
+                # keeps proxies from closing idle streams
+                yield ": heartbeat\n\n"
+                continue
+
+            event = json.loads(msg["data"])
+            if "status" in event:
+                event = dict(get_job_data(event["strat_id"]), strat_id=event["strat_id"])
+            update(event)
+            yield _sse(event)
+    finally:
+        pubsub.close()
+
+
 def indicator_group_name_selectors() -> [(str, str)]:
     """Returns list of select options of indicator group names"""
-    current_app.logger.debug("fetching ta-group-selects job")
-
-    q = get_queue("ta")
-    job_id = "ta-group-selects"
-    job = q.fetch_job(job_id)
-    if job is None:
-        job = q.enqueue(
-            "kryptos.worker.jobs.indicator_group_name_selectors",
-            job_id=job_id,
-            result_ttl=86400,
-        )
-    return job.result
+    return metadata.indicator_group_name_selectors()
 
 
 def all_indicator_selectors() -> [(str, str)]:
     """Returns the entire list of possible indicator abbreviation select options"""
-    current_app.logger.debug("fetching ta-indicator-selects job")
-
-    q = get_queue("ta")
-    job_id = "ta-indicator-selects"
-    job = q.fetch_job(job_id)
-    if job is None:
-        job = q.enqueue(
-            "kryptos.worker.jobs.all_indicator_selectors",
-            job_id=job_id,
-            result_ttl=86400,
-        )
-    return job.result
+    return metadata.all_indicator_selectors()
 
 
 def _get_indicator_params(indicator_abbrev):
-    current_app.logger.debug(f"fetching ta-indicator-params-{indicator_abbrev} job")
-
-    q = get_queue("ta")
-    job_id = f"ta-indicator-params-{indicator_abbrev}"
-    job = q.fetch_job(job_id)
-    if job is None:
-        job = q.enqueue(
-            "kryptos.worker.jobs._get_indicator_params",
-            job_id=job_id,
-            kwargs={"indicator_abbrev": indicator_abbrev},
-            result_ttl=86400,
-        )
-    return job.result
+    return metadata.indicator_params(indicator_abbrev)
 
 
 def get_indicators_by_group(group: str) -> [(str, str)]:
     """Returns list of select options containing abbreviations of the groups indicators"""
-    current_app.logger.debug(f"fetching ta-indicator-by-group-{group} job")
-    q = get_queue("ta")
-    job_id = f"ta-indicator-by-group-{group}"
-    job = q.fetch_job(job_id)
-    if job is None:
-        job = q.enqueue(
-            "kryptos.worker.jobs.get_indicators_by_group",
-            job_id=job_id,
-            kwargs={"group": group},
-            result_ttl=86400,
-        )
-    return job.result
+    return metadata.indicators_by_group(group)
 
 
 def get_exchange_asset_pairs(exchange: str) -> [str]:
-    q = get_queue("ta")
-    job_id = f"ta-get-exchange-asset-pairs-{exchange}"
-    job = q.fetch_job(job_id)
-    if job is None:
-        job = q.enqueue(
-            "kryptos.worker.jobs.get_exchange_asset_pairs",
-            job_id=job_id,
-            kwargs={"exchange": exchange},
-            result_ttl=86400,
-        )
-
-    return job.result
+    return metadata.exchange_asset_pairs(exchange)
 
 
 def get_exchange_quote_currencies(exchange: str) -> Set[str]:
-    q = get_queue("ta")
-    job_id = f"ta-get-exchange-quote-currencies-{exchange}"
-    job = q.fetch_job(job_id)
-    if job is None:
-        job = q.enqueue(
-            "kryptos.worker.jobs.get_exchange_quote_currencies",
-            job_id=job_id,
-            kwargs={"exchange": exchange},
-            result_ttl=86400,
-        )
-    return job.result
+    return metadata.exchange_quote_currencies(exchange)
 
 
 def get_available_base_currencies(exchange: str, quote_currency: str) -> Set[str]:
-    q = get_queue("ta")
-    job_id = f"ta-get-available-base-currencies-{exchange}"
-    job = q.fetch_job(job_id)
-    if job is None:
-        job = q.enqueue(
-            "kryptos.worker.jobs.get_available_base_currencies",
-            job_id=job_id,
-            kwargs={"exchange": exchange, "quote_currency": quote_currency},
-            result_ttl=86400,
-        )
-    return job.result
+    return metadata.available_base_currencies(exchange, quote_currency)
@@ -0,0 +1,118 @@
+import time
+import threading
+from typing import List, Set
+
+import ccxt
+import talib as ta
+from talib import abstract as ab
+
+
+# seconds before cached exchange markets are refreshed
+MARKETS_TTL = 3600
+
+
+class MetadataService(object):
+
+    def __init__(self, app=None):
+        """In-process cache of the ta-lib catalog and exchange markets
+
+        The ta-lib catalog is built once when the app starts, ta-lib is
+        installed in the app image. Exchange markets are loaded once per exchange and refreshed in the
+        background after MARKETS_TTL, quote and base currencies are derived
+        from the same market load.
+        """
+        self.app = None
+        self.markets_ttl = MARKETS_TTL
+        self._catalog = None
+        self._markets = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.markets_ttl = app.config.get("METADATA_MARKETS_TTL", MARKETS_TTL)
+        self._catalog = self._build_catalog()
+        app.logger.info("Loaded ta-lib catalog")
+
+    # ta-lib catalog
+
+    @staticmethod
+    def _build_catalog():
+        return {
+            "groups": ta.get_function_groups(),
+            "params": {i: getattr(ab, i).parameters for i in ta.get_functions()},
+        }
+
+    @property
+    def catalog_ready(self):
+        return self._catalog is not None
+
+    def indicator_group_name_selectors(self) -> [(str, str)]:
+        if self._catalog is None:
+            return None
+        return [(k, k) for k in self._catalog["groups"].keys()]
+
+    def all_indicator_selectors(self) -> [(str, str)]:
+        if self._catalog is None:
+            return None
+        return [(i, i) for i in self._catalog["params"].keys()]
+
+    def indicator_params(self, indicator_abbrev):
+        if self._catalog is None:
+            return None
+        return self._catalog["params"].get(indicator_abbrev)
+
+    def indicators_by_group(self, group: str) -> [(str, str)]:
+        if self._catalog is None:
+            return None
+        return [(i, i) for i in self._catalog["groups"].get(group, [])]
+
+    # exchange markets
+
+    @staticmethod
+    def _load_markets(exchange: str) -> List[str]:
+        markets = getattr(ccxt, exchange)().load_markets()
+        return [pair.replace("/", "_").lower() for pair in markets]
+
+    def _refresh_markets(self, exchange: str):
+        try:
+            pairs = self._load_markets(exchange)
+            with self._lock:
+                self._markets[exchange] = (time.time(), pairs)
+        except Exception as e:
+            if self.app is not None:
+                self.app.logger.error(f"Failed to refresh {exchange} markets: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(exchange)
+
+    def exchange_asset_pairs(self, exchange: str) -> List[str]:
+        """Returns the exchange's pairs, stale pairs are returned while refreshing"""
+        cached = self._markets.get(exchange)
+        if cached is None:
+            self._refresh_markets(exchange)
+            cached = self._markets.get(exchange)
+            return [] if cached is None else cached[1]
+
+        loaded_at, pairs = cached
+        if time.time() - loaded_at > self.markets_ttl:
+            with self._lock:
+                start = exchange not in self._refreshing
+                self._refreshing.add(exchange)
+            if start:
+                threading.Thread(target=self._refresh_markets, args=(exchange,), daemon=True).start()
+        return pairs
+
+    def exchange_quote_currencies(self, exchange: str) -> Set[str]:
+        return {s.split("_")[1] for s in self.exchange_asset_pairs(exchange)}
+
+    def available_base_currencies(self, exchange: str, quote_currency: str) -> Set[str]:
+        bases = set()
+        for s in self.exchange_asset_pairs(exchange):
+            base, quote = s.split("_")
+            if quote == quote_currency:
+                bases.add(base)
+        return bases
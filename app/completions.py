@@ -0,0 +1,30 @@
+"""Saves the results and metrics of strategy jobs as the workers complete them
+
+Strategies are otherwise only saved when their status is requested, so
+the results of strategies nobody watches, such as bulk submitted sweeps,
+would expire before reaching the DB and the leaderboard.
+"""
+import time
+
+from app.app import create_app
+from app.extensions import db
+from app import task
+
+
+def run():
+    app = create_app()
+    with app.app_context():
+        recovered = task.recover_completed_strats()
+        app.logger.info(f"Saving completed strategies, recovered {recovered}")
+        while True:
+            try:
+                task.save_completed_strat(timeout=5)
+            except Exception as e:
+                # the strategy stays in the processing list until the next start
+                app.logger.exception(e)
+                db.session.rollback()
+                time.sleep(5)
+
+
+if __name__ == "__main__":
+    run()
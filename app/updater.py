@@ -1,11 +1,20 @@
 import os
+import sys
 import json
+import time
+import random
+import argparse
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
 import redis
 from rq import Connection
 from rq.worker import HerokuWorker as Worker
 import logbook
 
 from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
 
 from app.settings import get_from_datastore
 
@@ -13,32 +22,367 @@ log = logbook.Logger("UPDATER")
 
 CONFIG_ENV = os.getenv("CONFIG_ENV")
 
-if CONFIG_ENV == "dev":
-    log.warn("Using dev telegram token")
-    TELEGRAM_TOKEN = get_from_datastore("TELEGRAM_TOKEN", "dev")
-else:
-    log.warn("Using production telegram token")
-    TELEGRAM_TOKEN = get_from_datastore("TELEGRAM_TOKEN", "production")
-
-
-bot = Bot(TELEGRAM_TOKEN)
-
 REDIS_HOST = os.getenv("REDIS_HOST", "10.0.0.3")
 REDIS_PORT = os.getenv("REDIS_PORT", 6379)
 
 CONN = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
 
+# same as kryptos.settings.NOTIFICATION_QUEUE_KEY
+NOTIFICATION_QUEUE_KEY = "notifications:pending"
+# notifications fetched by the dispatcher, removed once delivered
+NOTIFICATION_PROCESSING_KEY = "notifications:processing"
+
+BATCH_WINDOW = 2  # seconds messages of a chat are gathered before being sent together
+MAX_MESSAGE_LENGTH = 4096  # telegram's limit, longer batches are split
+FETCH_SIZE = 500  # messages popped from redis at once
+SENDER_THREADS = 8
+SEND_RETRIES = 5  # attempts of a text after network errors, before the batch is retried later
+
+# telegram allows about one message per second to a chat, with short bursts,
+# and 30 per second overall; a bucket sends at most rate + burst in a second
+CHAT_RATE, CHAT_BURST = 1, 2
+GLOBAL_RATE, GLOBAL_BURST = 25, 5
+
+
+def get_bot():
+    if CONFIG_ENV == "dev":
+        log.warn("Using dev telegram token")
+        token = get_from_datastore("TELEGRAM_TOKEN", "dev")
+    else:
+        log.warn("Using production telegram token")
+        token = get_from_datastore("TELEGRAM_TOKEN", "production")
+    return Bot(token)
+
 
 def send_notification(msg, telegram_id):
-    bot.send_message(text=msg, chat_id=telegram_id)
+    """Kept for jobs queued on "updates" before the notification pipeline"""
+    CONN.lpush(NOTIFICATION_QUEUE_KEY, json.dumps({"chat_id": telegram_id, "msg": msg}))
+
+
+class TokenBucket(object):
+    """Thread safe token bucket, refilled at rate tokens per second up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def ready(self):
+        with self._lock:
+            self._refill()
+            return self._tokens >= 1
+
+    def reserve(self):
+        """Takes a token, returns the seconds to wait before it may be used"""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return max(0, -self._tokens / self.rate)
+
+    def penalize(self, seconds):
+        """Empties the bucket for seconds, after telegram asked to retry later"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def collapse(messages):
+    """Merges repeated messages of a batch into one line, keeping the order they first appeared"""
+    counts = OrderedDict()
+    for msg in messages:
+        counts[msg] = counts.get(msg, 0) + 1
+    return [msg if n == 1 else f"{msg} (x{n})" for msg, n in counts.items()]
+
+
+def split_texts(lines, max_length=MAX_MESSAGE_LENGTH):
+    """Joins lines into as few texts as fit telegram's message length"""
+    texts, current = [], ""
+    for line in lines:
+        line = line[:max_length]
+        if current and len(current) + 1 + len(line) > max_length:
+            texts.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        texts.append(current)
+    return texts
+
+
+class Dispatcher(object):
+    """Batches notifications per chat and sends them from a pool of threads
+
+    Messages of a chat are gathered for BATCH_WINDOW seconds, or for as long as
+    the chat is rate limited or a previous batch is still being sent, then
+    collapsed and joined into as few telegram messages as possible. Every send
+    takes a token from the chat's bucket and from the global bucket.
+
+    With a redis connection, fetched notifications are moved to a processing
+    list and only removed once their batch is delivered, or rejected by
+    telegram for good. Notifications left there by a stopped dispatcher are
+    sent again by recover. Batches failing on network errors are retried.
+    """
+
+    def __init__(self, bot, senders=SENDER_THREADS, window=BATCH_WINDOW, conn=None):
+        self.bot = bot
+        self.window = window
+        self.conn = conn
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._chat_buckets = {}
+        self._pending = OrderedDict()  # chat_id -> (first received, messages, raw notifications)
+        self._inflight = set()
+        self._retries = deque()  # batches handed back by the senders
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=senders)
+
+        self.received = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def add(self, chat_id, msg, raw=None):
+        """Adds a message, raw is its item in the processing list"""
+        self.received += 1
+        self._add(chat_id, [str(msg)], [] if raw is None else [raw])
+
+    def _add(self, chat_id, messages, raws):
+        if chat_id not in self._chat_buckets:
+            self._chat_buckets[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+        first, pending, pending_raws = self._pending.setdefault(chat_id, (time.monotonic(), [], []))
+        pending.extend(messages)
+        pending_raws.extend(raws)
+
+    def flush(self, force=False):
+        """Hands the batches due to the senders, returns the number of batches"""
+        now = time.monotonic()
+        while self._retries:
+            # retried texts go before the messages received since, and wait another window
+            chat_id, texts, raws = self._retries.popleft()
+            first, messages, pending_raws = self._pending.pop(chat_id, (now, [], []))
+            self._pending[chat_id] = (now, texts + messages, raws + pending_raws)
+
+        due = []
+        for chat_id, (first, messages, raws) in self._pending.items():
+            with self._lock:
+                if chat_id in self._inflight:
+                    continue
+            if not force and now - first < self.window:
+                continue
+            if not self._chat_buckets[chat_id].ready():
+                continue
+            due.append(chat_id)
+
+        for chat_id in due:
+            first, messages, raws = self._pending.pop(chat_id)
+            texts = split_texts(collapse(messages))
+            with self._lock:
+                self._inflight.add(chat_id)
+            future = self._pool.submit(self._send, chat_id, texts, raws)
+            future.add_done_callback(self._check_send)
+        return len(due)
+
+    @staticmethod
+    def _check_send(future):
+        e = future.exception()
+        if e is not None:
+            log.error("Notification sender failed")
+            log.exception(e)
+
+    def _send(self, chat_id, texts, raws):
+        try:
+            for i, text in enumerate(texts):
+                if not self._send_text(chat_id, text):
+                    # the remaining texts are sent with the chat's next batch,
+                    # their notifications stay in the processing list until then
+                    self._retries.append((chat_id, texts[i:], raws))
+                    return
+            self._ack(raws)
+        finally:
+            with self._lock:
+                self._inflight.discard(chat_id)
+
+    def _send_text(self, chat_id, text):
+        """Sends a text, returns False if it should be retried later"""
+        bucket = self._chat_buckets[chat_id]
+        attempts = 0
+        while True:
+            time.sleep(max(bucket.reserve(), self.global_bucket.reserve()))
+            try:
+                self.bot.send_message(text=text, chat_id=chat_id)
+                self.sent += 1
+                return True
+            except RetryAfter as e:
+                log.warn(f"Rate limited by telegram, retrying in {e.retry_after}s")
+                self.retried += 1
+                self.global_bucket.penalize(e.retry_after)
+            except BadRequest as e:
+                # a NetworkError for telegram, but the same request won't succeed later
+                log.error(f"Could not notify chat {chat_id}: {e}")
+                self.failed += 1
+                return True
+            except NetworkError as e:
+                # includes TimedOut
+                attempts += 1
+                self.retried += 1
+                if attempts >= SEND_RETRIES:
+                    log.error(f"Could not reach telegram for chat {chat_id}, retrying later: {e}")
+                    return False
+                log.warn(f"Network error notifying chat {chat_id}, retrying: {e}")
+                time.sleep(2 ** attempts)
+            except TelegramError as e:
+                log.error(f"Could not notify chat {chat_id}: {e}")
+                self.failed += 1
+                return True
+
+    def _ack(self, raws):
+        """Removes delivered notifications from the processing list"""
+        if self.conn is None or not raws:
+            return
+        pipe = self.conn.pipeline()
+        for raw in raws:
+            pipe.lrem(NOTIFICATION_PROCESSING_KEY, 1, raw)
+        pipe.execute()
+
+    @property
+    def busy(self):
+        with self._lock:
+            return bool(self._pending or self._inflight or self._retries)
+
+    def _add_raw(self, raw):
+        try:
+            notification = json.loads(raw)
+            self.add(notification["chat_id"], notification["msg"], raw=raw)
+        except (ValueError, KeyError):
+            log.error(f"Dropping malformed notification {raw}")
+            self._ack([raw])
+
+    def recover(self):
+        """Adds the notifications fetched but not delivered before the last stop"""
+        items = self.conn.lrange(NOTIFICATION_PROCESSING_KEY, 0, -1)
+        # fetched items are pushed on the left, the oldest is last
+        for raw in reversed(items):
+            self._add_raw(raw)
+        return len(items)
+
+    def fetch(self, timeout):
+        """Moves the queued messages to the processing list and adds them
+
+        Waits up to timeout seconds for the first message.
+        """
+        raw = self.conn.brpoplpush(NOTIFICATION_QUEUE_KEY, NOTIFICATION_PROCESSING_KEY, timeout=timeout)
+        if raw is None:
+            return 0
+        count = min(self.conn.llen(NOTIFICATION_QUEUE_KEY), FETCH_SIZE - 1)
+        pipe = self.conn.pipeline()
+        for _ in range(count):
+            pipe.rpoplpush(NOTIFICATION_QUEUE_KEY, NOTIFICATION_PROCESSING_KEY)
+
+        items = [raw] + [r for r in pipe.execute() if r is not None]
+        for raw in items:
+            self._add_raw(raw)
+        return len(items)
+
+    def run(self):
+        log.info("Starting notification dispatcher")
+        recovered = self.recover()
+        if recovered:
+            log.info(f"Resending {recovered} notifications fetched before the last stop")
+        while True:
+            # wake up often enough to send batches as their window ends
+            self.fetch(timeout=1)
+            self.flush()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class LocalBot(object):
+    """Stand-in for telegram.Bot recording messages instead of sending them
+
+    Mimics telegram's latency and rate limits, raising RetryAfter when more
+    messages are sent in a second than telegram would accept.
+    """
+
+    def __init__(self, latency=0.05, chat_limit=3, global_limit=30):
+        self.latency = latency
+        self.chat_limit = chat_limit
+        self.global_limit = global_limit
+        self.messages = []
+        self.rejected = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def send_message(self, text, chat_id):
+        time.sleep(self.latency)
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0][0] >= 1:
+                self._recent.popleft()
+            chat_count = sum(1 for _, c in self._recent if c == chat_id)
+            if len(self._recent) >= self.global_limit or chat_count >= self.chat_limit:
+                self.rejected += 1
+                raise RetryAfter(1)
+            self._recent.append((now, chat_id))
+            self.messages.append((chat_id, text))
+
+
+def benchmark(messages=5000, chats=50, senders=SENDER_THREADS, window=BATCH_WINDOW):
+    """Pushes bursts of notifications through a dispatcher using LocalBot"""
+    bot = LocalBot()
+    dispatcher = Dispatcher(bot, senders=senders, window=window)
+    templates = ["Canceling unfilled open order", "Bought 0.1 BTC at 6500", "Sold 0.1 BTC at 6600"]
+
+    start = time.monotonic()
+    for i in range(messages):
+        chat_id = random.randrange(chats)
+        dispatcher.add(chat_id, random.choice(templates) if i % 4 else f"Iteration {i} complete")
+        if i % 100 == 0:
+            dispatcher.flush()
+
+    while dispatcher.busy:
+        dispatcher.flush()
+        time.sleep(0.01)
+    dispatcher.shutdown()
+    elapsed = time.monotonic() - start
+
+    log.info(
+        f"{dispatcher.received} notifications to {chats} chats delivered as "
+        f"{dispatcher.sent} messages in {elapsed:.1f}s "
+        f"({dispatcher.received / elapsed:.0f} notifications/s), "
+        f"{bot.rejected} rejected by rate limits, {dispatcher.failed} failed"
+    )
+    return dispatcher, bot
 
 
 def start_worker():
+    """Runs an RQ worker on the legacy "updates" queue, moving its jobs to the dispatcher"""
     with Connection(CONN):
         log.info("Starting update worker")
         worker = Worker("updates")
-        worker.work()
+        worker.work(burst=True)
 
 
-if __name__ == "__main__":
+def start_dispatcher():
     start_worker()
+    Dispatcher(get_bot(), conn=CONN).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--benchmark", type=int, metavar="MESSAGES", help="measure throughput with a local bot")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--senders", type=int, default=SENDER_THREADS)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        logbook.StreamHandler(sys.stdout).push_application()
+        benchmark(args.benchmark, chats=args.chats, senders=args.senders)
+    else:
+        start_dispatcher()
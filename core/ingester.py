@@ -1,13 +1,24 @@
+import json
 import time
 from logbook import Logger
 import multiprocessing
 from catalyst.exchange.exchange_bundle import ExchangeBundle
 from rq import Connection, Worker
+import ccxt
 import pandas as pd
 import redis
 
 from kryptos import logger_group
-from kryptos.settings import REDIS_HOST, REDIS_PORT
+from kryptos.utils import result_cache
+from kryptos.settings import (
+    REDIS_HOST,
+    REDIS_PORT,
+    INGEST_EXCHANGES,
+    INGEST_INTERVAL,
+    INGEST_MIN_REQUEST_INTERVAL,
+    INGEST_LAST_BAR_KEY,
+    INGEST_PRIORITY_KEY,
+)
 
 
 CONN = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
@@ -79,6 +90,138 @@ def ingest_from_trade_config(config):
     )
 
 
+BAR_DELTAS = {"daily": pd.Timedelta(days=1), "minute": pd.Timedelta(minutes=1)}
+BAR_FLOORS = {"daily": "D", "minute": "min"}
+
+
+def _last_bar_field(exchange, symbol, freq):
+    return f"{exchange}:{symbol}:{freq}"
+
+
+def last_ingested_bar(exchange, symbol, freq):
+    val = CONN.hget(INGEST_LAST_BAR_KEY, _last_bar_field(exchange, symbol, freq))
+    if val is None:
+        return None
+    return pd.to_datetime(val.decode(), utc=True)
+
+
+def exchange_symbols(exchange):
+    markets = getattr(ccxt, exchange)().load_markets()
+    return [pair.replace("/", "_").lower() for pair in markets]
+
+
+class ExchangeIngester(object):
+
+    def __init__(self, exchange):
+        """Incrementally ingests the bundles of a single exchange
+
+        The last ingested bar of every (symbol, frequency) is kept in redis,
+        so each pass only requests newer bars. Symbols requested by strategies
+        (see kryptos.utils.tasks.request_ingest) are ingested before anything else.
+        """
+        self.exchange = exchange
+        self.bundle = ExchangeBundle(exchange)
+        self.min_interval = INGEST_MIN_REQUEST_INTERVAL.get(exchange, 1)
+        self.priority_key = INGEST_PRIORITY_KEY.format(exchange=exchange)
+        self._last_request = 0
+
+    def _wait_rate_limit(self):
+        delay = self._last_request + self.min_interval - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self._last_request = time.time()
+
+    def ingest(self, symbol, freq, start=None, end=None):
+        last_bar = last_ingested_bar(self.exchange, symbol, freq)
+        if end is None:
+            # the last complete bar, the current one is still forming
+            end = pd.Timestamp.utcnow().floor(BAR_FLOORS[freq]) - BAR_DELTAS[freq]
+        else:
+            end = pd.to_datetime(end, utc=True)
+
+        if start is None and last_bar is not None:
+            start = last_bar + BAR_DELTAS[freq]
+        elif start is not None:
+            start = pd.to_datetime(start, utc=True)
+
+        if start is not None and start > end:
+            return
+
+        self._wait_rate_limit()
+        log.info(f"Ingesting {self.exchange} {symbol} {freq} data {start} - {end}")
+        self.bundle.ingest(
+            freq,
+            start=start,
+            end=end,
+            include_symbols=symbol,
+            show_progress=False,
+            show_breakdown=False,
+            show_report=False,
+        )
+
+        # the mark only moves over ranges contiguous with it, bars between the
+        # mark and a later requested range are still missing
+        contiguous = start is None or (last_bar is not None and start <= last_bar + BAR_DELTAS[freq])
+        if contiguous and (last_bar is None or end > last_bar):
+            CONN.hset(INGEST_LAST_BAR_KEY, _last_bar_field(self.exchange, symbol, freq), end.isoformat())
+
+        removed = result_cache.invalidate(self.exchange, symbol, freq, start=start, end=end)
+        if removed:
+            log.info(f"Invalidated {removed} cached backtests of {self.exchange} {symbol} {freq}")
+
+    def ingest_requested(self, timeout):
+        """Waits up to timeout seconds for a strategy request and ingests it
+
+        Returns:
+            bool -- True if a request was handled
+        """
+        item = CONN.blpop(self.priority_key, timeout=max(int(timeout), 1))
+        if item is None:
+            return False
+
+        req = json.loads(item[1])
+        log.notice(f"Ingesting requested {self.exchange} {req['symbol']} {req['start']} - {req['end']}")
+        try:
+            for freq in ["daily", "minute"] if req["data_freq"] == "minute" else ["daily"]:
+                self.ingest(req["symbol"], freq, start=req["start"], end=req["end"])
+        except Exception as e:
+            log.exception(e)
+        return True
+
+    def run_pass(self):
+        """Ingests the bars added since the previous pass for all symbols"""
+        try:
+            symbols = exchange_symbols(self.exchange)
+        except Exception as e:
+            log.exception(e)
+            return
+
+        for freq in ["daily", "minute"]:
+            for symbol in symbols:
+                # requests submitted during a pass don't wait for the pass to finish
+                while CONN.llen(self.priority_key):
+                    self.ingest_requested(timeout=1)
+                try:
+                    self.ingest(symbol, freq)
+                except Exception as e:
+                    log.error(f"Failed to ingest {self.exchange} {symbol} {freq}")
+                    log.exception(e)
+        log.info(f"Done incremental pass of {self.exchange}")
+
+    def run(self):
+        next_pass = 0
+        while True:
+            if time.time() >= next_pass:
+                self.run_pass()
+                next_pass = time.time() + INGEST_INTERVAL
+            else:
+                self.ingest_requested(timeout=next_pass - time.time())
+
+
+def run_exchange_ingester(exchange):
+    ExchangeIngester(exchange).run()
+
+
 # def queue_ingest(exchange, symbol=None, start=None, end=None):
 #     if symbol is None:
 #         log.warn(f'Queuing ingest {exchange} for all symbols')
@@ -98,9 +241,13 @@ if __name__ == "__main__":
     # allow worker to start up
     time.sleep(5)
 
-    while True:
-        for ex in ["bitfinex", "bittrex", "poloniex"]:
-            ingest_exchange(ex)
+    # one process per exchange, each respecting its own rate limit
+    procs = []
+    for ex in INGEST_EXCHANGES:
+        log.info(f"Starting {ex} ingester")
+        p = multiprocessing.Process(target=run_exchange_ingester, args=(ex,), name=f"ingest-{ex}")
+        p.start()
+        procs.append(p)
 
-        # re-ingest every 12 hours
-        time.sleep(43200)
+    for p in procs:
+        p.join()
@@ -1,10 +1,11 @@
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from logbook import Logger
 from kryptos.analysis.utils import quant_utils
 from kryptos.utils.outputs import get_algo_dir
+from kryptos.utils import viz
+from kryptos.utils.viz import plt
 from kryptos import logger_group
 
 
@@ -67,10 +68,9 @@ def dump_summary_table_all_strategies(config, list_dfs, output_dir):
     print("\n\n")
 
     # Build the table
-    df_quant = pd.DataFrame()
-    for df in list_dfs:
-        df = quant_utils.build_row_table(df["results"], config, df["namespace"])
-        df_quant = df_quant.append(df, ignore_index=True)
+    df_quant = quant_utils.build_summary_table(
+        [df["results"] for df in list_dfs], config, [df["namespace"] for df in list_dfs]
+    )
 
     # Write to file
     f_path = os.path.join(ALGO_DIR, "backtest_summary.csv")
@@ -141,8 +141,8 @@ def dump_plots_to_file(namespace, df):
 
 
 def dump_metric_plot(metric, metric_name, save_folder):
-    ax = metric.plot(legend=metric_name)
+    ax = viz.downsample(metric).plot(legend=metric_name)
     f_name = metric_name.replace(" ", "_") + ".png"
     f_path = os.path.join(save_folder, f_name)
-    plt.savefig(f_path, bbox_inches="tight", dpi=300)
+    plt.savefig(f_path, bbox_inches="tight", dpi=viz.PLOT_DPI)
     plt.close()
@@ -1,6 +1,48 @@
 import datetime
+from itertools import chain
+
+import numpy as np
 import pandas as pd
 
+from kryptos.analysis.utils.risk_metrics import nanreduce as _nanreduce, exposure
+
+
+# columns of the summary table, in order
+SUMMARY_COLUMNS = [
+    "start_date",
+    "end_date",
+    "backtest_minutes",
+    "backtest_days",
+    "backtest_weeks",
+    "number_of_trades",
+    "average_trades_per_week_avg",
+    "average_trade_amount_usd",
+    "initial_capital",
+    "ending_capital",
+    "net_profit",
+    "net_profit_pct",
+    "average_daily_profit",
+    "average_daily_profit_pct",
+    "average_exposure",
+    "average_exposure_pct",
+    "net_risk_adjusted_return_pct",
+    "max_drawdown_pct_catalyst",
+    "max_daily_drawdown_pct",
+    "max_weekly_drawdown_pct",
+    "sharpe_ratio_avg",
+    "std_rolling_10_day_pct_avg",
+    "std_rolling_100_day_pct_avg",
+    "number_of_simulations",
+]
+
+# max cells of the padded 2D arrays summarized at once
+MAX_BATCH_CELLS = 10 ** 7
+
+DAY_NS = 24 * 60 * 60 * 10 ** 9
+
+# samples removed from the head of the sharpe ratio
+SHARPE_CUTOFF = 30
+
 
 def log_error(err_file, err_msg):
     with open(err_file, "a") as f:
@@ -9,89 +51,200 @@ def log_error(err_file, err_msg):
         f.write(str(err_msg) + "\n")
 
 
-def build_row_table(df, config=None, namespace=None):
+def result_arrays(df):
+    """Extracts the arrays summarized from a catalyst results dataframe
+
+    Returns:
+        dict -- period_open (int64 ns), portfolio_value, starting_exposure,
+            max_drawdown and sharpe float arrays, and trade_notional,
+            the absolute amount * price of every transaction
+    """
+    # bars of a resumed backtest before its checkpoint may have no transactions
+    transactions = list(chain.from_iterable(t for t in df.transactions.values if isinstance(t, list)))
+    amounts = np.fromiter((t["amount"] for t in transactions), dtype="float64", count=len(transactions))
+    prices = np.fromiter((t["price"] for t in transactions), dtype="float64", count=len(transactions))
+
+    return {
+        "period_open": pd.DatetimeIndex(df.period_open).asi8,
+        "portfolio_value": df.portfolio_value.values.astype("float64"),
+        "starting_exposure": df.starting_exposure.values.astype("float64"),
+        "max_drawdown": df.max_drawdown.values.astype("float64"),
+        "sharpe": df.sharpe.values.astype("float64"),
+        "trade_notional": np.abs(amounts * prices),
+    }
+
+
+def _padded(arrays, field, width):
+    out = np.full((len(arrays), width), np.nan)
+    for i, a in enumerate(arrays):
+        out[i, : len(a[field])] = a[field]
+    return out
+
+
+def _shifted_change_min(pv, periods):
+    """Min of (pv - pv.shift(periods)) / pv.shift(periods) of each row"""
+    if pv.shape[1] <= periods:
+        return np.full(len(pv), np.nan)
+    prev = pv[:, :-periods]
+    return _nanreduce(np.nanmin, (pv[:, periods:] - prev) / prev)
+
+
+def _rolling_std_pct_mean(pv, window):
+    """Mean of pv.rolling(window).std() / pv of each row
+
+    Windows are summed from cumulative sums of the row's deviations from its
+    mean, which keeps the sums small enough for float64. Windows containing a
+    missing value are NaN, like pandas with min_periods=window.
+    """
+    n_rows, width = pv.shape
+    if width < window:
+        return np.full(n_rows, np.nan)
+
+    missing = np.isnan(pv)
+    x = np.where(missing, 0, pv - _nanreduce(np.nanmean, pv)[:, None])
+
+    zeros = np.zeros((n_rows, 1))
+    c1 = np.hstack([zeros, np.cumsum(x, axis=1)])
+    c2 = np.hstack([zeros, np.cumsum(x * x, axis=1)])
+    cn = np.hstack([zeros, np.cumsum(missing, axis=1)])
+
+    s1 = c1[:, window:] - c1[:, :-window]
+    s2 = c2[:, window:] - c2[:, :-window]
+    var = np.maximum((s2 - s1 * s1 / window) / (window - 1), 0)
+    var[(cn[:, window:] - cn[:, :-window]) > 0] = np.nan
+
+    return _nanreduce(np.nanmean, np.sqrt(var) / pv[:, window - 1 :])
+
 
-    df_quant = pd.DataFrame(index=["Backtest"])
-
-    df_quant["start_date"] = df.period_open.min().strftime("%Y-%m-%d")
-    df_quant["end_date"] = df.period_open.max().strftime("%Y-%m-%d")
-    df_quant["backtest_minutes"] = (
-        ((df.period_open.max() - df.period_open.min()).seconds) / (60)
-    ) + (((df.period_open.max() - df.period_open.min()).seconds) / (60))
-    df_quant["backtest_days"] = (df.period_open.max() - df.period_open.min()).days + (
-        ((df.period_open.max() - df.period_open.min()).seconds) / (3600 * 24)
-    )
-    df_quant["backtest_weeks"] = df_quant.backtest_days / 7
-    ordered_trades = pd.DataFrame(
-        [
-            (t["dt"], t["price"], t["amount"])
-            for items in df.transactions.values
-            for t in items
-        ],
-        columns=["time", "price", "amount"],
-    )
-    df_quant["number_of_trades"] = int(len(ordered_trades) / 2)
-    df_quant["average_trades_per_week_avg"] = float(df_quant.number_of_trades) / float(
-        df_quant.backtest_weeks
-    )
-    if int(df_quant.number_of_trades):
-        df_quant["average_trade_amount_usd"] = (
-            ordered_trades.amount * ordered_trades.price
-        ).abs().mean() / float(df_quant.number_of_trades)
-    else:
-        df_quant["average_trade_amount_usd"] = float("nan")
-
-    df_quant["initial_capital"] = df.portfolio_value[0]
-    df_quant["ending_capital"] = df.portfolio_value[-1]
-    df_quant["net_profit"] = df_quant.ending_capital - df_quant.initial_capital
-    df_quant["net_profit_pct"] = (
-        (df_quant.ending_capital - df_quant.initial_capital)
-        / df_quant.initial_capital
-        * 100
-    )
-    df_quant["average_daily_profit"] = df_quant.net_profit / df_quant.backtest_days
-    df_quant["average_daily_profit_pct"] = (
-        df_quant.net_profit_pct / df_quant.backtest_days
-    )
-    # df_quant['average_weekly_profit'] = df_quant.net_profit / df_quant.backtest_weeks
-    # df_quant['average_weekly_profit_pct'] = df_quant.net_profit_pct / df_quant.backtest_weeks
-
-    df_quant["average_exposure"] = df.starting_exposure.mean()
-    df_quant["average_exposure_pct"] = (
-        df.starting_exposure / df.portfolio_value
-    ).mean() * 100
-
-    df_quant["net_risk_adjusted_return_pct"] = (
-        df_quant.net_profit / df_quant.average_exposure
-    )
-    df_quant["max_drawdown_pct_catalyst"] = df.max_drawdown.min() * 100
-    # Note: shifted series represents the previous day
-    # Equivalent to (df.portfolio_value.diff()/df.portfolio_value.shift(1)).min()
-    df_quant["max_daily_drawdown_pct"] = (
-        (df.portfolio_value - df.portfolio_value.shift(1)) / df.portfolio_value.shift(1)
-    ).min() * 100
-    df_quant["max_weekly_drawdown_pct"] = (
-        (df.portfolio_value - df.portfolio_value.shift(7)) / df.portfolio_value.shift(7)
-    ).min() * 100
-    # Note: removing first 30 samples of sharpe ratio
-    df_quant["sharpe_ratio_avg"] = df.sharpe[30:].mean()
-    df_quant["std_rolling_10_day_pct_avg"] = (
-        df.portfolio_value.rolling(10).std() / df.portfolio_value
-    ).mean()
-    df_quant["std_rolling_100_day_pct_avg"] = (
-        df.portfolio_value.rolling(100).std() / df.portfolio_value
-    ).mean()
-
-    df_quant["number_of_simulations"] = df.shape[0]
+def _summarize_chunk(arrays):
+    lengths = np.array([len(a["portfolio_value"]) for a in arrays])
+    rows = np.arange(len(arrays))
+    width = lengths.max()
+
+    pv = _padded(arrays, "portfolio_value", width)
+    exposure_values = _padded(arrays, "starting_exposure", width)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first_open = np.array([a["period_open"].min() for a in arrays])
+        last_open = np.array([a["period_open"].max() for a in arrays])
+        delta = last_open - first_open
+        # seconds of the timedelta's day remainder, as in datetime.timedelta.seconds
+        seconds = (delta // 10 ** 9) % (24 * 60 * 60)
+        backtest_days = delta // DAY_NS + seconds / (24 * 60 * 60)
+        backtest_weeks = backtest_days / 7
+
+        trade_counts = np.array([len(a["trade_notional"]) for a in arrays])
+        number_of_trades = trade_counts // 2
+        notional_mean = np.array(
+            [a["trade_notional"].mean() if len(a["trade_notional"]) else np.nan for a in arrays]
+        )
+
+        initial = pv[:, 0]
+        ending = pv[rows, lengths - 1]
+        net_profit = ending - initial
+        net_profit_pct = net_profit / initial * 100
+        average_exposure = _nanreduce(np.nanmean, exposure_values)
+
+        cols = {
+            "start_date": [pd.Timestamp(t).strftime("%Y-%m-%d") for t in first_open],
+            "end_date": [pd.Timestamp(t).strftime("%Y-%m-%d") for t in last_open],
+            "backtest_minutes": seconds / 60 * 2,
+            "backtest_days": backtest_days,
+            "backtest_weeks": backtest_weeks,
+            "number_of_trades": number_of_trades,
+            "average_trades_per_week_avg": number_of_trades / backtest_weeks,
+            "average_trade_amount_usd": np.where(
+                number_of_trades > 0, notional_mean / number_of_trades, np.nan
+            ),
+            "initial_capital": initial,
+            "ending_capital": ending,
+            "net_profit": net_profit,
+            "net_profit_pct": net_profit_pct,
+            "average_daily_profit": net_profit / backtest_days,
+            "average_daily_profit_pct": net_profit_pct / backtest_days,
+            "average_exposure": average_exposure,
+            "average_exposure_pct": exposure(exposure_values, pv) * 100,
+            "net_risk_adjusted_return_pct": net_profit / average_exposure,
+            "max_drawdown_pct_catalyst": _nanreduce(
+                np.nanmin, _padded(arrays, "max_drawdown", width)
+            ) * 100,
+            "max_daily_drawdown_pct": _shifted_change_min(pv, 1) * 100,
+            "max_weekly_drawdown_pct": _shifted_change_min(pv, 7) * 100,
+            "sharpe_ratio_avg": _nanreduce(
+                np.nanmean, _padded(arrays, "sharpe", width)[:, SHARPE_CUTOFF:]
+            ),
+            "std_rolling_10_day_pct_avg": _rolling_std_pct_mean(pv, 10),
+            "std_rolling_100_day_pct_avg": _rolling_std_pct_mean(pv, 100),
+            "number_of_simulations": lengths,
+        }
+    return cols
+
+
+def summarize(arrays, max_cells=MAX_BATCH_CELLS):
+    """Computes the summary metrics of many result sets at once
+
+    Result sets are sorted by length and summarized in chunks of NaN padded
+    2D arrays, one row per result set, so each metric is a single numpy
+    operation over the chunk.
+
+    Arguments:
+        arrays {list} -- dicts returned by result_arrays
+
+    Returns:
+        dict -- SUMMARY_COLUMNS to arrays, in the order of the result sets
+    """
+    order = sorted(range(len(arrays)), key=lambda i: len(arrays[i]["portfolio_value"]))
+    chunks, chunk = [], []
+    for i in order:
+        width = len(arrays[i]["portfolio_value"])
+        if chunk and (len(chunk) + 1) * width > max_cells:
+            chunks.append(chunk)
+            chunk = []
+        chunk.append(i)
+    if chunk:
+        chunks.append(chunk)
+
+    cols = {c: [] for c in SUMMARY_COLUMNS}
+    for chunk in chunks:
+        chunk_cols = _summarize_chunk([arrays[i] for i in chunk])
+        for c in SUMMARY_COLUMNS:
+            cols[c].extend(chunk_cols[c])
+
+    # back to the order of the result sets
+    position = np.argsort(order)
+    return {c: np.asarray(v)[position] for c, v in cols.items()}
+
+
+def build_summary_table(dfs, config=None, namespaces=None):
+    """Returns one summary row per catalyst results dataframe
+
+    Arguments:
+        dfs {list} -- catalyst results dataframes
+
+    Keyword Arguments:
+        config {dict} -- trading config shared by the results (default: {None})
+        namespaces {list} -- namespace of each result (default: {None})
+
+    Returns:
+        pandas.DataFrame
+    """
+    cols = summarize([result_arrays(df) for df in dfs])
+    df_quant = pd.DataFrame(cols, columns=SUMMARY_COLUMNS)
 
     if config:
         df_quant["data_freq"] = config["DATA_FREQ"]  # minute / daily
         df_quant["asset"] = config["ASSET"]  # btc_usd
         df_quant["exchange"] = config["EXCHANGE"]  # poloniex
-        df_quant["history_freq"] = config["HISTORY_FREQ"]  #  1d
-        # df_quant['input_params'] =
+        df_quant["history_freq"] = config["HISTORY_FREQ"]  #  1d
+
+    if namespaces:
+        df_quant["namespace"] = namespaces
 
-    if namespace:
-        df_quant["namespace"] = namespace
+    return df_quant
 
+
+def build_row_table(df, config=None, namespace=None):
+    namespaces = [namespace] if namespace else None
+    df_quant = build_summary_table([df], config, namespaces)
+    df_quant.index = ["Backtest"]
     return df_quant
@@ -0,0 +1,109 @@
+import warnings
+
+import numpy as np
+
+
+# keys of the dict returned by risk_metrics
+RISK_METRICS = [
+    "sharpe_ratio",
+    "sortino_ratio",
+    "sharpe_ratio_benchmark",
+    "sortino_ratio_benchmark",
+    "max_drawdown",
+    "exposure",
+]
+
+
+def nanreduce(func, values, axis=-1, **kw):
+    """Applies a numpy nan reduction, all-NaN slices reduce to NaN like pandas, without the warning"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return func(values, axis=axis, **kw)
+
+
+def _ratio(num, den):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / den, np.nan)
+
+
+def sharpe_ratio(returns, axis=-1):
+    """Mean over sample standard deviation of the returns, NaN when constant"""
+    return _ratio(nanreduce(np.nanmean, returns, axis), nanreduce(np.nanstd, returns, axis, ddof=1))
+
+
+def downside_deviation(returns, axis=-1):
+    """Root mean square of the negative returns"""
+    with np.errstate(invalid="ignore"):
+        negative = np.where(returns < 0, returns ** 2, np.nan)
+    return np.sqrt(nanreduce(np.nanmean, negative, axis))
+
+
+def sortino_ratio(returns, downside=None, axis=-1):
+    """Mean of the returns over the downside deviation
+
+    Keyword Arguments:
+        downside {np.ndarray} -- downside deviation, computed from returns if None
+    """
+    if downside is None:
+        downside = downside_deviation(returns, axis)
+    return _ratio(nanreduce(np.nanmean, returns, axis), downside)
+
+
+def max_drawdown(portfolio_value, axis=-1):
+    """Largest fall from a previous peak, as a negative fraction of the peak"""
+    peak = np.fmax.accumulate(portfolio_value, axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return nanreduce(np.nanmin, portfolio_value / peak - 1, axis)
+
+
+def exposure(starting_exposure, portfolio_value, axis=-1):
+    """Mean fraction of the portfolio value held in positions"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return nanreduce(np.nanmean, starting_exposure / portfolio_value, axis)
+
+
+def risk_metrics(returns, benchmark_returns=None, portfolio_value=None, starting_exposure=None):
+    """Computes the risk metrics of already masked arrays in one pass
+
+    All arrays must be aligned, missing values are NaN. Arrays may be 1D
+    (one result set) or 2D (one row per result set).
+
+    Arguments:
+        returns {np.ndarray} -- algorithm returns
+
+    Keyword Arguments:
+        benchmark_returns {np.ndarray} -- benchmark returns for the relative ratios (default: {None})
+        portfolio_value {np.ndarray} -- for the max drawdown and exposure (default: {None})
+        starting_exposure {np.ndarray} -- value of the positions (default: {None})
+
+    Returns:
+        dict -- RISK_METRICS to values, NaN when not computable
+    """
+    returns = np.asarray(returns, dtype="float64")
+    nan = np.full(returns.shape[:-1], np.nan)
+
+    # the benchmark relative sortino shares the algorithm's downside deviation
+    downside = downside_deviation(returns)
+    metrics = {
+        "sharpe_ratio": sharpe_ratio(returns),
+        "sortino_ratio": sortino_ratio(returns, downside),
+        "sharpe_ratio_benchmark": nan,
+        "sortino_ratio_benchmark": nan,
+        "max_drawdown": nan,
+        "exposure": nan,
+    }
+
+    if benchmark_returns is not None:
+        excess = returns - np.asarray(benchmark_returns, dtype="float64")
+        metrics["sharpe_ratio_benchmark"] = sharpe_ratio(excess)
+        metrics["sortino_ratio_benchmark"] = sortino_ratio(excess, downside)
+
+    if portfolio_value is not None:
+        portfolio_value = np.asarray(portfolio_value, dtype="float64")
+        metrics["max_drawdown"] = max_drawdown(portfolio_value)
+        if starting_exposure is not None:
+            metrics["exposure"] = exposure(np.asarray(starting_exposure, dtype="float64"), portfolio_value)
+
+    if returns.ndim == 1:
+        metrics = {k: float(v) for k, v in metrics.items()}
+    return metrics
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+# Aggregates maintained by default, next to the base bars
+DEFAULT_RESOLUTIONS = ["5T", "15T", "1H", "4H", "1D"]
+
+EPOCH = pd.Timestamp("1970-01-01", tz="utc")
+
+
+def _to_ns(ts):
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("utc")
+    return ts.value
+
+
+class _Bars(object):
+
+    def __init__(self, capacity=1024):
+        """Growable column buffers of bars labelled by their close time (int64 ns)"""
+        self.n = 0
+        self.times = np.empty(capacity, dtype="int64")
+        self.cols = {f: np.empty(capacity, dtype="float64") for f in FIELDS}
+
+    def _reserve(self, size):
+        if size <= len(self.times):
+            return
+        capacity = max(size, 2 * len(self.times))
+        self.times = np.resize(self.times, capacity)
+        for f in FIELDS:
+            self.cols[f] = np.resize(self.cols[f], capacity)
+
+    def append(self, times, cols):
+        size = self.n + len(times)
+        self._reserve(size)
+        self.times[self.n:size] = times
+        for f in FIELDS:
+            self.cols[f][self.n:size] = cols[f]
+        self.n = size
+
+    @property
+    def last_time(self):
+        return self.times[self.n - 1] if self.n else None
+
+
+def _aggregate(times, cols, res, anchor):
+    """Aggregates consecutive base bars into bars of res ns aligned on anchor
+
+    A base bar labelled t belongs to the bar closing at the first
+    anchor + k * res greater or equal to t.
+    """
+    buckets = -((anchor - times) // res)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+
+    out = {
+        "open": cols["open"][starts],
+        "high": np.fmax.reduceat(cols["high"], starts),
+        "low": np.fmin.reduceat(cols["low"], starts),
+        "close": cols["close"][ends],
+        "volume": np.add.reduceat(np.nan_to_num(cols["volume"]), starts),
+    }
+    return anchor + buckets[starts] * res, out
+
+
+class BarStore(object):
+
+    def __init__(self, base_freq="1T", resolutions=DEFAULT_RESOLUTIONS):
+        """Base bars with incrementally maintained OHLCV aggregates
+
+        Bars are appended once, as they close (live) or as they are
+        fetched from the bundle (backtest), and every registered resolution
+        is updated with the new bars only. History at any resolution is then
+        a single slice of preallocated arrays.
+
+        Bars are labelled by their close time, like catalyst's history.
+
+        Keyword Arguments:
+            base_freq {str} -- frequency of the appended bars (default: {"1T"})
+            resolutions {list} -- aggregates to maintain (default: {DEFAULT_RESOLUTIONS})
+        """
+        self.base_freq = base_freq
+        self.base_res = pd.Timedelta(base_freq).value
+        self._base = _Bars()
+        self._aggregates = {}
+
+        for freq in resolutions:
+            if pd.Timedelta(freq).value % self.base_res == 0:
+                self.add_resolution(freq)
+
+    @property
+    def last_time(self):
+        last = self._base.last_time
+        return None if last is None else pd.Timestamp(last, tz="utc")
+
+    def _key(self, freq, offset):
+        return (pd.Timedelta(freq).value, pd.Timedelta(offset or 0).value)
+
+    def add_resolution(self, freq, offset=None):
+        """Registers an aggregate, built from the base bars already stored
+
+        Arguments:
+            freq {str} -- pandas frequency, multiple of the base frequency (ex. "5T")
+
+        Keyword Arguments:
+            offset {str|pd.Timedelta} -- shift of the bar boundaries from midnight UTC (ex. "1T")
+        """
+        key = self._key(freq, offset)
+        if key[0] % self.base_res:
+            raise ValueError(f"{freq} is not a multiple of the base frequency {self.base_freq}")
+
+        if key not in self._aggregates and (key[0] != self.base_res or key[1]):
+            bars = _Bars()
+            if self._base.n:
+                n = self._base.n
+                times, cols = _aggregate(
+                    self._base.times[:n],
+                    {f: c[:n] for f, c in self._base.cols.items()},
+                    key[0],
+                    EPOCH.value + key[1],
+                )
+                bars.append(times, cols)
+            self._aggregates[key] = bars
+        return key
+
+    def _drop_last(self):
+        """Removes the last base bar, rebuilding the aggregates it belonged to"""
+        self._base.n -= 1
+        n = self._base.n
+        for (res, offset), bars in self._aggregates.items():
+            if not bars.n:
+                continue
+            # base bars still stored in the last aggregate's bucket
+            first = np.searchsorted(self._base.times[:n], bars.last_time - res, side="right")
+            if first == n:
+                bars.n -= 1
+                continue
+            _, agg = _aggregate(
+                self._base.times[first:n],
+                {f: c[first:n] for f, c in self._base.cols.items()},
+                res,
+                EPOCH.value + offset,
+            )
+            for f in FIELDS:
+                bars.cols[f][bars.n - 1] = agg[f][-1]
+
+    def extend(self, df):
+        """Appends the bars of df newer than the last stored bar
+
+        A bar labelled like the last stored bar replaces it, live histories
+        end with the bar still forming, which is fetched again once closed.
+
+        Arguments:
+            df {pandas.DataFrame} -- bars with open, high, low, close and volume columns
+        """
+        if df is None or df.empty:
+            return
+
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None:
+            index = index.tz_localize("utc")
+        times = index.asi8
+
+        last = self._base.last_time
+        if last is not None:
+            new = times >= last
+            if not new.any():
+                return
+            df, times = df[new], times[new]
+            if times[0] == last:
+                self._drop_last()
+
+        cols = {f: df[f].values.astype("float64") for f in FIELDS}
+        self._base.append(times, cols)
+
+        for (res, offset), bars in self._aggregates.items():
+            labels, agg = _aggregate(times, cols, res, EPOCH.value + offset)
+
+            # the first new bars may complete the last stored aggregate
+            if bars.n and labels[0] == bars.last_time:
+                i = bars.n - 1
+                bars.cols["high"][i] = np.fmax(bars.cols["high"][i], agg["high"][0])
+                bars.cols["low"][i] = np.fmin(bars.cols["low"][i], agg["low"][0])
+                bars.cols["close"][i] = agg["close"][0]
+                bars.cols["volume"][i] += agg["volume"][0]
+                labels = labels[1:]
+                agg = {f: v[1:] for f, v in agg.items()}
+
+            bars.append(labels, agg)
+
+    def append(self, dt, open, high, low, close, volume):
+        """Appends a single closed bar"""
+        self.extend(
+            pd.DataFrame(
+                {"open": [open], "high": [high], "low": [low], "close": [close], "volume": [volume]},
+                index=pd.DatetimeIndex([pd.Timestamp(dt)]),
+            )
+        )
+
+    def history(self, freq, bar_count, end=None, offset=None):
+        """Returns the last bar_count bars closed at or before end
+
+        Arguments:
+            freq {str} -- resolution of the bars, registered or equal to the base frequency
+            bar_count {int} -- number of bars
+
+        Keyword Arguments:
+            end {datetime-like} -- (default: last stored bar)
+            offset {str|pd.Timedelta} -- offset of the resolution (default: None)
+
+        Returns:
+            pandas.DataFrame -- price, open, high, low, close and volume columns
+        """
+        key = self._key(freq, offset)
+        if key[0] == self.base_res and not key[1]:
+            bars = self._base
+        elif key in self._aggregates:
+            bars = self._aggregates[key]
+        else:
+            bars = self._aggregates[self.add_resolution(freq, offset)]
+
+        hi = bars.n
+        if end is not None:
+            hi = np.searchsorted(bars.times[: bars.n], _to_ns(end), side="right")
+        lo = max(hi - bar_count, 0)
+
+        df = pd.DataFrame(
+            {f: bars.cols[f][lo:hi] for f in FIELDS},
+            index=pd.DatetimeIndex(bars.times[lo:hi], tz="utc"),
+            columns=FIELDS,
+        )
+        df.insert(0, "price", df["close"])
+        return df
@@ -1,15 +1,25 @@
 import os
 import csv
+import datetime
 import quandl
+import pandas as pd
+from logbook import Logger
 
+from kryptos import logger_group
 from kryptos.data import csv_data
+from kryptos.data.column_store import ColumnStore
 
 API_KEY = os.getenv("QUANDL_API_KEY")
 DATA_DIR = os.path.dirname(os.path.abspath(csv_data.__file__))
 QUANDL_DIR = os.path.join(DATA_DIR, "quandl")
 
+STORE_DIR = os.path.join(QUANDL_DIR, "store")
+
 quandl.ApiConfig.api_key = API_KEY
 
+log = Logger("QuandlClient")
+logger_group.add_logger(log)
+
 
 def code_csv():
     return os.path.join(QUANDL_DIR, "BCHAIN-datasets-codes.csv")
@@ -36,9 +46,15 @@ def fetch_datasets(
 
     Returns pandas Dataframe
     """
-
-    codes = codes_from_csv()
-    df = quandl.get(codes)
+    kwargs = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "collapse": collapse,
+        "transformation": transformation,
+        "rows": rows,
+    }
+    kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    df = quandl.get(codes, **kwargs)
     return df
 
 
@@ -49,9 +65,81 @@ def clean_dataframe(df):
     return df
 
 
-def fetch_all():
-    codes = codes_from_csv()
-    df = fetch_datasets(codes)
-    df = clean_dataframe(df)
+def get_store():
+    return ColumnStore(STORE_DIR)
+
+
+def _seed_store(store):
+    """Imports a previously downloaded data.csv into an empty store"""
+    if store.exists or not os.path.exists(data_csv()):
+        return
+    log.info("Importing {} into column store".format(data_csv()))
+    df = pd.read_csv(data_csv(), index_col=[0], parse_dates=True)
+    df = df.drop("Symbol", axis=1, errors="ignore")
+    last_dates = {c: str(df[c].last_valid_index().date()) for c in df.columns if df[c].notnull().any()}
+    store.write(df, meta={"last_dates": last_dates})
 
-    df.to_csv(data_csv(), mode="w")
+
+def fetch_all(end_date=None):
+    """Incrementally updates the quandl column store
+
+    Only the dates after the last stored value of each dataset are requested.
+    Datasets sharing the same last date are fetched in a single request.
+
+    Keyword Arguments:
+        end_date {datetime-like} -- last date to fetch (default: today)
+    """
+    store = get_store()
+    end_date = pd.Timestamp(end_date or datetime.date.today()).date()
+
+    with store.lock():
+        _seed_store(store)
+        last_dates = store.meta.get("last_dates", {})
+
+        # group codes by the first date missing from the store
+        groups = {}
+        for code in codes_from_csv():
+            col = code.replace("BCHAIN/", "")
+            last = last_dates.get(col)
+            start = None if last is None else pd.Timestamp(last).date() + datetime.timedelta(days=1)
+            if start is not None and start > end_date:
+                continue
+            groups.setdefault(start, []).append(code)
+
+        if not groups:
+            log.debug("Quandl store is up to date")
+            return
+
+        new_frames = []
+        for start, codes in groups.items():
+            log.info("Fetching {} quandl datasets from {}".format(len(codes), start or "the beginning"))
+            df = fetch_datasets(codes, start_date=start, end_date=end_date)
+            df = clean_dataframe(df).drop("Symbol", axis=1)
+            new_frames.append(df)
+
+        df = store.read()
+        for new in new_frames:
+            df = df.combine_first(new)
+
+        for col in df.columns:
+            if df[col].notnull().any():
+                last_dates[col] = str(df[col].last_valid_index().date())
+
+        store.write(df, meta={"last_dates": last_dates})
+
+
+def load(columns, start=None, end=None):
+    """Loads the requested datasets for the given date range from the store"""
+    store = get_store()
+    if not store.exists:
+        fetch_all()
+    return store.read(columns, start, end)
+
+
+def date_range():
+    """Returns the first and last dates stored"""
+    store = get_store()
+    if not store.exists:
+        with store.lock():
+            _seed_store(store)
+    return store.date_range()
@@ -0,0 +1,178 @@
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from pytrends.request import TrendReq
+from logbook import Logger
+
+from kryptos import logger_group
+from kryptos.data import csv_data
+
+
+DATA_DIR = os.path.dirname(os.path.abspath(csv_data.__file__))
+TRENDS_DIR = os.path.join(DATA_DIR, "google_trends")
+
+# Seconds before a cached timeframe is fetched again
+CACHE_TTL = 60 * 60 * 24
+
+# Google rate limits aggressive clients, so requests are spaced out
+# even when several timeframes are fetched concurrently
+MAX_WORKERS = 4
+MIN_REQUEST_INTERVAL = 1.0
+
+
+log = Logger("TrendsClient")
+logger_group.add_logger(log)
+
+
+class PyTrendsClient(object):
+
+    def __init__(self, hl="en-US", tz=360):
+        """Default client, fetches interest over time with pytrends
+
+        TrendReq keeps the payload of the last request, so each
+        thread uses its own instance.
+        """
+        self.hl = hl
+        self.tz = tz
+        self._local = threading.local()
+
+    @property
+    def trends(self):
+        if not hasattr(self._local, "trends"):
+            self._local.trends = TrendReq(hl=self.hl, tz=self.tz)
+        return self._local.trends
+
+    def interest_over_time(self, keywords, timeframe, geo=""):
+        self.trends.build_payload(list(keywords), cat=0, timeframe=timeframe, geo=geo, gprop="")
+        return self.trends.interest_over_time()
+
+
+class RateLimiter(object):
+
+    def __init__(self, min_interval=MIN_REQUEST_INTERVAL):
+        """Thread safe limiter ensuring a minimum delay between requests"""
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last = 0.0
+
+    def wait(self):
+        with self._lock:
+            delay = self._last + self.min_interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self._last = time.time()
+
+
+class TrendsCache(object):
+
+    def __init__(self, path=TRENDS_DIR, ttl=CACHE_TTL):
+        """Cache of trend frames keyed by (keywords, timeframe, geo)
+
+        Frames are kept in memory and pickled to disk, so they
+        are shared by strategies using the same keywords and dates,
+        and survive worker restarts.
+
+        Keyword Arguments:
+            path {str} -- directory of the persisted frames (default: {TRENDS_DIR})
+            ttl {int} -- seconds before an entry expires (default: {CACHE_TTL})
+        """
+        self.path = path
+        self.ttl = ttl
+        self._frames = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.path, "{}.pkl".format(digest))
+
+    @staticmethod
+    def make_key(keywords, timeframe, geo=""):
+        return (tuple(sorted(keywords)), timeframe, geo)
+
+    def get(self, key):
+        with self._lock:
+            cached = self._frames.get(key)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            return cached[1]
+
+        f = self._file(key)
+        if os.path.exists(f) and time.time() - os.path.getmtime(f) < self.ttl:
+            df = pd.read_pickle(f)
+            with self._lock:
+                self._frames[key] = (os.path.getmtime(f), df)
+            return df
+
+        return None
+
+    def set(self, key, df):
+        with self._lock:
+            self._frames[key] = (time.time(), df)
+        tmp = self._file(key) + ".tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, self._file(key))
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TrendsCache()
+    return _default_cache
+
+
+def fetch_timeframes(keywords, timeframes, geo="", client=None, cache=None, max_workers=MAX_WORKERS):
+    """Fetches the interest over time of keywords for each timeframe
+
+    Cached timeframes are returned without any request, missing ones are
+    fetched concurrently while respecting the client rate limit.
+
+    Arguments:
+        keywords {list} -- search terms
+        timeframes {list} -- pytrends timeframes ("YYYY-MM-DD YYYY-MM-DD")
+
+    Keyword Arguments:
+        geo {str} -- geographic location (default: worldwide)
+        client -- object providing interest_over_time(keywords, timeframe, geo) (default: PyTrendsClient)
+        cache {TrendsCache} -- (default: shared module cache)
+        max_workers {int} -- concurrent requests (default: {MAX_WORKERS})
+
+    Returns:
+        list -- pandas.DataFrame for each timeframe, in order
+    """
+    client = client or PyTrendsClient()
+    cache = cache or default_cache()
+    limiter = RateLimiter()
+
+    results = [None] * len(timeframes)
+    missing = []
+    for i, t in enumerate(timeframes):
+        df = cache.get(cache.make_key(keywords, t, geo))
+        if df is None:
+            missing.append(i)
+        else:
+            results[i] = df
+
+    log.debug("{} cached, {} to fetch".format(len(timeframes) - len(missing), len(missing)))
+
+    def _fetch(i):
+        t = timeframes[i]
+        limiter.wait()
+        log.info("Fetching trend data for {}".format(t))
+        df = client.interest_over_time(keywords, t, geo)
+        if not df.empty:
+            cache.set(cache.make_key(keywords, t, geo), df)
+        return df
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for i, df in zip(missing, pool.map(_fetch, missing)):
+                results[i] = df
+
+    return results
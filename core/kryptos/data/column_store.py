@@ -0,0 +1,190 @@
+import os
+import json
+import uuid
+import shutil
+import fcntl
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from logbook import Logger
+
+from kryptos import logger_group
+
+
+log = Logger("ColumnStore")
+logger_group.add_logger(log)
+
+
+def _naive(value):
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return np.datetime64(ts.value, "ns")
+
+
+class ColumnStore(object):
+
+    def __init__(self, path):
+        """On-disk columnar store of a date indexed dataframe
+
+        Each column is saved as its own .npy array next to a shared
+        sorted datetime index, so readers can memory map the index
+        and only the columns they need, and slice the requested date
+        range without parsing the whole dataset.
+
+        Writes produce a new version directory and atomically swap the
+        CURRENT pointer, so any number of worker processes can keep
+        reading a consistent version while the store is updated.
+
+        Arguments:
+            path {str} -- directory of the store
+        """
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    @property
+    def _pointer_file(self):
+        return os.path.join(self.path, "CURRENT")
+
+    @property
+    def _lock_file(self):
+        return os.path.join(self.path, ".lock")
+
+    def _version_dir(self):
+        if not os.path.exists(self._pointer_file):
+            return None
+        with open(self._pointer_file, "r") as f:
+            version = f.read().strip()
+        return os.path.join(self.path, version)
+
+    @property
+    def exists(self):
+        return self._version_dir() is not None
+
+    @contextmanager
+    def lock(self):
+        """Serializes writers across processes, readers never block"""
+        with open(self._lock_file, "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_meta(version_dir):
+        if version_dir is None:
+            return {}
+        with open(os.path.join(version_dir, "meta.json"), "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _read_index(version_dir):
+        if version_dir is None:
+            return np.array([], dtype="datetime64[ns]")
+        return np.load(os.path.join(version_dir, "index.npy"), mmap_mode="r")
+
+    @property
+    def meta(self):
+        return self._read_meta(self._version_dir())
+
+    @property
+    def columns(self):
+        return self.meta.get("columns", [])
+
+    def index(self):
+        """Returns the memory mapped datetime64 index"""
+        return self._read_index(self._version_dir())
+
+    def date_range(self):
+        """Returns the first and last dates of the store, or (None, None) if empty"""
+        index = self.index()
+        if len(index) == 0:
+            return None, None
+        return pd.Timestamp(index[0]), pd.Timestamp(index[-1])
+
+    def read(self, columns=None, start=None, end=None):
+        """Loads the requested columns within [start, end] via memory mapping
+
+        Keyword Arguments:
+            columns {list} -- columns to load (default: all columns)
+            start {datetime-like} -- first date to load (default: first stored date)
+            end {datetime-like} -- last date to load (default: last stored date)
+
+        Returns:
+            pandas.DataFrame
+        """
+        # resolved once, a concurrent write can't mix two versions in one read
+        version_dir = self._version_dir()
+        stored = self._read_meta(version_dir).get("columns", [])
+        if columns is None:
+            columns = stored
+
+        if version_dir is None:
+            return pd.DataFrame(columns=columns)
+
+        missing = set(columns) - set(stored)
+        if missing:
+            raise KeyError("Columns not found in store: {}".format(sorted(missing)))
+
+        index = self._read_index(version_dir)
+        lo, hi = 0, len(index)
+        if start is not None:
+            lo = np.searchsorted(index, _naive(start), side="left")
+        if end is not None:
+            hi = np.searchsorted(index, _naive(end), side="right")
+
+        data = {}
+        for c in columns:
+            arr = np.load(os.path.join(version_dir, "{}.npy".format(c)), mmap_mode="r")
+            data[c] = np.array(arr[lo:hi])
+
+        return pd.DataFrame(data, index=pd.DatetimeIndex(np.array(index[lo:hi])), columns=columns)
+
+    def write(self, df, meta=None):
+        """Writes df as a new version of the store
+
+        Must be called while holding lock() if other processes can write.
+
+        Arguments:
+            df {pandas.DataFrame} -- date indexed numeric data
+
+        Keyword Arguments:
+            meta {dict} -- extra metadata saved alongside the columns
+        """
+        df = df.sort_index()
+        previous_dir = self._version_dir()
+
+        version = "v-{}".format(uuid.uuid4().hex)
+        version_dir = os.path.join(self.path, version)
+        os.makedirs(version_dir)
+
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        index = index.values.astype("datetime64[ns]")
+        np.save(os.path.join(version_dir, "index.npy"), index)
+        for c in df.columns:
+            np.save(os.path.join(version_dir, "{}.npy".format(c)), df[c].values.astype("float64"))
+
+        meta = dict(meta or {})
+        meta["columns"] = list(df.columns)
+        with open(os.path.join(version_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        tmp_pointer = self._pointer_file + ".tmp"
+        with open(tmp_pointer, "w") as f:
+            f.write(version)
+        os.replace(tmp_pointer, self._pointer_file)
+        log.debug("Wrote {} rows to {}".format(len(df), version_dir))
+
+        self._remove_old_versions(keep=[version_dir, previous_dir])
+
+    def _remove_old_versions(self, keep):
+        # the previous version is kept for readers that loaded the old pointer
+        # older versions can be removed, memory mapped files remain readable
+        for d in os.listdir(self.path):
+            full = os.path.join(self.path, d)
+            if d.startswith("v-") and full not in keep:
+                shutil.rmtree(full, ignore_errors=True)
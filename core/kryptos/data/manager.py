@@ -5,21 +5,21 @@ import datetime
 from dateutil.rrule import rrule, MONTHLY, WEEKLY, DAILY
 from dateutil.relativedelta import relativedelta
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
 import logbook
 from catalyst.api import record
-from pytrends.request import TrendReq
 import quandl
 
 
 # from kryptos.config import self.config
 from kryptos.data import csv_data
-from kryptos.data.clients import quandl_client
+from kryptos.data.clients import quandl_client, trends_client
 from kryptos.utils import viz
+from kryptos.utils.viz import plt
 from kryptos.strategy.indicators import basic, technical
 from kryptos.strategy import DEFAULT_CONFIG
+from kryptos.settings import AVAILABLE_DATASETS
 from kryptos import logger_group
 
 from logbook import Logger
@@ -27,7 +27,6 @@ from logbook import Logger
 
 DATA_DIR = os.path.dirname(os.path.abspath(csv_data.__file__))
 
-AVAILABLE_DATASETS = ["google", "quandl"]
 
 
 def get_data_manager(name, cols=None, config=None):
@@ -90,6 +89,7 @@ class DataManager(object):
 
         index = pd.date_range(start=self.START, end=self.END)
         self.df = pd.DataFrame(index=index)
+        self._build_index()
 
         self._indicators = []
         self._indicator_map = {}
@@ -101,6 +101,38 @@ class DataManager(object):
     def fetch_data(self):
         pass
 
+    def _build_index(self):
+        """Builds the date to row index and column arrays of self.df
+
+        Must be called whenever self.df is replaced (i.e. at the end of fetch_data)
+        so that calculate and record_data can access rows by position.
+        Duplicated dates, caused by overlapping date steps, are averaged once here.
+        """
+        df = self.df
+        dates = pd.DatetimeIndex(df.index)
+        if dates.tz is not None:
+            dates = dates.tz_convert(None)
+        dates = dates.normalize()
+
+        if dates.has_duplicates:
+            df = df.groupby(dates).mean()
+        else:
+            df = df.set_index(dates)
+
+        self._deduped = df
+        self._dates = df.index
+        self._row_by_date = {d.date(): i for i, d in enumerate(df.index)}
+        self._arrays = {c: df[c].values for c in df.columns}
+
+    def _position(self, date):
+        """Returns the row of the last date up to the provided date, or None"""
+        pos = self._row_by_date.get(date)
+        if pos is None:
+            pos = self._dates.searchsorted(pd.Timestamp(date), side="right") - 1
+            if pos < 0:
+                return None
+        return pos
+
     def serialize(self):
         return {
             "name": self.name,
@@ -168,13 +200,17 @@ class DataManager(object):
         """
         self.current_date = context.blotter.current_dt.date()
 
+        pos = self._position(self.current_date)
+        end = 0 if pos is None else pos + 1
+
         # Assuming only use of basic indicators for now
         # Basic indicators accept a series as opposed to a df with technical indicators
         for i in self._indicators:
             for col in self._indicator_map[i.name]:
                 self.log.debug("Calculating {} for {}".format(i.name, col))
                 try:
-                    col_vals = self.df_to_date(self.current_date)[col]
+                    # expanding window view of the column up to the current date
+                    col_vals = self._deduped[col].iloc[:end]
                     i.calculate(col_vals)
                     i.record()
                 except KeyError:
@@ -203,15 +239,13 @@ class DataManager(object):
         date = context.blotter.current_dt.date()
         record_payload = {}
 
-        if date not in self.df.index:
+        pos = self._row_by_date.get(date)
+        if pos is None:
             raise ValueError("No {} data found for {}".format(self.name, date))
 
         for k in self.columns:
-            current_val = self.column_by_date(k, date)
-            # TODO: some dates are doubled due to smaller date steps
-            if isinstance(current_val, pd.Series):
-                current_val = current_val.mean()
-            record_payload[k] = current_val
+            values = self._arrays.get(k)
+            record_payload[k] = None if values is None else values[pos]
 
         self.log.debug("Recording {}".format(record_payload))
         record(**record_payload)
@@ -242,11 +276,17 @@ class DataManager(object):
 
 class GoogleTrendDataManager(DataManager):
 
-    def __init__(self, columns, config=None):
+    def __init__(self, columns, config=None, client=None, cache=None):
         super(GoogleTrendDataManager, self).__init__("google", columns, config)
-        """DataManager object used to fetch and integrate Google Trends data"""
+        """DataManager object used to fetch and integrate Google Trends data
+
+        Keyword Arguments:
+            client -- trends client, see trends_client.PyTrendsClient (default: pytrends)
+            cache {trends_client.TrendsCache} -- (default: shared on-disk cache)
+        """
 
-        self.trends = TrendReq(hl="en-US", tz=360)
+        self.client = client or trends_client.PyTrendsClient(hl="en-US", tz=360)
+        self.cache = cache
         self.df = pd.DataFrame()
 
     def date_steps(self):
@@ -321,25 +361,26 @@ class GoogleTrendDataManager(DataManager):
             This may result in innacurate peaks in trend volume
             """
         )
-        trend_data = []
-        for i, t in enumerate(self.timeframes):
-            self.log.info("Fetching trend data for {}".format(t))
-            self.trends.build_payload(self.columns, cat=0, timeframe=t, geo="", gprop="")
-            d = self.trends.interest_over_time()
+        date_pairs = self.datetime_pairs
+        timeframes = [str(p[0].date()) + " " + str(p[1].date()) for p in date_pairs]
+        trend_data = trends_client.fetch_timeframes(
+            self.columns, timeframes, client=self.client, cache=self.cache
+        )
 
+        for i, d in enumerate(trend_data):
             if d.empty:
                 self.log.warn(
-                    "No Trend Data for {} on {}\n Filling with blank data".format(self.columns, t)
+                    "No Trend Data for {} on {}\n Filling with blank data".format(
+                        self.columns, timeframes[i]
+                    )
                 )
-                date_pair = self.datetime_pairs[i]
-                delta = date_pair[1].date() - date_pair[0].date()
-                empty_data = [0] * (delta.days + 1)
-                d = pd.DataFrame(index=pd.date_range(date_pair[0].date(), date_pair[1].date()))
-                for c in self.columns:
-                    d[c] = empty_data
+                date_pair = date_pairs[i]
+                d = pd.DataFrame(
+                    0, index=pd.date_range(date_pair[0].date(), date_pair[1].date()), columns=self.columns
+                )
+                trend_data[i] = d
 
             self.log.debug("Retrieved {} days of trend data".format(len(d)))
-            trend_data.append(d)
 
         self.df = self.normalize_data(trend_data)
         
@@ -348,50 +389,54 @@ class GoogleTrendDataManager(DataManager):
         for col in self.df.columns:
             names.append('google_' + col)
         self.df.columns = names
+        self._build_index()
 
     def normalize_data(self, trend_data):
-        df = pd.DataFrame(index=pd.date_range(self.START, self.END))
+        """Chains the trend frames into a single series per column
+
+        Each frame is scaled relative to its own maximum, so consecutive
+        frames sharing a boundary date are rescaled so that the first value
+        of a frame matches the last (rescaled) value of the previous one.
+        The cumulated factors are applied to all frames at once.
+        """
+        index = pd.date_range(self.START, self.END)
         if len(trend_data) == 0:
             self.log.critical("No trend data found for {}".format(self.columns))
             raise ValueError("No trend data to normalize")
 
-        # https://github.com/anyuzx/bitcoin-google-trend-strategy/blob/master/bitcoin_google_trend_strategy.py
-        renorm_factor = 1.0
-        for c in self.columns:
-            last_entry = 0
-            trend_array = []
-            for i, frame in enumerate(trend_data[::-1]):
-                if frame.empty:
-                    self.log.critical(
-                        "Trend Dataframe empty for {}: {}-{}".format(
-                            c, self.START.date(), self.END.date()
-                        )
-                    )
-                    raise ValueError("Incomplete trend data, can't normalize")
-
-                if i == 0:
-                    trend_array = list(frame[c].values)
-                    last_entry = frame[c].values[-1]
-
-                elif all([v == 0 for v in frame[c].values]):
-                    self.log.debug("Skipping normalization for all 0 dataframe")
-                    trend_array.extend(list(frame[c][1:]))
-                    last_entry = frame[c].values[-1]
-
-                else:
-                    first_entry = [i for i in frame[c].values if i != 0][0]
-                    renorm_factor *= float(last_entry) / float(first_entry)
-                    renorm_array = frame[c].values * renorm_factor
-                    trend_array.extend(list(renorm_array[1:]))
-                    last_entry = frame[c].values[-1]
-
-            try:
-                trend_array = np.array(trend_array)
-                trend_array = 100.0 * trend_array / trend_array.max()
-                df[c] = trend_array
-            except RuntimeWarning as e:
-                raise e
+        if any(frame.empty for frame in trend_data):
+            self.log.critical(
+                "Trend Dataframe empty for {}: {}-{}".format(
+                    self.columns, self.START.date(), self.END.date()
+                )
+            )
+            raise ValueError("Incomplete trend data, can't normalize")
 
+        # https://github.com/anyuzx/bitcoin-google-trend-strategy/blob/master/bitcoin_google_trend_strategy.py
+        frames = [frame[self.columns].astype(float) for frame in trend_data]
+        firsts = np.array([f.values[0] for f in frames[1:]]).reshape(-1, len(self.columns))
+        lasts = np.array([f.values[-1] for f in frames[:-1]]).reshape(-1, len(self.columns))
+
+        # all 0 boundaries can't be used to renormalize, the factor is carried over
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where((firsts != 0) & (lasts != 0), lasts / firsts, 1.0)
+        factors = np.vstack([np.ones((1, len(self.columns))), np.cumprod(ratios, axis=0)])
+
+        # the boundary date is only kept from the earlier frame
+        lengths = [len(frames[0])] + [len(f) - 1 for f in frames[1:]]
+        values = np.concatenate([frames[0].values] + [f.values[1:] for f in frames[1:]])
+        values = values * np.repeat(factors, lengths, axis=0)
+
+        maxes = values.max(axis=0)
+        values = 100.0 * values / np.where(maxes == 0, 1.0, maxes)
+
+        dates = frames[0].index.append([f.index[1:] for f in frames[1:]])
+        df = pd.DataFrame(values, index=pd.DatetimeIndex(dates).normalize(), columns=self.columns)
+        df = df[~df.index.duplicated(keep="first")].sort_index()
+
+        naive_index = index.tz_convert(None).normalize() if index.tz is not None else index.normalize()
+        df = df.reindex(naive_index, method="ffill").fillna(0)
+        df.index = index
         return df
 
 
@@ -407,37 +452,38 @@ class QuandleDataManager(DataManager):
         self.data_dir = os.path.join(DATA_DIR, "quandle")
 
     def fetch_data(self):
-        df = pd.read_csv(self.csv, index_col=[0])
-
-        df_start, df_end = pd.to_datetime(df.iloc[0].name), pd.to_datetime(df.iloc[-1].name)
+        df_start, df_end = quandl_client.date_range()
         algo_start, algo_end = pd.to_datetime(self.config["START"]), pd.to_datetime(
             self.config["END"]
         )
 
-        if algo_start < df_start or algo_end > df_end:
+        if df_start is None or algo_start < df_start or algo_end > df_end:
             self.log.warn("Fetching missing quandl data")
             quandl_client.fetch_all()
 
-        df.index = pd.date_range(start=df.iloc[0].name, end=df.iloc[-1].name, freq="D")
-        self.df = df[self.columns]
+        # only the strategy's columns and date range are loaded from the store,
+        # with the days before the start the indicators' first values depend on
+        df = quandl_client.load(self.columns, start=self._history_start(algo_start), end=algo_end)
+        if not df.empty:
+            df = df.reindex(pd.date_range(start=df.index[0], end=df.index[-1], freq="D"))
+        self.df = df
 
         # tune columns name
         names = []
         for col in self.df.columns:
             names.append('quandl_' + col)
         self.df.columns = names
+        self._build_index()
 
         self.pretty_names = {}
         self._build_name_map()
 
-    @property
-    def csv(self):
-        """Path of quandl csv file"""
-        f = quandl_client.data_csv()
-        if not os.path.exists(f):
-            self.log.warn("Quandle Data not downloaded, fetching...")
-            quandl_client.fetch_all()
-        return f
+    def _history_start(self, algo_start):
+        """First date to load, None to load from the start of the store"""
+        lookbacks = [i.lookback for i in self._indicators]
+        if None in lookbacks:
+            return None
+        return algo_start - pd.Timedelta(days=max(lookbacks, default=0))
 
     def _build_name_map(self):
         with open(quandl_client.code_csv(), "r") as f:
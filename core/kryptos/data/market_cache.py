@@ -0,0 +1,148 @@
+import json
+import time
+
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+import redis
+from logbook import Logger
+
+from kryptos import logger_group
+from kryptos.settings import REDIS_HOST, REDIS_PORT, MARKET_CACHE_TTL, MARKET_SUBSCRIPTION_TTL
+
+
+log = Logger("MarketCache")
+logger_group.add_logger(log)
+
+CONN = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+
+SUBSCRIPTIONS_KEY = "market:subscriptions"
+STATS_KEY = "market:stats"
+
+HISTORY_COLUMNS = ["price", "open", "high", "low", "close", "volume"]
+
+
+def history_key(exchange, symbol, freq):
+    return f"market:history:{exchange.lower()}:{symbol}:{freq}"
+
+
+def ticker_key(exchange, symbol):
+    return f"market:ticker:{exchange.lower()}:{symbol}"
+
+
+def subscription_field(exchange, symbol, freq):
+    return f"{exchange.lower()}:{symbol}:{freq}"
+
+
+def freq_to_delta(freq):
+    """Converts a catalyst history frequency (ex. "5T", "1H", "1d") to a Timedelta"""
+    offset = to_offset(freq)
+    if not isinstance(offset, Tick):
+        raise ValueError(f"History frequency {freq} has no fixed duration")
+    return offset.delta
+
+
+def _count(field, hit):
+    pipe = CONN.pipeline()
+    pipe.hincrby(STATS_KEY, "hits" if hit else "misses", 1)
+    pipe.hincrby(STATS_KEY, f"{field}:{'hits' if hit else 'misses'}", 1)
+    pipe.execute()
+
+
+def stats():
+    """Returns the hit and miss counters of the cache"""
+    return {k.decode(): int(v) for k, v in CONN.hgetall(STATS_KEY).items()}
+
+
+def subscribe(exchange, symbol, freq, bar_count):
+    """Registers a strategy's need for a pair so the market data service polls it
+
+    Subscriptions are refreshed by strategies at every bar and
+    dropped by the service once they haven't been refreshed for a while.
+    """
+    field = subscription_field(exchange, symbol, freq)
+    current = CONN.hget(SUBSCRIPTIONS_KEY, field)
+    if current is not None:
+        bar_count = max(bar_count, json.loads(current)["bar_count"])
+    CONN.hset(SUBSCRIPTIONS_KEY, field, json.dumps({"bar_count": bar_count, "seen": time.time()}))
+
+
+def subscriptions():
+    """Returns the active subscriptions and removes expired ones
+
+    Returns:
+        list -- (exchange, symbol, freq, bar_count) tuples
+    """
+    active = []
+    for field, raw in CONN.hgetall(SUBSCRIPTIONS_KEY).items():
+        sub = json.loads(raw)
+        if time.time() - sub["seen"] > MARKET_SUBSCRIPTION_TTL:
+            CONN.hdel(SUBSCRIPTIONS_KEY, field)
+            continue
+        exchange, symbol, freq = field.decode().split(":")
+        active.append((exchange, symbol, freq, sub["bar_count"]))
+    return active
+
+
+def _load_history(raw):
+    cached = json.loads(raw)
+    index = pd.to_datetime(cached["index"], unit="ms", utc=True)
+    return pd.DataFrame(cached["data"], index=index, columns=cached["columns"])
+
+
+def set_history(exchange, symbol, freq, df, merge=False):
+    """Caches the history of a pair
+
+    Keyword Arguments:
+        merge {bool} -- adds the bars to the cached history instead of replacing it,
+            keeping at least as many bars as are cached, for strategies writing
+            back the shorter history they fetched themselves
+    """
+    key = history_key(exchange, symbol, freq)
+    raw = CONN.get(key) if merge else None
+    if raw is not None:
+        cached = _load_history(raw)
+        bar_count = max(len(cached), len(df))
+        df = pd.concat([cached, df[cached.columns]])
+        df = df[~df.index.duplicated(keep="last")].sort_index().iloc[-bar_count:]
+    CONN.set(key, df.to_json(orient="split", date_unit="ms"), ex=MARKET_CACHE_TTL)
+
+
+def get_history(exchange, symbol, freq, bar_count, current_dt):
+    """Returns the last bar_count bars if the cached history is up to date
+
+    Arguments:
+        current_dt {pandas.Timestamp} -- current algo datetime, the last bar must not be older than one period
+
+    Returns:
+        pandas.DataFrame or None on a cache miss
+    """
+    field = subscription_field(exchange, symbol, freq)
+    raw = CONN.get(history_key(exchange, symbol, freq))
+    df = None
+    if raw is not None:
+        cached = _load_history(raw)
+        fresh = len(cached) and current_dt - cached.index[-1] < freq_to_delta(freq)
+        if fresh and len(cached) >= bar_count:
+            df = cached.iloc[-bar_count:]
+
+    _count(field, df is not None)
+    return df
+
+
+def set_ticker(exchange, symbol, ticker):
+    CONN.set(ticker_key(exchange, symbol), json.dumps(ticker), ex=MARKET_CACHE_TTL)
+
+
+def get_ticker(exchange, symbol, max_age):
+    """Returns the cached price, close and 24h volume if not older than max_age seconds"""
+    field = subscription_field(exchange, symbol, "ticker")
+    raw = CONN.get(ticker_key(exchange, symbol))
+    current = None
+    if raw is not None:
+        ticker = json.loads(raw)
+        if time.time() - ticker["timestamp"] <= max_age:
+            current = pd.Series({k: ticker[k] for k in ["volume", "close", "price"]})
+
+    _count(field, current is not None)
+    return current
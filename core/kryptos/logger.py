@@ -3,17 +3,25 @@ import sys
 import logbook
 from logbook.more import ColorizedStderrHandler
 from logbook.handlers import StringFormatterHandlerMixin
-import google.cloud.logging
 
 
 from kryptos.settings import LOG_DIR, CLOUD_LOGGING
+from kryptos.utils.lazy import LazyObject
 
 logger_group = logbook.LoggerGroup()
 # logger_group.level = logbook.INFO
 
 logbook.set_datetime_format("utc")
 
-cloud_client = google.cloud.logging.Client()
+
+
+def _cloud_logging_client():
+    import google.cloud.logging
+
+    return google.cloud.logging.Client()
+
+
+cloud_client = LazyObject(_cloud_logging_client)
 
 APP_LOG = os.path.join(LOG_DIR, "app.log")
 ERROR_LOG = os.path.join(LOG_DIR, "error.log")
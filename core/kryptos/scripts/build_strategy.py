@@ -7,12 +7,8 @@ from textwrap import dedent
 import click
 from rq import Queue
 
-from kryptos.strategy import Strategy
-from kryptos.data.manager import AVAILABLE_DATASETS
-from kryptos.utils.outputs import in_docker
-from kryptos.utils.load import get_strat
 from kryptos.utils import tasks
-from kryptos.settings import REMOTE_BASE_URL, LOCAL_BASE_URL
+from kryptos.settings import REMOTE_BASE_URL, LOCAL_BASE_URL, AVAILABLE_DATASETS
 
 
 @click.command(name="build", help="Launch a strategy")
@@ -78,6 +74,8 @@ def run(
         return
 
     else:
+        from kryptos.utils.outputs import in_docker
+
         click.secho(
             "Running locally w/o worker (ML still requires a worker process)", fg="cyan")
         viz = not in_docker()
@@ -96,6 +94,10 @@ def load_from_cli(
     json_file,
     python_script,
 ):
+    # imported here so the CLI starts without loading catalyst
+    from kryptos.strategy import Strategy
+    from kryptos.utils.load import get_strat
+
     strat = Strategy()
 
     if python_script is not None:
@@ -206,7 +208,7 @@ def run_in_worker(strat, paper=False, live=False):
     #
     # # note that the strat.id will look different from app-created strategies
     job = q.enqueue(
-        "kryptos.worker.run_strat",
+        "kryptos.worker.jobs.run_strat",
         job_id=strat.id,
         kwargs={
             "strat_json": json.dumps(strat.to_dict()),
@@ -0,0 +1,70 @@
+"""Checks that entry points start fast, without loading heavy dependencies
+
+Each module is imported in a fresh interpreter, which must not load any of
+HEAVY_MODULES and must finish within the module's budget.
+
+    python -m kryptos.scripts.import_budget
+"""
+import sys
+import json
+import subprocess
+
+import click
+
+
+# entry point module -> seconds allowed for its import
+ENTRY_POINTS = {
+    "kryptos.scripts.strat": 2,
+    "kryptos.worker.worker": 2,
+    "kryptos.worker.manager": 2,
+    "kryptos.utils.tasks": 1,
+}
+
+# only imported when first used
+HEAVY_MODULES = [
+    "catalyst",
+    "talib",
+    "matplotlib",
+    "google.cloud.logging",
+    "google.cloud.kms_v1",
+    "google.cloud.storage",
+    "google.cloud.datastore",
+]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": list(sys.modules)}}))
+"""
+
+
+def measure(module):
+    """Imports module in a new interpreter, returns the seconds taken and the modules loaded"""
+    out = subprocess.check_output([sys.executable, "-c", PROBE.format(module=module)])
+    data = json.loads(out.decode().strip().splitlines()[-1])
+    return data["seconds"], set(data["modules"])
+
+
+@click.command(help="Check the import time of the worker and CLI entry points")
+@click.option("--module", "-m", multiple=True, help="Only check these entry points")
+def run(module):
+    failed = False
+    for name in module or ENTRY_POINTS:
+        budget = ENTRY_POINTS.get(name, min(ENTRY_POINTS.values()))
+        seconds, loaded = measure(name)
+        heavy = [m for m in HEAVY_MODULES if m in loaded]
+
+        ok = seconds <= budget and not heavy
+        failed = failed or not ok
+        click.secho(
+            f"{name}: {seconds:.2f}s (budget {budget}s)", fg="green" if ok else "red"
+        )
+        for m in heavy:
+            click.secho(f"  imports {m}", fg="red")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    run()
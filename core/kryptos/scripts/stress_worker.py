@@ -1,14 +1,12 @@
 import os
 import json
-import time
 import requests
 
 import click
 
-from kryptos.data.manager import AVAILABLE_DATASETS
 from kryptos.scripts.build_strategy import load_from_cli
 from kryptos.scripts.kill_strat import kill_from_api
-from kryptos.settings import REMOTE_BASE_URL, LOCAL_BASE_URL
+from kryptos.settings import REMOTE_BASE_URL, LOCAL_BASE_URL, AVAILABLE_DATASETS
 
 
 @click.command(help="Launch multiple strategies")
@@ -60,8 +58,7 @@ def run(
         click.secho("Running locally", fg="yellow")
         api_url = os.path.join(LOCAL_BASE_URL, "api")
 
-    strat_ids = []
-
+    strats = []
     for i in range(job_quantity):
         strat = load_from_cli(
             market_indicators,
@@ -72,11 +69,9 @@ def run(
             json_file,
             python_script,
         )
-        click.secho(f"Spawning strategy {i}")
-        strat_id = start_from_api(
-            strat, api_url, paper=paper, live=False, hosted=hosted
-        )
-        strat_ids.append(strat_id)
+        strats.append(strat)
+
+    strat_ids = start_many_from_api(strats, api_url, paper=paper, live=False)
 
     try:
         monitor_strats(strat_ids, api_url)
@@ -132,24 +127,68 @@ def start_from_api(strat, api_url, paper=False, live=False, hosted=False):
     return strat_id
 
 
+def start_many_from_api(strats, api_url, paper=False, live=False):
+    """Queues all strategies with a single bulk request, returns their ids"""
+    if paper:
+        q_name = "paper"
+    elif live:
+        q_name = "live"
+    else:
+        q_name = "backtest"
+
+    data = {"strat_jsons": [strat.to_dict() for strat in strats], "queue_name": q_name}
+    endpoint = os.path.join(api_url, "strat/bulk")
+
+    click.secho(f"Enqueuing {len(strats)} strategies at {endpoint} on queue {q_name}", fg="yellow")
+    resp = requests.post(endpoint, json=data)
+    click.echo(resp)
+    resp.raise_for_status()
+    strat_ids = resp.json()["strat_ids"]
+
+    for strat_id in strat_ids:
+        click.echo(f"Strategy enqueued to job {strat_id}")
+        click.secho(f"View the strat at {get_strat_url(strat_id, api_url, paper)}", fg="blue")
+    return strat_ids
+
+
 def monitor_strats(strat_ids, api_url):
-    from itertools import cycle
+    """Follows all strategies through a single progress stream until they end"""
+    endpoint = os.path.join(api_url, "stream")
+    remaining = set(strat_ids)
 
-    # from textwrap import dedent
-    for i in cycle(strat_ids):
-        endpoint = os.path.join(api_url, "monitor")
-        resp = requests.get(endpoint, params={"strat_id": i})
-        data = resp.json()["strat_info"]
+    resp = requests.get(endpoint, params={"strat_id": ",".join(strat_ids)}, stream=True)
+    resp.raise_for_status()
+
+    for line in resp.iter_lines(decode_unicode=True):
+        # skip heartbeats and event separators
+        if not line or not line.startswith("data:"):
+            continue
+
+        data = json.loads(line[len("data:"):])
+        i = data["strat_id"]
+
+        status, result = data.get("status"), data.get("result", "")
+        if status is None:
+            if data.get("date"):
+                click.echo(f"Strat {i}: processing {data['date']}")
+            continue
 
-        status, result = data.get("status", ""), data.get("result", "")
-        meta = data.get("meta", None)
         if status == "failed":
             click.secho(f"Strat: {i} has failed", fg="red")
+            remaining.discard(i)
 
         elif status == "finished":
             display_summary(result)
+            remaining.discard(i)
+
+        elif status == "Not Found":
+            # expired or never queued, no more progress will be published
+            click.secho(f"Strat: {i} was not found", fg="red")
+            remaining.discard(i)
 
         else:
             click.echo(f"Strat {i}: {status}\n")
 
-        time.sleep(3)
+        if not remaining:
+            resp.close()
+            break
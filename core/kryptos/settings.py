@@ -1,9 +1,10 @@
 import os
 import json
-from google.cloud import datastore
 
 
 def get_from_datastore(config_key, env):
+    from google.cloud import datastore
+
     ds = datastore.Client()
     print("Fetching {}".format(config_key))
 
@@ -36,11 +37,44 @@ else:
     WEB_URL = REMOTE_BASE_URL
 
 
+# datasets of kryptos.data.manager, here so the CLI doesn't import the data managers
+AVAILABLE_DATASETS = ["google", "quandl"]
+
 STRAT_DIR = os.path.join(PLATFORM_DIR, "strategy")
 DEFAULT_CONFIG_FILE = os.path.join(STRAT_DIR, "config.json")
 
 
-QUEUE_NAMES = ["paper", "live", "backtest", "ta"]
+QUEUE_NAMES = ["paper", "live", "backtest", "ta", "plots"]
+
+# Worker slots, paper and live jobs mostly wait for the next bar
+WORKER_SLOTS_PER_CORE = {"paper": 4, "live": 4, "backtest": 1, "ta": 1, "plots": 1}
+WORKER_JOB_MEMORY_MB = {"paper": 300, "live": 300, "backtest": 1000, "ta": 200, "plots": 400}
+WORKER_MEMORY_FRACTION = 0.8  # share of the host memory available to jobs
+WORKER_CHECK_INTERVAL = 10  # seconds between checks when no enqueue is notified
+ENQUEUED_CHANNEL = "rq:enqueued"
+STRAT_PROGRESS_CHANNEL = "strat:progress:{}"
+# ids of finished and failed strategy jobs, saved to the DB by the web app
+STRAT_COMPLETED_KEY = "strat:completed"
+BACKTEST_CHECKPOINT_BARS = 1440  # bars between checkpoints of backtest jobs, 0 disables them
+STATS_CHUNK_ITERATIONS = 15  # iterations of live and paper stats uploaded per chunk
+NOTIFICATION_QUEUE_KEY = "notifications:pending"  # telegram messages batched by the updater
+
+# Iteration timings, see kryptos.utils.timing
+TIMING_SAMPLES = 10000  # durations kept per span for percentiles
+TIMING_META_ITERATIONS = 100  # iterations between updates of the timings in job.meta
+TIMING_TRACE = os.getenv("TIMING_TRACE", "") in ("1", "true", "True")  # dump folded stacks for flame graphs
+
+# Exchange bundle ingestion
+INGEST_EXCHANGES = ["bitfinex", "bittrex", "poloniex"]
+INGEST_INTERVAL = 60 * 60  # seconds between incremental passes of an exchange
+INGEST_MIN_REQUEST_INTERVAL = {"bitfinex": 6, "bittrex": 1, "poloniex": 1}  # seconds between ingests
+INGEST_LAST_BAR_KEY = "ingest:last_bar"
+INGEST_PRIORITY_KEY = "ingest:priority:{exchange}"
+
+# Shared live market data
+MARKET_POLL_INTERVAL = 20  # seconds between polls of a subscribed pair
+MARKET_CACHE_TTL = 60 * 60  # seconds before cached bars expire
+MARKET_SUBSCRIPTION_TTL = 60 * 60 * 25  # drop pairs not requested by a strategy for this long
 
 with open(DEFAULT_CONFIG_FILE, "r") as f:
     DEFAULT_CONFIG = json.load(f)
@@ -1,4 +1,3 @@
-import pandas as pd
 import logbook
 from rq import get_current_job
 
@@ -35,6 +34,8 @@ class IndicatorLogger(logbook.Logger):
             job.save_meta()
 
 
+# recomputed from the prices by every calculate, so left out of checkpoints
+TRANSIENT_STATE = ("log", "data", "outputs")
 
 
 class AbstractIndicator(object):
@@ -56,8 +57,6 @@ class AbstractIndicator(object):
         self.outputs = None
         self.current_date = None
         self.result = None
-        self.df_results = pd.DataFrame(columns=['pred'])
-        self.df_final = pd.DataFrame()
         self.results_pred = []
         self.results_real = []
         self.idx = -1
@@ -74,9 +73,31 @@ class AbstractIndicator(object):
     def output_names(self):
         return []
 
+    @property
+    def lookback(self):
+        """Number of previous values a calculation depends on, None if it depends on the whole history"""
+        return None
+
+    @property
+    def output_columns(self):
+        """Names of the recorded outputs, known before the first calculation"""
+        if self.outputs is not None:
+            return list(self.outputs)
+        names = list(self.output_names)
+        if len(names) == 1:
+            return [self.label]
+        return names
+
     def update_param(self, param, val):
         self._parse_params({param: val})
 
+    def get_state(self):
+        """Returns the indicator's calculation state, stored in backtest checkpoints"""
+        return {k: v for k, v in self.__dict__.items() if k not in TRANSIENT_STATE}
+
+    def set_state(self, state):
+        self.__dict__.update(state)
+
     def serialize(self):
         d = {
             "name": self.name,
@@ -1,3 +1,6 @@
+import math
+from collections import deque
+
 from catalyst.api import record
 from logbook import Logger
 
@@ -22,26 +25,68 @@ class RELCHANGE(AbstractIndicator):
     def __init__(self, delta_t=4, **kw):
         super().__init__("RELCHANGE", delta_t=delta_t, **kw)
         self.delta_t = delta_t
+        # the same indicator can be attached to several columns
+        self._states = {}
+
+    def _state(self, name, n_rows):
+        state = self._states.get(name)
+        if state is None or n_rows < state["n"]:
+            state = {
+                "n": 0,
+                "window": deque(maxlen=2 * self.delta_t),
+                "outputs": {"rel_change": [], "rel_change_ratio": []},
+            }
+            self._states[name] = state
+        return state
 
     def calculate(self, trend_series):
-        self.data = trend_series
-
-        df = trend_series.to_frame(name="val")
-        df["mean"] = df["val"].rolling(self.delta_t).mean()
+        """Updates the relative change with the values added since the last call
 
-        df["rel_change"] = df["val"] - df["mean"].shift(periods=1, freq=self.delta_t)
-        df["rel_change_ratio"] = df["rel_change"] / df["mean"].shift(periods=1, freq=self.delta_t)
-
-        self.outputs = df.fillna(value=0)
+        trend_series is the expanding history of the column, so only
+        its new values are processed. Each value is compared with the
+        rolling mean of delta_t values as it was delta_t bars earlier,
+        the mean of the values from t - 2 * delta_t + 1 to t - delta_t.
+        """
+        self.data = trend_series
+        state = self._state(trend_series.name, len(trend_series))
+        window, outputs = state["window"], state["outputs"]
+
+        for val in trend_series.values[state["n"]:]:
+            val = float(val)
+            window.append(val)
+            rel_change, rel_change_ratio = 0, 0
+            if len(window) == 2 * self.delta_t:
+                mean = sum(window[i] for i in range(self.delta_t)) / self.delta_t
+                if math.isfinite(mean) and math.isfinite(val):
+                    rel_change = val - mean
+                    if mean != 0:
+                        rel_change_ratio = rel_change / mean
+                    elif rel_change != 0:
+                        # like the pandas division the outputs were computed with
+                        rel_change_ratio = math.copysign(math.inf, rel_change)
+
+            outputs["rel_change"].append(rel_change)
+            outputs["rel_change_ratio"].append(rel_change_ratio)
+
+        state["n"] = len(trend_series)
+        self.outputs = outputs
 
     @property
     def default_params(self):
         return {}
 
+    @property
+    def output_names(self):
+        return ["rel_change", "rel_change_ratio"]
+
+    @property
+    def lookback(self):
+        return 2 * self.delta_t - 1
+
     def record(self):
         record(
-            rel_change=self.outputs.rel_change[-1],
-            rel_change_ratio=self.outputs.rel_change_ratio[-1],
+            rel_change=self.outputs["rel_change"][-1],
+            rel_change_ratio=self.outputs["rel_change_ratio"][-1],
         )
 
     def plot(self, results, pos, **kw):
@@ -61,17 +106,17 @@ class RELCHANGE(AbstractIndicator):
     @property
     def signals_sell(self):
         try:
-            return self.outputs.rel_change[-1] < 0.0
+            return self.outputs["rel_change"][-1] < 0.0
 
-        except AttributeError as e:
+        except (IndexError, TypeError) as e:
             self.log.exception(e)
             return False
 
     @property
     def signals_buy(self):
         try:
-            return self.outputs.rel_change[-1] > 0.0
+            return self.outputs["rel_change"][-1] > 0.0
 
-        except AttributeError as e:
+        except (IndexError, TypeError) as e:
             self.log.exception(e)
             return False
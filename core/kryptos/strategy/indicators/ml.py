@@ -1,5 +1,4 @@
 from catalyst.api import get_datetime, record
-import pandas as pd
 from rq import Queue
 import time
 
@@ -54,7 +53,7 @@ class MLIndicator(AbstractIndicator):
         self.log.info(str(self.idx) + ' - ' + str(self.current_date) + ' - ' + str(df.iloc[-1].price))
         self.log.info(str(df.iloc[0].name) + ' - ' + str(df.iloc[-1].name))
         self.log.info(f'Queuing {self.name} ML calculation')
-        job = tasks.enqueue_ml_calculate(df, namespace, self.name, self.idx, self.current_date, self.hyper_params, df_final=self.df_final, **kw)
+        job = tasks.enqueue_ml_calculate(df, namespace, self.name, self.idx, self.current_date, self.hyper_params, **kw)
         self.current_job_id = job.id
 
     def record(self):
@@ -68,16 +67,13 @@ class MLIndicator(AbstractIndicator):
         while not job.is_finished:
             pass
         self.log.info('Job complete, recording results')
-        self.result, df_results_json, df_final_json, self._signals_buy, self._signals_sell, self.hyper_params = job.result
+        self.result, self._signals_buy, self._signals_sell, self.hyper_params = job.result
         self.current_job_id = None
-        df_results = pd.read_json(df_results_json)
-        self.df_results = self.df_results.append(df_results)
-        self.df_final = pd.read_json(df_final_json)
         payload = {self.name: self.result}
         record(**payload)
 
     def analyze(self, namespace, data_freq, extra_results):
-        job = tasks.enqueue_ml_analyze(namespace, self.name, self.df_final, self.df_results, data_freq, extra_results)
+        job = tasks.enqueue_ml_analyze(namespace, self.name, data_freq, extra_results)
 
 
 class XGBOOST(MLIndicator):
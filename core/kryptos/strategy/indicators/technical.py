@@ -1,5 +1,4 @@
 import talib.abstract as ab
-import matplotlib.pyplot as plt
 import pandas as pd
 
 from catalyst.api import record
@@ -7,6 +6,7 @@ from catalyst.api import record
 
 from kryptos.settings import TAConfig as CONFIG
 from kryptos.utils import viz
+from kryptos.utils.viz import plt
 from kryptos.strategy.indicators import AbstractIndicator
 from kryptos.strategy.signals import utils
 
@@ -95,7 +95,7 @@ class TAIndicator(AbstractIndicator):
         if ignore is None:
             ignore = []
 
-        for col in [c for c in list(self.outputs) if c not in ignore]:
+        for col in [c for c in self.output_columns if c not in ignore]:
             ax = viz.plot_column(results, col, pos, y_label=y_label, label=col)
             plt.legend()
 
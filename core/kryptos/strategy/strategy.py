@@ -27,21 +27,26 @@ from catalyst.exchange import exchange_errors
 from ccxt.base import errors as ccxt_errors
 
 from kryptos.utils import viz, tasks, auth, outputs
+from kryptos.utils.timing import IterationTimer
 from kryptos.strategy.indicators import technical, ml
 from kryptos.strategy.signals import utils as signal_utils
 from kryptos.data.manager import get_data_manager
+from kryptos.data import market_cache
+from kryptos.data.bar_store import BarStore, EPOCH
 from kryptos import logger_group, setup_logging
-from kryptos.settings import DEFAULT_CONFIG, PERF_DIR, WEB_URL
+from kryptos.settings import (
+    DEFAULT_CONFIG,
+    PERF_DIR,
+    WEB_URL,
+    BACKTEST_CHECKPOINT_BARS,
+    TIMING_META_ITERATIONS,
+    TIMING_TRACE,
+)
 from kryptos.analysis import quant
-import google.cloud.logging
-
-cloud_client = google.cloud.logging.Client()
+from kryptos.analysis.utils import risk_metrics
 
 from redo import retry
-import matplotlib
-
-matplotlib.use("agg")
-import matplotlib.pyplot as plt
+from kryptos.utils.viz import plt
 
 
 class StratLogger(logbook.Logger):
@@ -63,6 +68,7 @@ class StratLogger(logbook.Logger):
             else:
                 job.meta["output"] += record.msg + "\n"
             job.save_meta()
+            tasks.publish_progress(job.id, log=record.msg)
 
 
 class StratState(object):
@@ -77,6 +83,10 @@ class StratState(object):
         context.state.update(self.__dict__)
 
 
+# state rebuilt by _init_func and fetch_history when resuming from a checkpoint
+CHECKPOINT_SKIP_STATE = ["asset", "prices", "current"]
+
+
 class Strategy(object):
     def __init__(self, name=None, **kw):
         """Central interface used to build and execute trading strategies
@@ -122,6 +132,8 @@ class Strategy(object):
         self.in_job = False
 
         self.telegram_id = None
+        # result_cache key of the submitted strategy, set by the backtest job
+        self.cache_key = None
 
         self._signal_buy_funcs = []
         self._signal_sell_funcs = []
@@ -148,9 +160,25 @@ class Strategy(object):
         self.last_date = None
         self.filter_dates = None
         self.date_init_reference = None
+        self._bar_store = None
         self._context_ref = None
         self._state = StratState()
 
+        # backtest checkpoints, see _save_checkpoint
+        self._checkpointing = False
+        self._checkpoint = None
+        self._pending_portfolio = None
+        self._bars_since_checkpoint = 0
+        self._last_bar_day = None
+        # results rows recorded since the last checkpoint, uploaded as its
+        # segment, and the segments of a resumed run
+        self._results_rows = None
+        self._results_segments = 0
+        self._results_prefix = None
+
+        # timing spans of the phases of each iteration
+        self.timer = IterationTimer(trace=TIMING_TRACE)
+
     @property
     def is_live(self):
         return self._live and not self._simulate_orders
@@ -176,6 +204,11 @@ class Strategy(object):
         elif self.is_live:
             return "live"
 
+    @mode.setter
+    def mode(self, val):
+        self._live = val != "backtest"
+        self._simulate_orders = val != "live"
+
     @property
     def state(self):
         return self._state
@@ -439,10 +472,28 @@ class Strategy(object):
             "2013-01-01 00:00:00", tz="utc"
         ) + pd.Timedelta(minutes=int(self.state.MINUTE_TO_OPERATE))
 
+        # minute bars are fetched once and aggregated incrementally to MINUTE_FREQ,
+        # when its bars are made of whole HISTORY_FREQ bars
+        if self.state.DATA_FREQ == "minute":
+            base = pd.Timedelta(self.state.HISTORY_FREQ).value
+            freq, offset = self._operate_resolution
+            if pd.Timedelta(freq).value % base == 0 and pd.Timedelta(offset).value % base == 0:
+                self._bar_store = BarStore(base_freq=self.state.HISTORY_FREQ)
+                self._bar_store.add_resolution(freq, offset)
+            else:
+                self.log.warning(
+                    f"{freq} bars at offset {offset} are not made of {self.state.HISTORY_FREQ} bars, "
+                    "filtering the fetched history instead"
+                )
+
         # Set commissions
         context.set_commission(
             maker=self.state.MAKER_COMMISSION, taker=self.state.TAKER_COMMISSION
         )
+
+        if self._checkpoint is not None:
+            self._restore_checkpoint(context)
+
         self.state.dump_to_context(context)
 
     def _check_configuration(self, context):
@@ -491,9 +542,15 @@ class Strategy(object):
 
             #  Update actual self.state.price
             if not self.is_backtest:
-                self.state.current = data.current(
-                    assets=self.state.asset, fields=["volume", "close", "price"]
+                # other strategies on the same pair share the polled ticker
+                current = market_cache.get_ticker(
+                    self.exchange, self.trading_info["ASSET"], max_age=60
                 )
+                if current is None:
+                    current = data.current(
+                        assets=self.state.asset, fields=["volume", "close", "price"]
+                    )
+                self.state.current = current
             else:
                 self.state.current = data.current(
                     assets=self.state.asset,
@@ -535,18 +592,55 @@ class Strategy(object):
 
         return True
 
+    @property
+    def _operate_resolution(self):
+        """Frequency and offset of the bars the strategy operates on in minute mode"""
+        offset = (self.date_init_reference - EPOCH) % pd.Timedelta(
+            minutes=int(self.state.MINUTE_FREQ)
+        )
+        return str(self.state.MINUTE_FREQ) + "T", offset
+
+    def _history_bar_count(self):
+        """Number of bars to request, only the ones missing from the bar store"""
+        if self._bar_store is None or self._bar_store.last_time is None:
+            return self.state.BARS
+
+        missing = (get_datetime() - self._bar_store.last_time) / pd.Timedelta(self.state.HISTORY_FREQ)
+        return int(min(max(np.ceil(missing), 1), self.state.BARS))
+
     def _fetch_history(self, context, data):
         # Get price, open, high, low, close
         # The frequency attribute determine the bar size. We use this convention
         # for the frequency alias:
         # http://pandas.pydata.org/pandas-docs/stable/timeseries.html#offset-aliases
         self.log.debug("Fetching history")
-        self.state.prices = data.history(
-            self.state.asset,
-            bar_count=self.state.BARS,
-            fields=["price", "open", "high", "low", "close", "volume"],
-            frequency=self.state.HISTORY_FREQ,
-        )
+        prices = None
+        if not self.is_backtest:
+            symbol, freq = self.trading_info["ASSET"], self.state.HISTORY_FREQ
+            market_cache.subscribe(self.exchange, symbol, freq, self.state.BARS)
+            prices = market_cache.get_history(
+                self.exchange, symbol, freq, self.state.BARS, get_datetime()
+            )
+
+        fetched = prices is None
+        if fetched:
+            prices = data.history(
+                self.state.asset,
+                bar_count=self._history_bar_count(),
+                fields=["price", "open", "high", "low", "close", "volume"],
+                frequency=self.state.HISTORY_FREQ,
+            )
+
+        if self._bar_store is not None:
+            self._bar_store.extend(prices)
+            prices = self._bar_store.history(
+                self.state.HISTORY_FREQ, self.state.BARS, end=get_datetime()
+            )
+
+        if fetched and not self.is_backtest:
+            market_cache.set_history(self.exchange, symbol, freq, prices, merge=True)
+
+        self.state.prices = prices
 
         self.state.dump_to_context(context)
 
@@ -562,7 +656,19 @@ class Strategy(object):
                 freq=str(self.state.MINUTE_FREQ) + "min",
             )
 
-            self.state.prices = self.state.prices.loc[filter_dates]
+            if self._bar_store is not None:
+                # MINUTE_FREQ bars aggregated from the minute bars, closing on the filter dates
+                freq, offset = self._operate_resolution
+                bar_count = int(
+                    len(self.state.prices)
+                    * pd.Timedelta(self.state.HISTORY_FREQ)
+                    / pd.Timedelta(freq)
+                )
+                self.state.prices = self._bar_store.history(
+                    freq, bar_count, end=self.state.prices.iloc[-1].name, offset=offset
+                )
+            else:
+                self.state.prices = self.state.prices.loc[filter_dates]
             self.state.prices = self.state.prices.dropna()
 
             if self.filter_dates is not None:
@@ -617,7 +723,8 @@ class Strategy(object):
                         axis=1,
                         join_axes=[self.state.prices.index],
                     )
-            i.calculate(self.state.prices, self.name)
+            # the id keeps the rows of concurrent strategies sharing a name apart
+            i.calculate(self.state.prices, self.id)
 
         self.state.dump_to_context(context)
 
@@ -631,6 +738,24 @@ class Strategy(object):
             context {pandas.Dataframe} -- Catalyst context object
             data {pandas.Datframe} -- Catalyst data object
         """
+        with self.timer.span("iteration"):
+            self._process_iteration(context, data)
+
+        if self.in_job and self.state.i % TIMING_META_ITERATIONS == 0:
+            self._save_timings()
+
+    def _save_timings(self):
+        job = get_current_job()
+        job.meta["timings"] = self.timer.summary()
+        job.save_meta()
+
+    def _process_iteration(self, context, data):
+        if self._pending_portfolio is not None:
+            self._restore_portfolio(context)
+
+        if self._checkpointing:
+            self._check_checkpoint(context)
+
         # catalyst dumps pickle file after handle_data called
         # so this call uploads the state of
         # the previously compelted iteration
@@ -639,7 +764,8 @@ class Strategy(object):
         self.log.info(f"Processing algo iteration - {self.state.i}")
 
         if not self.is_backtest and self.state.i > 1:
-            outputs.upload_state_to_storage(self)
+            with self.timer.span("uploads"):
+                outputs.upload_state_to_storage(self)
 
         else:
             self.log.debug("Skipping stats upload until catalyst writes to file")
@@ -656,65 +782,245 @@ class Strategy(object):
             return
 
         # To check to apply stop-loss, take-profit or keep position
-        self.check_open_positions(context)
+        with self.timer.span("orders"):
+            self.check_open_positions(context)
 
         # set date first for logging purposes
         self.current_date = get_datetime()
 
-        if not self.fetch_history(context, data):
-            return
+        with self.timer.span("fetch_history"):
+            if not self.fetch_history(context, data):
+                return
 
         #  Filter minute frequency
-        self._check_minute_freq(context, data)
+        with self.timer.span("filtering"):
+            self._check_minute_freq(context, data)
 
         if self.in_job:
+            with self.timer.span("progress"):
+                job = get_current_job()
+                job.meta["date"] = str(self.current_date)
+                job.save_meta()
+                tasks.publish_progress(job.id, date=job.meta["date"])
 
-            job = get_current_job()
-            job.meta["date"] = str(self.current_date)
-            job.save_meta()
+        with self.timer.span("orders"):
+            for i in context.blotter.open_orders:
+                msg = "Canceling unfilled open order {}".format(i)
+                self.log.info(msg)
+                self.notify(msg)
+                cancel_order(i)
 
-        for i in context.blotter.open_orders:
-            msg = "Canceling unfilled open order {}".format(i)
-            self.log.info(msg)
-            self.notify(msg)
-            cancel_order(i)
+        with self.timer.span("fetch_history"):
+            if not self.fetch_history(context, data):
+                return
 
-        if not self.fetch_history(context, data):
-            return
-
-        self._filter_fetched_history(context, data)
+        with self.timer.span("filtering"):
+            self._filter_fetched_history(context, data)
 
         # ## enqueue ml models as soon as data filtered
         if self._ml_models:
-            self._enqueue_ml_calcs(context, data)
+            with self.timer.span("ml.enqueue"):
+                self._enqueue_ml_calcs(context, data)
 
         else:
             for dataset, manager in self._datasets.items():
-                manager.calculate(context)
-                manager.record_data(context)
+                with self.timer.span(f"dataset.{dataset}"):
+                    manager.calculate(context)
+                    manager.record_data(context)
 
         for i in self._market_indicators:
             try:
-                i.calculate(self.state.prices)
-                i.record()
+                with self.timer.span(f"indicator.{i.name}.calculate"):
+                    i.calculate(self.state.prices)
+                with self.timer.span(f"indicator.{i.name}.record"):
+                    i.record()
             except Exception as e:
                 self.log.error(e)
                 self.log.error("Error calculating {}, skipping...".format(i.name))
 
         for i in self._ml_models:
-            i.record()
+            with self.timer.span(f"ml.{i.name}.wait"):
+                i.record()
+
+        with self.timer.span("handle_data"):
+            self._extra_handle(context, data)
 
-        self._extra_handle(context, data)
-        self._count_signals(context, data)
+        with self.timer.span("signals"):
+            self._count_signals(context, data)
 
         if context.frame_stats:
             pretty_output = stats_utils.get_pretty_stats(context.frame_stats)
             self.log.debug(pretty_output)
             if not self.is_backtest:
-                outputs.save_stats_to_storage(self)
+                with self.timer.span("uploads"):
+                    outputs.save_stats_to_storage(self)
+
+        if self._checkpointing:
+            with self.timer.span("checkpoint"):
+                self._record_results_row(context)
 
         self.state.dump_to_context(context)
 
+    def _check_checkpoint(self, context):
+        """Saves a checkpoint on the first bar of a day, every BACKTEST_CHECKPOINT_BARS bars
+
+        Checkpoints are taken before the bar is processed, so orders of the
+        previous bar are already filled and a backtest resumed from the
+        checkpoint's day processes this bar again from the same state.
+        """
+        self._bars_since_checkpoint += 1
+        dt = get_datetime()
+        new_day = self._last_bar_day is not None and dt.date() != self._last_bar_day
+        self._last_bar_day = dt.date()
+
+        if not new_day or self._bars_since_checkpoint < BACKTEST_CHECKPOINT_BARS:
+            return
+
+        checkpoint = self._make_checkpoint(context, dt)
+        if self._results_rows:
+            checkpoint["results_segments"] += 1
+        try:
+            with self.timer.span("uploads"):
+                outputs.save_checkpoint_to_storage(self, checkpoint, self._results_rows)
+            self._bars_since_checkpoint = 0
+            self._results_segments = checkpoint["results_segments"]
+            self._results_rows = None
+        except Exception as e:
+            self.log.error("Failed to save backtest checkpoint")
+            self.log.exception(e)
+
+    def _make_checkpoint(self, context, dt):
+        portfolio = context.portfolio
+        positions = {
+            asset.symbol: {
+                "amount": p.amount,
+                "cost_basis": p.cost_basis,
+                "last_sale_price": p.last_sale_price,
+            }
+            for asset, p in portfolio.positions.items()
+            if p.amount
+        }
+        return {
+            "date": pd.Timestamp(dt).normalize(),
+            "state": {
+                k: v for k, v in self.state.__dict__.items() if k not in CHECKPOINT_SKIP_STATE
+            },
+            "last_date": self.last_date,
+            "filter_dates": self.filter_dates,
+            "portfolio": {
+                "cash": portfolio.cash,
+                "portfolio_value": portfolio.portfolio_value,
+                "positions": positions,
+            },
+            "indicators": [i.get_state() for i in self._market_indicators + self._ml_models],
+            "datasets": {
+                name: [i.get_state() for i in manager._indicators]
+                for name, manager in self._datasets.items()
+            },
+            "results_segments": self._results_segments,
+        }
+
+    def _restore_checkpoint(self, context):
+        checkpoint = self._checkpoint
+        self.log.info(f"Resuming backtest from checkpoint of {checkpoint['date']}")
+
+        self.state.__dict__.update(checkpoint["state"])
+        self.last_date = checkpoint["last_date"]
+        self.filter_dates = checkpoint["filter_dates"]
+
+        for i, state in zip(self._market_indicators + self._ml_models, checkpoint["indicators"]):
+            i.set_state(state)
+        for name, manager in self._datasets.items():
+            for i, state in zip(manager._indicators, checkpoint["datasets"].get(name, [])):
+                i.set_state(state)
+
+        self._results_prefix = checkpoint["results"]
+        self._results_segments = checkpoint["results_segments"]
+        # catalyst creates the positions ledger after initialize
+        self._pending_portfolio = checkpoint["portfolio"]
+
+    def _restore_portfolio(self, context):
+        """Opens the checkpoint's positions, paid from the cash of the resumed run
+
+        The resumed backtest starts with the checkpoint's portfolio value as
+        capital base, so paying for the positions at their last sale price
+        leaves the checkpoint's cash and an unchanged portfolio value.
+        """
+        portfolio = self._pending_portfolio
+        self._pending_portfolio = None
+
+        tracker = context.perf_tracker
+        for asset_symbol, p in portfolio["positions"].items():
+            tracker.position_tracker.update_position(
+                symbol(asset_symbol),
+                amount=p["amount"],
+                last_sale_price=p["last_sale_price"],
+                cost_basis=p["cost_basis"],
+            )
+            value = p["amount"] * p["last_sale_price"]
+            for period in [tracker.cumulative_performance, tracker.todays_performance]:
+                period.handle_cash_payment(-value)
+
+        self.log.info(f"Restored {len(portfolio['positions'])} positions from checkpoint")
+
+    def _record_results_row(self, context):
+        """Keeps the values needed to rebuild the results of a resumed backtest"""
+        if self._results_rows is None:
+            self._results_rows = {"index": []}
+        rows = self._results_rows
+
+        row = dict(context.recorded_vars)
+        row["portfolio_value"] = context.portfolio.portfolio_value
+        row["cash"] = context.portfolio.cash
+        row["ending_exposure"] = context.portfolio.positions_exposure
+
+        n = len(rows["index"])
+        rows["index"].append(get_datetime())
+        for k, v in row.items():
+            # recorded vars may appear after the first bars
+            rows.setdefault(k, [None] * n).append(v)
+        for k, values in rows.items():
+            if len(values) == n:
+                values.append(None)
+
+    def _with_results_prefix(self, results):
+        """Prepends the checkpointed results to the results of a resumed backtest
+
+        Checkpointed bars keep their recorded vars, portfolio value, cash and
+        exposure, have no transactions, orders or positions and are marked in
+        the "checkpointed" column. Cumulative metrics are recomputed over the
+        whole backtest, other catalyst metrics are NaN before the checkpoint.
+        """
+        segments = []
+        for rows in self._results_prefix:
+            rows = dict(rows)
+            index = pd.DatetimeIndex(rows.pop("index"))
+            segments.append(pd.DataFrame(rows, index=index))
+        prefix = pd.concat(segments)
+        prefix = prefix[prefix.index < results.index[0]]
+        prefix["period_open"] = prefix.index
+        prefix["period_close"] = prefix.index
+        prefix["starting_exposure"] = prefix.ending_exposure.shift(1).fillna(0)
+        prefix["checkpointed"] = True
+
+        results = pd.concat([prefix, results])
+        results["checkpointed"] = results.checkpointed.fillna(False).astype(bool)
+        for col in ["transactions", "orders", "positions"]:
+            results[col] = [v if isinstance(v, list) else [] for v in results[col].values]
+
+        pv = results.portfolio_value
+        capital_base = self.trading_info["CAPITAL_BASE"]
+        results["algorithm_period_return"] = pv / capital_base - 1
+        results["returns"] = pv.pct_change().fillna(results.algorithm_period_return)
+        results["pnl"] = pv.diff().fillna(pv - capital_base)
+        results["max_drawdown"] = (pv / pv.cummax() - 1).cummin()
+        # catalyst's annualized cumulative sharpe ratio, over 365 trading days
+        returns = results.returns.expanding()
+        results["sharpe"] = (returns.mean() / returns.std() * np.sqrt(365)).replace(
+            [np.inf, -np.inf], np.nan
+        )
+        return results
+
     @property
     def total_plots(self):
         dataset_inds = 0
@@ -742,11 +1048,60 @@ class Strategy(object):
                 freq=str(self.state.MINUTE_FREQ) + "min",
             )
 
-            self.state.prices = self.state.prices.loc[filter_dates]
+            if self._bar_store is not None:
+                freq, offset = self._operate_resolution
+                self.state.prices = self._bar_store.history(
+                    freq, self.state.BARS, end=filter_dates[-1], offset=offset
+                )
+            else:
+                self.state.prices = self.state.prices.loc[filter_dates]
 
             return self.state.prices.iloc[-1].name
 
     def _make_plots(self, context, results):
+        if self.in_job:
+            # rendered by a plots worker once this job has finished,
+            # so the job and its worker slot don't wait on matplotlib
+            tasks.enqueue_plots(
+                self.serialize(),
+                self.id,
+                self.mode,
+                outputs.get_analysis_blob_name(self),
+                telegram_id=self.telegram_id,
+                cache_key=self.cache_key,
+                depends_on=get_current_job().id,
+            )
+            self.log.info("Queued analysis plots")
+            return
+
+        self.render_plots(results, context)
+
+    @property
+    def plot_columns(self):
+        """Results columns drawn in the summary plot"""
+        columns = ["algorithm_period_return", "benchmark_period_return", "cash", "price"]
+        for i in self._market_indicators:
+            columns.extend(i.output_columns)
+        if not self._ml_models:
+            for dataset, manager in self._datasets.items():
+                columns.extend(manager.columns)
+                for i in manager._indicators:
+                    columns.extend(i.output_columns)
+        return columns
+
+    def render_plots(self, results, context=None, transactions=None):
+        """Renders and uploads the summary plot and its series as JSON
+
+        Extra plots defined with the analyze decorator are drawn only
+        when the algo context is provided, i.e. when rendering in process.
+
+        Keyword Arguments:
+            transactions {pandas.DataFrame} -- trades indexed by bar, when results
+                have no transactions column (default: {None})
+
+        Returns:
+            tuple -- urls of the PNG plot and of the JSON series
+        """
         self.log.info("Creating analysis plots")
         # strat_plots = len(self._market_indicators) + len(self._datasets)
         pos = viz.get_start_geo(self.total_plots + 3)
@@ -771,28 +1126,33 @@ class Strategy(object):
                     i.plot(results, pos)
                     pos += 1
 
-        self._extra_analyze(context, results, pos)
+        if context is not None:
+            self._extra_analyze(context, results, pos)
         pos += self._extra_plots
 
-        viz.plot_buy_sells(results, pos=pos)
+        viz.plot_buy_sells(results, pos=pos, transactions=transactions)
 
         strat_dir = os.path.join(os.path.abspath(PERF_DIR), self.name)
         os.makedirs(strat_dir, exist_ok=True)
         plot_file = f"summary_plot.png"
         filename = os.path.join(strat_dir, plot_file)
-        plt.savefig(filename)
+        plt.savefig(filename, dpi=viz.PLOT_DPI)
         plt.close()
 
+        data_file = os.path.join(strat_dir, "summary_plot.json")
+        with open(data_file, "w") as f:
+            json.dump(viz.series_json(results, self.plot_columns, transactions=transactions), f)
+
         url = outputs.save_plot_to_storage(self, filename)
-        if self.in_job:
-            job = get_current_job()
-            job.meta["plot_url"] = url
-            job.save_meta()
-            self.notify(f"You can view your strategy's plot at {url}")
+        data_url = outputs.save_plot_data_to_storage(self, data_file)
+        return url, data_url
 
     def _analyze(self, context, results):
         """plots results of algo performance, external data, and indicators"""
         self.log.info("Calling analyze function and completing algorithm")
+        if self._checkpoint is not None and self._results_prefix:
+            results = self._with_results_prefix(results)
+
         ending_cash = results.cash[-1]
         self.log.notice("Ending cash: ${}".format(ending_cash))
         self.log.notice("completed for {} trading periods".format(self.state.i))
@@ -802,12 +1162,43 @@ class Strategy(object):
             \nView your strategy's performance at {self.web_url}"
         )
 
+        self.log.info(f"Iteration timings (ms):\n{self.timer.to_frame()}")
+        if self.timer.stacks is not None:
+            self._save_trace()
+
+        if not self.is_backtest:
+            # rows of the iterations since the last uploaded chunk
+            try:
+                outputs.save_stats_to_storage(self, flush=True)
+            except Exception as e:
+                self.log.error("Failed to upload the last statistics")
+                self.log.exception(e)
+
+        # the plots worker reads the uploaded results file
+        url = None
         try:
-            self._make_plots(context, results)
-            # TODO - fix KeyError in quant analysis
-            # quant.dump_plots_to_file(self.name, results)
-        except (ValueError, ZeroDivisionError, KeyError):
-            self.log.error("Not enough data to make plots")
+            url = outputs.save_analysis_to_storage(self, results)
+            if self.in_job:
+                job = get_current_job()
+
+                job.meta["analysis_url"] = url
+                job.meta["timings"] = self.timer.summary()
+                job.save_meta()
+                tasks.publish_progress(job.id, analysis_url=url)
+                self.notify(f"You can view your strategy's analysis at {url}")
+
+        except Exception:
+            self.log.error("Failed to upload strat analysis to storage", exc_info=True)
+
+        if self.in_job and url is None:
+            self.log.error("Skipping plots without an uploaded results file")
+        else:
+            try:
+                self._make_plots(context, results)
+                # TODO - fix KeyError in quant analysis
+                # quant.dump_plots_to_file(self.name, results)
+            except (ValueError, ZeroDivisionError, KeyError):
+                self.log.error("Not enough data to make plots")
 
         try:
             self.quant_results, quant_file = quant.dump_summary_table(self, results)
@@ -822,28 +1213,25 @@ class Strategy(object):
             self.log.error("Failed to get extra results")
 
         for i in self._ml_models:
-            i.analyze(self.name, self.state.DATA_FREQ, extra_results)
+            i.analyze(self.id, self.state.DATA_FREQ, extra_results)
 
         # need to catch all exceptions because algo will end either way
         # except Exception as e:
         #     self.log.error("Error during shutdown/analyze()")
         #     self.log.error(str(e))
 
-        try:
-            url = outputs.save_analysis_to_storage(self, results)
-            if self.in_job:
-                job = get_current_job()
-
-                job.meta["analysis_url"] = url
-                job.save_meta()
-                self.notify(f"You can view your strategy's analysis at {url}")
-
-        except Exception as e:
-            raise e
-            self.log.error("Failed to upload strat analysis to storage", exec_info=True)
-
         self.state.dump_to_context(context)
 
+    def _save_trace(self):
+        trace_file = os.path.join(outputs.get_algo_dir(self), "timings.folded")
+        self.timer.dump_trace(trace_file)
+        self.log.info(f"Saved iteration trace to {trace_file}")
+        if self.in_job:
+            try:
+                outputs.save_trace_to_storage(self, trace_file)
+            except Exception:
+                self.log.error("Failed to upload iteration trace", exc_info=True)
+
     # def upload_results(self, context, results):
 
     def get_extra_results(self, context, results):
@@ -852,94 +1240,30 @@ class Strategy(object):
             "end": self.state.END,
             "minute_freq": self.state.MINUTE_FREQ,
             "data_freq": self.state.DATA_FREQ,
-            "return_profit_pct": results.algorithm_period_return.tail(1).values[0],
-            "sharpe_ratio": "",
-            "sharpe_ratio_benchmark": "",
-            "sortino_ratio": "",
-            "sortino_ratio_benchmark": "",
+            "return_profit_pct": results.algorithm_period_return.values[-1],
         }
 
-        if self.state.DATA_FREQ == "minute":
-            try:
-                self.filter_dates = self.filter_dates.append(
-                    results.algorithm_period_return.tail(1).index
-                )
-                if (
-                    results.algorithm_period_return.loc[self.filter_dates]
-                    .dropna()
-                    .std()
-                    != 0.0
-                ):
-                    extra_results["sharpe_ratio"] = (
-                        results.algorithm_period_return.loc[self.filter_dates]
-                        .dropna()
-                        .mean()
-                        / results.algorithm_period_return.loc[self.filter_dates]
-                        .dropna()
-                        .std()
-                    )
-                if (
-                    results.algorithm_period_return.loc[self.filter_dates].dropna()
-                    - results.benchmark_period_return.loc[self.filter_dates].dropna()
-                ).std() != 0.0:
-                    extra_results["sharpe_ratio_benchmark"] = (
-                        (
-                            results.algorithm_period_return.loc[
-                                self.filter_dates
-                            ].dropna()
-                            - results.benchmark_period_return.loc[
-                                self.filter_dates
-                            ].dropna()
-                        ).mean()
-                        / (
-                            results.algorithm_period_return.loc[
-                                self.filter_dates
-                            ].dropna()
-                            - results.benchmark_period_return.loc[
-                                self.filter_dates
-                            ].dropna()
-                        ).std()
-                    )
-                if (
-                    self.filter_dates
-                    in results.algorithm_period_return.loc[
-                        results.algorithm_period_return < 0
-                    ].index
-                ):
-                    extra_results[
-                        "sortino_ratio"
-                    ] = results.algorithm_period_return.loc[
-                        self.filter_dates
-                    ].dropna().mean() / np.sqrt(
-                        (
-                            results.algorithm_period_return.loc[
-                                results.algorithm_period_return < 0
-                            ]
-                            .loc[self.filter_dates]
-                            .dropna()
-                            ** 2
-                        ).mean()
-                    )
-                    extra_results["sortino_ratio_benchmark"] = (
-                        results.algorithm_period_return.loc[self.filter_dates].dropna()
-                        - results.benchmark_period_return.loc[
-                            self.filter_dates
-                        ].dropna()
-                    ).mean() / np.sqrt(
-                        (
-                            results.algorithm_period_return.loc[
-                                results.algorithm_period_return < 0
-                            ]
-                            .loc[self.filter_dates]
-                            .dropna()
-                            ** 2
-                        ).mean()
-                    )
-            except:
-                pass
+        # minute strategies are evaluated on the dates they operated on
+        if self.state.DATA_FREQ == "minute" and self.filter_dates is not None:
+            dates = self.filter_dates.append(results.index[-1:])
+            masked = results[results.index.isin(dates)]
         else:
-            extra_results["sharpe_ratio"] = results.sharpe[30:].mean()
-            extra_results["sortino_ratio"] = results.sortino[30:].mean()
+            masked = results
+
+        metrics = risk_metrics.risk_metrics(
+            masked.algorithm_period_return.values,
+            benchmark_returns=masked.benchmark_period_return.values,
+            portfolio_value=masked.portfolio_value.values,
+            starting_exposure=masked.starting_exposure.values,
+        )
+
+        if self.state.DATA_FREQ == "daily":
+            # catalyst's rolling ratios, without the first samples
+            metrics["sharpe_ratio"] = results.sharpe[30:].mean()
+            metrics["sortino_ratio"] = results.sortino[30:].mean()
+
+        for k, v in metrics.items():
+            extra_results[k] = "" if pd.isnull(v) else v
 
         return extra_results
 
@@ -1109,12 +1433,14 @@ class Strategy(object):
         if buys > sells:
             msg = "Signaling to buy"
             self.log.info(msg)
-            self.make_buy(context)
+            with self.timer.span("orders"):
+                self.make_buy(context)
 
         elif sells > buys:
             msg = "Signaling to sell"
             self.log.info(msg)
-            self.make_sell(context)
+            with self.timer.span("orders"):
+                self.make_sell(context)
 
     def check_open_positions(self, context):
         """Check open positions to sell to take profit or to stop loss.
@@ -1330,21 +1656,42 @@ class Strategy(object):
 
     def run_backtest(self):
         self.log.notice("Running in backtest mode")
+        start = pd.to_datetime(self.trading_info["START"], utc=True)
+        capital_base = self.trading_info["CAPITAL_BASE"]
+
+        # jobs requeued by a worker shutdown resume from their last checkpoint
+        self._checkpointing = self.in_job and BACKTEST_CHECKPOINT_BARS > 0
+        if self._checkpointing and get_current_job().meta.get("PAUSED"):
+            self._checkpoint = outputs.load_checkpoint_from_storage(self)
+            if self._checkpoint is not None:
+                start = self._checkpoint["date"]
+                capital_base = self._checkpoint["portfolio"]["portfolio_value"]
+                self.log.warning(f"Resuming backtest from {start}")
+
         try:
             run_algorithm(
                 algo_namespace=self.id,
-                capital_base=self.trading_info["CAPITAL_BASE"],
+                capital_base=capital_base,
                 data_frequency=self.trading_info["DATA_FREQ"],
                 initialize=self._init_func,
                 handle_data=self._process_data,
                 analyze=self._analyze,
                 exchange_name=self.trading_info["EXCHANGE"],
                 quote_currency=self.trading_info["QUOTE_CURRENCY"],
-                start=pd.to_datetime(self.trading_info["START"], utc=True),
+                start=start,
                 end=pd.to_datetime(self.trading_info["END"], utc=True),
             )
+            if self._checkpointing:
+                outputs.delete_checkpoint_from_storage(self)
         except exchange_errors.PricingDataNotLoadedError as e:
             self.log.critical("Failed to run stratey Requires data ingestion")
+            tasks.request_ingest(
+                self.trading_info["EXCHANGE"],
+                self.trading_info["ASSET"],
+                self.trading_info["DATA_FREQ"],
+                start=self.trading_info["START"],
+                end=self.trading_info["END"],
+            )
             raise e
             # from kryptos.worker import ingester
             # ingester.run_ingest(self.exchange, symbol=self.trading_info['ASSET'])
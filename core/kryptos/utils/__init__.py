@@ -1,5 +1,11 @@
-from google.cloud import storage
+from kryptos.utils.lazy import LazyObject
 
-storage_client = storage.Client()
 
-from . import auth, load, outputs, tasks, viz
+def _storage_client():
+    from google.cloud import storage
+
+    return storage.Client()
+
+
+# created on first use, so importing a kryptos.utils module doesn't authenticate with GCP
+storage_client = LazyObject(_storage_client)
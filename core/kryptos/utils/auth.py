@@ -7,11 +7,16 @@ import logbook
 
 from kryptos.settings import PROJECT_ID
 from kryptos.utils import storage_client
+from kryptos.utils.lazy import LazyObject
 
 
-from google.cloud import kms_v1
+def _key_client():
+    from google.cloud import kms_v1
 
-key_client = kms_v1.KeyManagementServiceClient()
+    return kms_v1.KeyManagementServiceClient()
+
+
+key_client = LazyObject(_key_client)
 
 
 log = logbook.Logger("ExchangeAuth")
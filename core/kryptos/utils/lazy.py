@@ -0,0 +1,27 @@
+import threading
+
+
+class LazyObject(object):
+    """Proxy creating its target with factory on first attribute access
+
+    Lets modules expose heavy dependencies and cloud clients at module level
+    without paying for them at import time.
+    """
+
+    def __init__(self, factory):
+        self.__dict__["_factory"] = factory
+        self.__dict__["_target"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self.__dict__["_target"] = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
@@ -1,10 +1,15 @@
 import os
+import io
+import json
 import time
+import gzip
+import pickle
 from pathlib import Path
+import pandas as pd
 from google.api_core.exceptions import NotFound
 
-from kryptos.settings import CONFIG_ENV, PERF_DIR, DEFAULT_CONFIG as CONFIG
-from kryptos.utils import storage_client
+from kryptos.settings import CONFIG_ENV, PERF_DIR, STATS_CHUNK_ITERATIONS, DEFAULT_CONFIG as CONFIG
+from kryptos.utils import storage_client, results_file
 
 
 def in_docker():
@@ -20,9 +25,11 @@ def in_docker():
     return False
 
 
-def dump_to_csv(filename, results, context=None):
-    results.rename_axis("date").to_csv(filename + ".csv")
-    results.rename_axis("date").to_pickle(filename + ".p")
+def dump_to_csv(filename, results, context=None, csv=False):
+    """Writes the results tables to filename.h5, and a flat CSV if csv is set"""
+    results_file.write(filename + ".h5", results)
+    if csv:
+        results.rename_axis("date").to_csv(filename + ".csv")
 
 
 def get_output_file(algo, config):
@@ -78,6 +85,11 @@ def get_algo_state_file(strat):
     return os.path.join(algo_folder, mode_state_file)
 
 
+def get_checkpoint_file(strat):
+    algo_folder = get_algo_dir(strat)
+    return os.path.join(algo_folder, f"checkpoint_{strat.mode}.p.gz")
+
+
 def get_stats_bucket():
 
     if CONFIG_ENV == "dev":
@@ -93,21 +105,25 @@ def get_stats_bucket():
     return stats_bucket
 
 
+def get_analysis_blob_name(strat):
+    return f"{strat.id}/stats_{strat.mode}/final_performance.h5"
+
+
 def save_analysis_to_storage(strat, results):
+    """Uploads the results as compressed tables, see kryptos.utils.results_file"""
 
     strat.log.debug("Saving final performance to disk")
     folder = get_stats_dir(strat)
-    filename = os.path.join(folder, "final_performance.csv")
+    filename = os.path.join(folder, "final_performance.h5")
 
     os.makedirs(folder, exist_ok=True)
-    with open(filename, "w") as f:
-        results.to_csv(f)
+    results_file.write(filename, results, timings=strat.timer.to_frame())
 
     strat.log.debug("Uploading final performance to storage")
 
     stats_bucket = get_stats_bucket()
 
-    blob_name = f"{strat.id}/stats_{strat.mode}/final_performance.csv"
+    blob_name = get_analysis_blob_name(strat)
     blob = stats_bucket.blob(blob_name)
     blob.upload_from_filename(filename)
     url = f"https://storage.cloud.google.com/strat_stats/{blob_name}"
@@ -130,26 +146,116 @@ def save_plot_to_storage(strat, plot_file):
     return url
 
 
-def save_stats_to_storage(strat):
+def _stats_prefix(strat, day):
+    return f"{strat.id}/stats_{strat.mode}/{day}"
+
+
+def _upload_stats_chunk(strat, stats_bucket, day, progress):
+    """Uploads the rows of the day's stats file not uploaded yet, returns the new progress"""
+    filename = os.path.join(get_stats_dir(strat), "{}.csv".format(day))
+    if not os.path.exists(filename):
+        return progress
+
+    df = pd.read_csv(filename, index_col=0, parse_dates=True)
+    if progress.get("last") is not None:
+        # catalyst may rewrite the file with fewer rows, so rows are
+        # selected by time rather than by position
+        new_rows = df[df.index > pd.Timestamp(progress["last"])]
+    else:
+        new_rows = df.iloc[progress["rows"]:]
+    if new_rows.empty:
+        return progress
+
+    prefix = _stats_prefix(strat, day)
+    chunk_name = "chunk-{:05d}.csv".format(progress["seq"])
+    chunk_file = os.path.join(get_stats_dir(strat), f"{day}-{chunk_name}")
+    new_rows.to_csv(chunk_file)
+    stats_bucket.blob(f"{prefix}/{chunk_name}").upload_from_filename(chunk_file)
+    os.remove(chunk_file)
+
+    manifest = progress["manifest"] + [
+        {
+            "name": chunk_name,
+            "rows": len(new_rows),
+            "start": str(new_rows.index[0]),
+            "end": str(new_rows.index[-1]),
+        }
+    ]
+    stats_bucket.blob(f"{prefix}/manifest.json").upload_from_string(
+        json.dumps({"chunks": manifest}), content_type="application/json"
+    )
+    return {
+        "day": day,
+        "rows": len(df),
+        "last": str(new_rows.index[-1]),
+        "seq": progress["seq"] + 1,
+        "manifest": manifest,
+    }
+
+
+def save_stats_to_storage(strat, flush=False):
+    """Uploads the stats of the last iterations as an immutable chunk
+
+    Catalyst rewrites the day's stats file after every handle_data, but
+    only the rows added since the last chunk are uploaded, every
+    STATS_CHUNK_ITERATIONS iterations, so the uploaded bytes grow linearly
+    with the number of iterations. Each day's chunks are listed in a
+    manifest, read back with iter_stats_from_storage.
+
+    The upload progress is kept in the strategy state, stored with the
+    catalyst state, so a resumed strategy continues its chunk sequence.
+
+    Keyword Arguments:
+        flush {bool} -- uploads the remaining rows whatever the iteration,
+            when the strategy completes
+    """
     # the following file was written to disk via catalyst
     # during it's repeated _save_stats_csv() method
     # after every handle_data
 
     # However this file won't be written until the end of the iteration,
     # so upload occurs the followign iteration
-    strat.log.debug("Uploading previous iteration stats")
-    stats_folder = get_stats_dir(strat)
-
-    timestr = time.strftime("%Y%m%d")
-    filename = os.path.join(stats_folder, "{}.csv".format(timestr))
+    day = time.strftime("%Y%m%d")
+    progress = getattr(strat.state, "stats_upload", None)
+    day_changed = progress is not None and progress["day"] != day
+    if not (flush or day_changed) and strat.state.i % STATS_CHUNK_ITERATIONS != 0:
+        return None
 
+    strat.log.debug("Uploading stats of the previous iterations")
     stats_bucket = get_stats_bucket()
 
-    blob_name = f"{strat.id}/stats_{strat.mode}/{timestr}".format(timestr)
-    blob = stats_bucket.blob(blob_name)
-    blob.upload_from_filename(filename)
+    if day_changed:
+        # the last rows of the previous day
+        _upload_stats_chunk(strat, stats_bucket, progress["day"], progress)
+        progress = None
+
+    if progress is None:
+        progress = {"day": day, "rows": 0, "last": None, "seq": 0, "manifest": []}
+
+    strat.state.stats_upload = _upload_stats_chunk(strat, stats_bucket, day, progress)
     strat.log.info(f"Uploaded iteration {strat.state.i - 1} statistics")
-    return blob_name, stats_bucket.name
+    return _stats_prefix(strat, day), stats_bucket.name
+
+
+def iter_stats_from_storage(strat, day):
+    """Yields the day's stats chunks as dataframes, downloading each one when reached"""
+    stats_bucket = get_stats_bucket()
+    prefix = _stats_prefix(strat, day)
+    try:
+        manifest = json.loads(stats_bucket.blob(f"{prefix}/manifest.json").download_as_string())
+    except NotFound:
+        return
+
+    for chunk in manifest["chunks"]:
+        data = stats_bucket.blob(f"{prefix}/{chunk['name']}").download_as_string()
+        yield pd.read_csv(io.BytesIO(data), index_col=0)
+
+
+def load_stats_from_storage(strat, day):
+    chunks = list(iter_stats_from_storage(strat, day))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks)
 
 
 def save_quant_to_storage(strat, quant_file):
@@ -166,6 +272,20 @@ def save_quant_to_storage(strat, quant_file):
     return url
 
 
+def save_trace_to_storage(strat, trace_file):
+    """Uploads the folded stacks of the strategy's iterations, see kryptos.utils.timing"""
+    strat.log.debug("Uploading iteration trace to storage")
+
+    stats_bucket = get_stats_bucket()
+
+    blob_name = f"{strat.id}/stats_{strat.mode}/timings.folded"
+    blob = stats_bucket.blob(blob_name)
+    blob.upload_from_filename(trace_file, content_type="text/plain")
+    url = f"https://storage.cloud.google.com/strat_stats/{blob_name}"
+    strat.log.info(f"Iteration trace URL: {url}")
+    return url
+
+
 def upload_state_to_storage(strat):
     stats_bucket = get_stats_bucket()
     filename = get_algo_state_file(strat)
@@ -198,3 +318,105 @@ def load_state_from_storage(strat):
         # prevent catalyst loading empty pickle
         os.remove(filename)
         return False
+
+
+def _checkpoint_blob_name(strat):
+    return f"{strat.id}/checkpoint_{strat.mode}.p.gz"
+
+
+def _results_segment_blob_name(strat, segment):
+    return f"{strat.id}/checkpoint_{strat.mode}/results-{segment:05d}.p.gz"
+
+
+def _upload_pickle(bucket, blob_name, filename, obj):
+    with gzip.open(filename, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    bucket.blob(blob_name).upload_from_filename(filename)
+
+
+def _download_pickle(bucket, blob_name, filename):
+    bucket.blob(blob_name).download_to_filename(filename)
+    with gzip.open(filename, "rb") as f:
+        return pickle.load(f)
+
+
+def save_checkpoint_to_storage(strat, checkpoint, results_rows=None):
+    """Uploads a checkpoint
+
+    The results rows recorded since the previous checkpoint are uploaded
+    as their own segment, the last of checkpoint["results_segments"], so
+    each checkpoint only uploads the bars processed since the previous one.
+    """
+    filename = get_checkpoint_file(strat)
+    stats_bucket = get_stats_bucket()
+
+    if results_rows:
+        segment = checkpoint["results_segments"] - 1
+        _upload_pickle(
+            stats_bucket, _results_segment_blob_name(strat, segment), filename, results_rows
+        )
+
+    # uploaded last, so the checkpoint never refers to a missing segment
+    blob_name = _checkpoint_blob_name(strat)
+    _upload_pickle(stats_bucket, blob_name, filename, checkpoint)
+    strat.log.info(f"Uploaded checkpoint of iteration {strat.state.i}")
+    return blob_name, stats_bucket.name
+
+
+def load_checkpoint_from_storage(strat):
+    """Downloads the last checkpoint, with its results segments in checkpoint["results"]"""
+    strat.log.debug("Checking for previous checkpoint")
+    stats_bucket = get_stats_bucket()
+    filename = get_checkpoint_file(strat)
+
+    try:
+        checkpoint = _download_pickle(stats_bucket, _checkpoint_blob_name(strat), filename)
+        checkpoint["results"] = [
+            _download_pickle(stats_bucket, _results_segment_blob_name(strat, segment), filename)
+            for segment in range(checkpoint["results_segments"])
+        ]
+    except NotFound:
+        strat.log.info("No previous checkpoint found")
+        if os.path.exists(filename):
+            os.remove(filename)
+        return None
+
+    strat.log.info(f"Downloaded checkpoint of iteration {checkpoint['state']['i']}")
+    return checkpoint
+
+
+def delete_checkpoint_from_storage(strat):
+    stats_bucket = get_stats_bucket()
+    prefix = f"{strat.id}/checkpoint_{strat.mode}"
+    for blob in stats_bucket.list_blobs(prefix=prefix):
+        try:
+            blob.delete()
+        except NotFound:
+            pass
+    strat.log.debug("Deleted checkpoint from storage")
+
+    filename = get_checkpoint_file(strat)
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+def load_results_from_storage(strat, blob_name):
+    """Downloads a results file, returns its local path to read with results_file.read"""
+    folder = get_stats_dir(strat)
+    os.makedirs(folder, exist_ok=True)
+    filename = os.path.join(folder, os.path.basename(blob_name))
+    get_stats_bucket().blob(blob_name).download_to_filename(filename)
+    return filename
+
+
+def save_plot_data_to_storage(strat, data_file):
+    strat.log.debug("Uploading plot series to storage")
+
+    stats_bucket = get_stats_bucket()
+
+    blob_name = f"{strat.id}/stats_{strat.mode}/summary_plot.json"
+    blob = stats_bucket.blob(blob_name)
+    blob.upload_from_filename(data_file, content_type="application/json")
+    url = f"https://storage.cloud.google.com/strat_stats/{blob_name}"
+    strat.log.info(f"Plot Data URL: {url}")
+    return url
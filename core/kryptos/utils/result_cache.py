@@ -0,0 +1,111 @@
+import json
+import hashlib
+
+import pandas as pd
+import redis
+
+from kryptos.settings import REDIS_HOST, REDIS_PORT
+
+
+CONN = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+
+# bump when a change to the strategy or analysis code changes backtest results
+CACHE_VERSION = 1
+
+ENTRY_KEY = "backtest:result:{}"
+RANGE_KEY = "backtest:ranges:{}:{}:{}"
+ENTRY_TTL = 60 * 60 * 24 * 30
+
+# fields that don't change a backtest's results
+VOLATILE_FIELDS = ["id", "name"]
+
+# the key of CHECK_STRAT, stored by the workers so the web app can check
+# that its copy of strat_hash produces the same keys
+CHECK_KEY = "backtest:check"
+CHECK_STRAT = {
+    "name": "check",
+    "trading": {"EXCHANGE": "binance", "ASSET": "btc_usdt", "CAPITAL_BASE": 5000.0},
+    "indicators": [{"name": "EMA", "params": {"timeperiod": 30}}],
+}
+
+
+def strat_hash(strat_dict):
+    """Returns the cache key of a strategy's backtest
+
+    The strategy dict (as returned by Strategy.to_dict or submitted as strat_json)
+    is serialized with sorted keys so equal strategies always produce the same key.
+    The web app computes the same key (app.task.backtest_cache_key).
+    """
+    d = {k: v for k, v in strat_dict.items() if k not in VOLATILE_FIELDS}
+    canonical = json.dumps(d, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{CACHE_VERSION}:{canonical}".encode()).hexdigest()
+
+
+def _range_key(exchange, symbol, data_freq):
+    return RANGE_KEY.format(exchange.lower(), symbol, data_freq)
+
+
+def get(key):
+    """Returns the cached result, plot and analysis urls, or None"""
+    entry = CONN.hgetall(ENTRY_KEY.format(key))
+    if not entry:
+        return None
+    return {k.decode(): v.decode() for k, v in entry.items()}
+
+
+def put(key, trading_info, result_json, plot_url=None, analysis_url=None):
+    """Stores a backtest result, indexed by the date range it depends on"""
+    start = pd.to_datetime(trading_info["START"], utc=True)
+    end = pd.to_datetime(trading_info["END"], utc=True)
+    entry = {
+        "result": result_json,
+        "plot_url": plot_url or "",
+        "analysis_url": analysis_url or "",
+        "start": start.value,
+    }
+
+    range_key = _range_key(trading_info["EXCHANGE"], trading_info["ASSET"], trading_info["DATA_FREQ"])
+    pipe = CONN.pipeline()
+    pipe.hmset(ENTRY_KEY.format(key), entry)
+    pipe.expire(ENTRY_KEY.format(key), ENTRY_TTL)
+    pipe.zadd(range_key, key, end.value)
+    pipe.expire(range_key, ENTRY_TTL)
+    pipe.set(CHECK_KEY, strat_hash(CHECK_STRAT))
+    pipe.execute()
+
+
+def set_urls(key, **urls):
+    """Adds urls produced after the result was cached, such as the plot rendered by a plots worker"""
+    entry_key = ENTRY_KEY.format(key)
+    if CONN.exists(entry_key):
+        CONN.hmset(entry_key, {k: v or "" for k, v in urls.items()})
+
+
+def invalidate(exchange, symbol, data_freq, start=None, end=None):
+    """Removes the results of backtests overlapping newly ingested data
+
+    Keyword Arguments:
+        start {datetime-like} -- first ingested bar (default: beginning of time)
+        end {datetime-like} -- last ingested bar (default: end of time)
+
+    Returns:
+        int -- number of removed results
+    """
+    range_key = _range_key(exchange, symbol, data_freq)
+    low = "-inf" if start is None else pd.to_datetime(start, utc=True).value
+    high = None if end is None else pd.to_datetime(end, utc=True).value
+
+    # results ending before the ingested range are not affected
+    removed = []
+    for key in CONN.zrangebyscore(range_key, low, "+inf"):
+        key = key.decode()
+        entry_start = CONN.hget(ENTRY_KEY.format(key), "start")
+        if high is None or entry_start is None or int(entry_start) <= high:
+            removed.append(key)
+
+    if removed:
+        pipe = CONN.pipeline()
+        pipe.delete(*[ENTRY_KEY.format(k) for k in removed])
+        pipe.zrem(range_key, *removed)
+        pipe.execute()
+    return len(removed)
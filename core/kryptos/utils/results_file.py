@@ -0,0 +1,122 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# catalyst results columns holding a list of dicts per bar,
+# each is stored as its own table with one row per item
+NESTED_COLUMNS = ["transactions", "orders", "positions"]
+
+PERF_TABLE = "perf"
+TIMINGS_TABLE = "timings"
+COMPLIB = "blosc"
+COMPLEVEL = 5
+
+
+def _scalar(v):
+    """Converts nested values (assets, datetimes) to storable scalars"""
+    if v is None:
+        return np.nan
+    if hasattr(v, "symbol"):
+        return v.symbol
+    if isinstance(v, datetime.datetime):
+        return pd.Timestamp(v)
+    return v
+
+
+def _typed(df):
+    """Gives object columns a storable type: datetime or numeric when possible, else string"""
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        values = df[col].dropna()
+        if len(values) and all(isinstance(v, pd.Timestamp) for v in values):
+            df[col] = pd.to_datetime(df[col], utc=True)
+            continue
+        numeric = pd.to_numeric(df[col], errors="coerce")
+        if numeric.notnull().sum() == df[col].notnull().sum():
+            df[col] = numeric
+        else:
+            df[col] = df[col].where(df[col].isnull(), df[col].astype(str)).fillna("")
+    return df
+
+
+def _nested_table(results, column):
+    rows, periods = [], []
+    for period, items in zip(results.index, results[column].values):
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            rows.append({k: _scalar(v) for k, v in item.items()})
+            periods.append(period)
+
+    if not rows:
+        return None
+
+    df = pd.DataFrame(rows)
+    df["period"] = pd.DatetimeIndex(periods)
+    if "dt" in df.columns:
+        df = df.set_index(pd.DatetimeIndex(df.pop("dt")))
+    else:
+        df = df.set_index("period", drop=False)
+    df.index.name = "dt"
+    return _typed(df)
+
+
+def write(path, results, timings=None):
+    """Writes catalyst results as compressed, typed HDF5 tables
+
+    The per bar values are stored in the "perf" table, one column per
+    results column. Transactions, orders and positions are normalized into
+    tables of the same name, one row per item, indexed by their date and
+    keeping the bar they belong to in a "period" column.
+
+    Keyword Arguments:
+        timings {pandas.DataFrame} -- iteration timings, stored in the "timings" table (default: {None})
+    """
+    perf = _typed(results.drop([c for c in NESTED_COLUMNS if c in results.columns], axis=1).copy())
+    perf.index.name = "date"
+
+    with pd.HDFStore(path, mode="w", complib=COMPLIB, complevel=COMPLEVEL) as store:
+        store.put(PERF_TABLE, perf, format="table", data_columns=True)
+        for column in NESTED_COLUMNS:
+            if column not in results.columns:
+                continue
+            table = _nested_table(results, column)
+            if table is not None:
+                store.put(column, table, format="table", data_columns=True)
+        if timings is not None and len(timings):
+            store.put(TIMINGS_TABLE, timings, format="table")
+    return path
+
+
+def tables(path):
+    with pd.HDFStore(path, mode="r") as store:
+        return [k.strip("/") for k in store.keys()]
+
+
+def _utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("utc") if ts.tzinfo is None else ts.tz_convert("utc")
+
+
+def read(path, table=PERF_TABLE, columns=None, start=None, end=None):
+    """Reads selected columns of a table, between start and end (inclusive)
+
+    Returns an empty dataframe for the nested tables of results without
+    transactions, orders or positions.
+    """
+    terms = []
+    # the query resolves start and end from this scope
+    if start is not None:
+        start = _utc(start)
+        terms.append("index >= start")
+    if end is not None:
+        end = _utc(end)
+        terms.append("index <= end")
+
+    with pd.HDFStore(path, mode="r") as store:
+        if "/" + table not in store.keys():
+            return pd.DataFrame(columns=columns)
+        return store.select(table, where=" & ".join(terms) or None, columns=columns)
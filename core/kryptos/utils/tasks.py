@@ -1,23 +1,76 @@
+import json
 from rq import Connection, Queue
 import redis
-from kryptos.settings import REDIS_HOST, REDIS_PORT, DEFAULT_CONFIG
+from kryptos.settings import (
+    REDIS_HOST,
+    REDIS_PORT,
+    DEFAULT_CONFIG,
+    INGEST_PRIORITY_KEY,
+    STRAT_PROGRESS_CHANNEL,
+    ENQUEUED_CHANNEL,
+    NOTIFICATION_QUEUE_KEY,
+)
 
 CONN = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
 
 
 def queue_notification(msg, telegram_id):
+    """Hands a telegram message to the updater, which batches and rate limits them per chat"""
     if telegram_id is None:
         return
-    with Connection(CONN):
-        q = Queue("updates")
-        q.enqueue("updater.send_notification", msg=msg, telegram_id=telegram_id)
+    # pushed on the left, the updater moves the oldest from the right to its processing list
+    CONN.lpush(NOTIFICATION_QUEUE_KEY, json.dumps({"chat_id": telegram_id, "msg": msg}))
+
+
+def publish_progress(strat_id, **fields):
+    """Publishes strategy progress (status, date, log, plot_url, analysis_url) to the web app"""
+    if strat_id is None:
+        return
+    fields["strat_id"] = strat_id
+    CONN.publish(STRAT_PROGRESS_CHANNEL.format(strat_id), json.dumps(fields, default=str))
 
 
-def enqueue_ml_calculate(
-    df_current, namespace, name, idx, current_datetime, hyper_params, df_final, **kw
+def enqueue_plots(
+    strat_json, strat_id, mode, results_blob, telegram_id=None, cache_key=None, depends_on=None
 ):
+    """Queues the rendering of a strategy's plots from its saved results
+
+    Keyword Arguments:
+        cache_key {str} -- result_cache key of the backtest, updated with the plot urls
+        depends_on {str} -- id of the strategy job, plots are rendered once it has finished
+    """
+    with Connection(CONN):
+        q = Queue("plots")
+        job = q.enqueue(
+            "kryptos.worker.jobs.render_plots",
+            kwargs={
+                "strat_json": strat_json,
+                "strat_id": strat_id,
+                "mode": mode,
+                "results_blob": results_blob,
+                "telegram_id": telegram_id,
+                "cache_key": cache_key,
+            },
+            depends_on=depends_on,
+            timeout=600,
+        )
+    CONN.publish(ENQUEUED_CHANNEL, q.name)
+    return job
+
+
+def request_ingest(exchange, symbol, data_freq, start=None, end=None):
+    """Asks the ingester to load a symbol before its regular pass"""
+    payload = {
+        "symbol": symbol,
+        "data_freq": data_freq,
+        "start": None if start is None else str(start),
+        "end": None if end is None else str(end),
+    }
+    CONN.rpush(INGEST_PRIORITY_KEY.format(exchange=exchange.lower()), json.dumps(payload))
+
+
+def enqueue_ml_calculate(df_current, namespace, name, idx, current_datetime, hyper_params, **kw):
     df_current_json = df_current.to_json()
-    df_final_json = df_final.to_json()
     with Connection(CONN):
         q = Queue("ml")
         return q.enqueue(
@@ -28,7 +81,6 @@ def enqueue_ml_calculate(
                 name,
                 idx,
                 current_datetime,
-                df_final_json,
                 DEFAULT_CONFIG["DATA_FREQ"],
                 hyper_params,
             ],
@@ -37,13 +89,13 @@ def enqueue_ml_calculate(
         )
 
 
-def enqueue_ml_analyze(namespace, name, df_final, df_results, data_freq, extra_results):
-    df_final_json = df_final.to_json()
-    df_results_json = df_results.to_json()
+def enqueue_ml_analyze(namespace, name, data_freq, extra_results):
+    # processed rows and predictions are kept by the ml service
+    # so only the store handle (namespace, name) is sent
     with Connection(CONN):
         q = Queue("ml")
         return q.enqueue(
             "worker.analyze",
-            args=[namespace, name, df_final_json, df_results_json, data_freq, extra_results],
+            args=[namespace, name, data_freq, extra_results],
             timeout=str(DEFAULT_CONFIG["MINUTE_FREQ"]) + "m",  # allow job to run for full iteration
         )
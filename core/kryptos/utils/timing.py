@@ -0,0 +1,101 @@
+import time
+import random
+from array import array
+from contextlib import contextmanager
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from kryptos.settings import TIMING_SAMPLES
+
+
+PERCENTILES = [50, 90, 99]
+
+
+class SpanStats(object):
+    """Count, total and max of a span's durations, and a uniform sample of them for percentiles"""
+
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = array("d")
+
+    def add(self, seconds, max_samples, rng):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if len(self.samples) < max_samples:
+            self.samples.append(seconds)
+        else:
+            # reservoir sampling, every duration has the same chance to be kept
+            i = rng.randrange(self.count)
+            if i < max_samples:
+                self.samples[i] = seconds
+
+
+class IterationTimer(object):
+    """Records timing spans of the phases of strategy iterations
+
+    Spans nest, such as orders within signals, and a span's duration includes
+    its children. Durations are summarized per span name in fixed memory.
+    With trace enabled, the self time of each stack of spans is also summed,
+    and dumped as folded stacks, the input of flame graph viewers such as
+    flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, trace=False, max_samples=TIMING_SAMPLES):
+        self.spans = defaultdict(SpanStats)
+        self.stacks = defaultdict(float) if trace else None
+        self.max_samples = max_samples
+        self._stack = []
+        self._children = []  # time spent in the children of each open span
+        self._rng = random.Random(0)
+
+    @contextmanager
+    def span(self, name):
+        self._stack.append(name)
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            if self.stacks is not None:
+                self.stacks[";".join(self._stack)] += elapsed - children
+            self._stack.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            self.spans[name].add(elapsed, self.max_samples, self._rng)
+
+    def summary(self):
+        """Returns the count, total, mean, percentiles and max of each span, in milliseconds"""
+        summary = {}
+        for name, stats in self.spans.items():
+            row = {
+                "count": stats.count,
+                "total_ms": stats.total * 1000,
+                "mean_ms": stats.total / stats.count * 1000,
+            }
+            values = np.percentile(np.frombuffer(stats.samples, dtype="float64"), PERCENTILES)
+            for p, v in zip(PERCENTILES, values):
+                row[f"p{p}_ms"] = v * 1000
+            row["max_ms"] = stats.max * 1000
+            summary[name] = {k: round(v, 3) for k, v in row.items()}
+        return summary
+
+    def to_frame(self):
+        df = pd.DataFrame.from_dict(self.summary(), orient="index")
+        df.index.name = "span"
+        return df.sort_values("total_ms", ascending=False) if len(df) else df
+
+    def dump_trace(self, path):
+        """Writes the folded stacks, one "span;child self_microseconds" line per stack"""
+        with open(path, "w") as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                f.write(f"{stack} {int(round(seconds * 10 ** 6))}\n")
+        return path
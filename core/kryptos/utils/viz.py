@@ -1,15 +1,96 @@
-import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 import os
 from catalyst.exchange.utils.stats_utils import extract_transactions
 from logbook import Logger
 
 from kryptos import logger_group
 from kryptos.settings import PERF_DIR
+from kryptos.utils.lazy import LazyObject
+
+
+def _pyplot():
+    import matplotlib
+
+    matplotlib.use("agg")
+    import matplotlib.pyplot
+
+    return matplotlib.pyplot
+
+
+# imported when the first plot is drawn, shared by the modules drawing plots
+plt = LazyObject(_pyplot)
 
 log = Logger("VIZ")
 logger_group.add_logger(log)
 
+PLOT_DPI = 100
+FIGURE_WIDTH = 6  # inches
+
+# a min and a max per horizontal pixel keeps the drawn shape of long series
+MAX_PLOT_POINTS = 2 * FIGURE_WIDTH * PLOT_DPI
+
+
+def downsample(res, max_points=MAX_PLOT_POINTS):
+    """Reduces a series or dataframe to about max_points rows before drawing
+
+    Single series keep the min and max row of each bucket, so spikes stay
+    visible. Multi-column frames keep every n-th row. The last row is always kept.
+    """
+    n = len(res)
+    if n <= max_points:
+        return res
+
+    if isinstance(res, pd.DataFrame) and len(res.columns) == 1:
+        values = res.iloc[:, 0].values
+    elif isinstance(res, pd.Series):
+        values = res.values
+    else:
+        step = int(np.ceil(n / max_points))
+        return res.iloc[np.r_[np.arange(0, n, step), n - 1]]
+
+    values = values.astype("float64")
+    for_min = np.where(np.isnan(values), np.inf, values)
+    for_max = np.where(np.isnan(values), -np.inf, values)
+
+    edges = np.linspace(0, n, max_points // 2 + 1).astype(int)
+    keep = [n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            keep.append(lo + int(np.argmin(for_min[lo:hi])))
+            keep.append(lo + int(np.argmax(for_max[lo:hi])))
+    return res.iloc[np.unique(keep)]
+
+
+def series_json(results, columns, max_points=MAX_PLOT_POINTS, transactions=None):
+    """Returns downsampled series and trades of the results, for client side charts
+
+    Keyword Arguments:
+        transactions {pandas.DataFrame} -- amount and price of the trades (default: extracted from results)
+
+    Returns:
+        dict -- index (epoch ms), series by column, buys and sells as [ms, price]
+    """
+    columns = [c for c in columns if c in results.columns]
+    res = downsample(results[columns], max_points)
+
+    def clean(values):
+        return [None if pd.isnull(v) else float(v) for v in values]
+
+    data = {
+        "index": (pd.DatetimeIndex(res.index).asi8 // 10 ** 6).tolist(),
+        "series": {c: clean(res[c].values) for c in columns},
+        "buys": [],
+        "sells": [],
+    }
+
+    transaction_df = extract_transactions(results) if transactions is None else transactions
+    if not transaction_df.empty:
+        times = pd.DatetimeIndex(transaction_df.index).asi8 // 10 ** 6
+        for t, amount, price in zip(times, transaction_df["amount"], transaction_df["price"]):
+            data["buys" if amount > 0 else "sells"].append([int(t), float(price)])
+    return data
+
 
 def show_plot():
     """Prevents crashing when scrolling on macOS"""
@@ -29,11 +110,11 @@ def save_plot(config, name):
     if not os.path.exists(FIG_PATH):
         os.makedirs(FIG_PATH)
     f_path = os.path.join(FIG_PATH, "{}.png".format(name))
-    plt.savefig(f_path, bbox_inches="tight", dpi=300)
+    plt.savefig(f_path, bbox_inches="tight", dpi=PLOT_DPI)
 
 
 def get_start_geo(num_plots, cols=1):
-    fig = plt.figure(figsize=(6, 14))
+    fig = plt.figure(figsize=(FIGURE_WIDTH, 14))
     start = int(str(num_plots) + str(cols) + "1")
     return start
 
@@ -62,7 +143,7 @@ def plot_portfolio(context, results, name=None, pos=211):
     # First chart: Plot portfolio value using base_currency
     ax = plt.subplot(pos)
 
-    val = results.loc[:, ["portfolio_value"]]
+    val = downsample(results.loc[:, ["portfolio_value"]])
     ax.plot(val, label=name)
 
     ax.set_ylabel("Portfolio Value\n({})".format(base_currency))
@@ -75,22 +156,22 @@ def plot_percent_return(results, name=None, pos=211):
         name = "Strategy"
     ax1 = plt.subplot(pos)
     ax1.set_ylabel("Percent Return (%)")
-    res = results.loc[:, ["algorithm_period_return"]]
+    res = downsample(results.loc[:, ["algorithm_period_return"]])
     ax1.plot(res, label=name)
 
 
 def plot_benchmark(results, pos=211):
     ax = plt.subplot(pos)
-    bench = results.loc[:, ["benchmark_period_return"]]
+    bench = downsample(results.loc[:, ["benchmark_period_return"]])
     ax.plot(bench, label="Benchmark", linestyle="--")
 
 
 def plot_as_points(results, column, pos, y_val=None, label=None, marker="o", color="green"):
     ax = plt.subplot(pos)
 
-    res = results.loc[:, [column]]
+    res = downsample(results.loc[:, [column]])
 
-    ax.scatter(results.index.to_pydatetime(), res, marker=marker, s=5, c=color, label=label)
+    ax.scatter(res.index.to_pydatetime(), res, marker=marker, s=5, c=color, label=label)
 
 
 def plot_column(results, column, pos, y_label=None, label=None, add_mean=False, twin=None, **kw):
@@ -109,7 +190,7 @@ def plot_column(results, column, pos, y_label=None, label=None, add_mean=False,
         ax = twin.twinx()
     ax.set_ylabel(y_label)
 
-    res = results.loc[:, [column]]
+    res = downsample(results.loc[:, [column]])
     ax.plot(res, label=label, **kw)
 
     if add_mean:
@@ -126,7 +207,7 @@ def plot_bar(results, column, pos, label=None, twin=None, **kw):
     else:
         ax = twin.twinx()
 
-    res = results.loc[:, [column]]
+    res = downsample(results.loc[:, [column]])
     ax.bar(res.index, res[column].values, label=label, **kw)
 
 
@@ -142,7 +223,7 @@ def mark_on_line(results, pos, y_val=None, label=None, marker="o", color="green"
     )
 
 
-def plot_buy_sells(results, pos, y_val=None):
+def plot_buy_sells(results, pos, y_val=None, transactions=None):
     # Plot the price increase or decrease over time.
 
     if y_val is None:
@@ -152,7 +233,7 @@ def plot_buy_sells(results, pos, y_val=None):
     else:  # dont plot price if using other y_val
         ax = plt.subplot(pos)
 
-    transaction_df = extract_transactions(results)
+    transaction_df = extract_transactions(results) if transactions is None else transactions
     if not transaction_df.empty:
         buy_df = transaction_df[transaction_df["amount"] > 0]
         sell_df = transaction_df[transaction_df["amount"] < 0]
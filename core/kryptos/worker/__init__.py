@@ -1,2 +1,2 @@
-from . import jobs, manager, worker
-from .jobs import run_strat
\ No newline at end of file
+# jobs are imported by the worker running them, so starting workers doesn't load catalyst
+from . import manager, worker
@@ -4,9 +4,13 @@ import talib as ta
 from typing import List, Set
 from talib import abstract as ab
 import ccxt
+from rq import get_current_job
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
 
 from kryptos import logger_group
 from kryptos.strategy import Strategy
+from kryptos.utils import result_cache, tasks, outputs, results_file
 from kryptos.settings import REDIS_HOST, REDIS_PORT
 
 
@@ -25,9 +29,19 @@ def run_strat(
 ):
     log.info(f"Worker received job for strat {strat_id}")
     strat_dict = json.loads(strat_json)
+
+    cache_key = None
+    if not live:
+        cache_key = result_cache.strat_hash(strat_dict)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            log.info(f"Using cached backtest result for strat {strat_id}")
+            return _cached_result(strat_id, cached)
+
     strat = Strategy.from_dict(strat_dict)
     strat.id = strat_id
     strat.telegram_id = telegram_id
+    strat.cache_key = cache_key
 
     strat.run(
         viz=False,
@@ -41,7 +55,65 @@ def run_strat(
         log.warning("No results from strategy")
         return
 
-    return result_df.to_json()
+    result_json = result_df.to_json()
+    if cache_key is not None:
+        job = get_current_job()
+        meta = job.meta if job is not None else {}
+        result_cache.put(
+            cache_key,
+            strat.trading_info,
+            result_json,
+            plot_url=meta.get("plot_url"),
+            analysis_url=meta.get("analysis_url"),
+        )
+
+    return result_json
+
+
+def _cached_result(strat_id, cached):
+    job = get_current_job()
+    if job is not None:
+        for field in ["plot_url", "plot_data_url", "analysis_url"]:
+            if cached.get(field):
+                job.meta[field] = cached[field]
+                tasks.publish_progress(strat_id, **{field: cached[field]})
+        job.meta["cached_result"] = True
+        job.save_meta()
+    return cached["result"]
+
+
+def render_plots(strat_json, strat_id, mode, results_blob, telegram_id=None, cache_key=None):
+    """Renders the plots of a finished strategy job from its saved results"""
+    log.info(f"Rendering plots of strat {strat_id}")
+    strat_dict = json.loads(strat_json)
+    strat = Strategy.from_dict(strat_dict)
+    strat.id = strat_id
+    strat.mode = mode
+
+    path = outputs.load_results_from_storage(strat, results_blob)
+    # per bar values and trades only, orders and positions are not plotted
+    results = results_file.read(path)
+    transactions = results_file.read(path, "transactions", columns=["period", "amount", "price"])
+    if not transactions.empty:
+        transactions = transactions.set_index("period")
+    plot_url, data_url = strat.render_plots(results, transactions=transactions)
+
+    try:
+        strat_job = Job.fetch(strat_id, connection=tasks.CONN)
+        strat_job.meta["plot_url"] = plot_url
+        strat_job.meta["plot_data_url"] = data_url
+        strat_job.save_meta()
+    except NoSuchJobError:
+        log.warning(f"Strategy job {strat_id} expired before its plots were rendered")
+
+    tasks.publish_progress(strat_id, plot_url=plot_url, plot_data_url=data_url)
+    tasks.queue_notification(f"You can view your strategy's plot at {plot_url}", telegram_id)
+
+    # the key of the submitted strategy, strat_json is the serialized strategy
+    if cache_key is not None:
+        result_cache.set_urls(cache_key, plot_url=plot_url, plot_data_url=data_url)
+
+    return plot_url
 
 
 ## TA-LIB utils ##
@@ -1,3 +1,4 @@
+import os
 import sys
 import redis
 from rq import Connection, get_failed_queue
@@ -18,7 +19,18 @@ from rq.exceptions import ShutDownImminentException
 from kryptos import logger_group, setup_logging
 
 from kryptos.utils import tasks
-from kryptos.settings import QUEUE_NAMES, REDIS_HOST, REDIS_PORT, SENTRY_DSN, CONFIG_ENV
+from kryptos.settings import (
+    QUEUE_NAMES,
+    REDIS_HOST,
+    REDIS_PORT,
+    SENTRY_DSN,
+    CONFIG_ENV,
+    WORKER_SLOTS_PER_CORE,
+    WORKER_JOB_MEMORY_MB,
+    WORKER_MEMORY_FRACTION,
+    WORKER_CHECK_INTERVAL,
+    ENQUEUED_CHANNEL,
+)
 
 from kryptos.worker.worker import StratQueue, StratWorker as Worker
 
@@ -33,6 +45,9 @@ logger_group.add_logger(log)
 
 WORKER_PROCESSES = []
 
+# long lived worker processes of each queue
+WORKER_SLOTS = {q: [] for q in QUEUE_NAMES}
+
 
 def get_queue(queue_name):
     return StratQueue(queue_name, connection=CONN)
@@ -43,18 +58,76 @@ def workers_required(queue_name):
     return len(q)
 
 
+def queue_limits():
+    """Max number of worker slots per queue for this host
+
+    Each queue gets WORKER_SLOTS_PER_CORE slots per core, scaled down
+    if the jobs of all slots wouldn't fit in the host memory.
+    """
+    cores = multiprocessing.cpu_count()
+    memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 2
+    memory_mb *= WORKER_MEMORY_FRACTION
+
+    limits = {q: max(1, int(cores * WORKER_SLOTS_PER_CORE.get(q, 1))) for q in QUEUE_NAMES}
+    required_mb = sum(limits[q] * WORKER_JOB_MEMORY_MB.get(q, 500) for q in QUEUE_NAMES)
+    if required_mb > memory_mb:
+        scale = memory_mb / required_mb
+        limits = {q: max(1, int(l * scale)) for q, l in limits.items()}
+
+    log.info(f"Worker slot limits for {cores} cores, {int(memory_mb)}MB: {limits}")
+    return limits
+
+
+def _work(q, burst=False):
+    # loaded once per worker process instead of in every work horse, which
+    # are forked per job and inherit them. The manager itself stays light.
+    import kryptos.worker.jobs
+
+    # the worker is created in its own process so it registers with its own pid
+    worker = Worker([q], exception_handlers=[exc_handler])
+    worker.work(burst=burst)
+
+
 def spawn_worker(q, burst=False):
     log.info(f"Creating {q} worker")
 
-    worker = Worker([q], exception_handlers=[exc_handler])
-    proc = multiprocessing.Process(target=worker.work, kwargs={"burst": burst})
+    proc = multiprocessing.Process(target=_work, args=(q,), kwargs={"burst": burst})
     proc.daemon = True
     proc.start()
 
     WORKER_PROCESSES.append(proc)
+    WORKER_SLOTS.setdefault(q, []).append(proc)
     return proc
 
 
+def reap_worker_slots():
+    """Forgets worker processes that have exited"""
+    for q, procs in WORKER_SLOTS.items():
+        for p in [p for p in procs if not p.is_alive()]:
+            log.warning(f"{q} worker process {p.pid} exited with code {p.exitcode}")
+            procs.remove(p)
+            if p in WORKER_PROCESSES:
+                WORKER_PROCESSES.remove(p)
+
+
+def scale_queue(q, limits):
+    """Adds worker slots for jobs left waiting in the queue
+
+    Idle slots pick up jobs as soon as they are enqueued, so
+    jobs still in the queue are waiting for a free slot. Once the queue
+    limit is reached, jobs stay queued until a slot frees up.
+    """
+    slots = WORKER_SLOTS.setdefault(q, [])
+    waiting = workers_required(q)
+
+    while waiting > 0 and len(slots) < limits.get(q, 1):
+        spawn_worker(q)
+        waiting -= 1
+
+    if waiting > 0:
+        log.debug(f"{waiting} {q} jobs waiting for a free worker slot ({len(slots)} running)")
+
+
 def remove_zombie_workers():
     log.debug("Removing zombie workers")
     workers = Worker.all(connection=CONN)
@@ -115,29 +188,31 @@ def manage_workers():
 
         requeue_terminated_fail_jobs()
 
-        log.info("Starting initial workers")
-        log.debug("Starting worker for BACKTEST queue")
-        spawn_worker("backtest")
-
-        log.debug("Starting worker for PAPER queues")
-        spawn_worker("paper")
+        limits = queue_limits()
 
-        log.debug("Starting worker for LIVE queues")
-        spawn_worker("live")
+        log.info("Starting initial workers")
+        for q in QUEUE_NAMES:
+            log.debug(f"Starting worker for {q.upper()} queue")
+            spawn_worker(q)
 
-        log.debug("Starting worker for TA queue")
-        spawn_worker("ta")
+        # enqueues are notified by StratQueue and the web app,
+        # queues are also checked periodically for jobs enqueued by other clients
+        pubsub = CONN.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(ENQUEUED_CHANNEL)
 
-        # create paper/live queues when needed
         while not is_suspended(CONN):
-            for q in QUEUE_NAMES:
-                required = workers_required(q)
-                for i in range(required):
-                    spawn_worker(q, burst=True)
-                    time.sleep(5)
+            msg = pubsub.get_message(timeout=WORKER_CHECK_INTERVAL)
+            reap_worker_slots()
+
+            if msg is not None and msg["data"].decode() in QUEUE_NAMES:
+                queues = [msg["data"].decode()]
+            else:
+                queues = QUEUE_NAMES
 
-            time.sleep(2)
+            for q in queues:
+                scale_queue(q, limits)
         else:
+            pubsub.close()
             log.warning("Instance is shutting down")
 
 
@@ -1,6 +1,7 @@
 import os
+import json
 import time
-from threading import Thread
+from threading import Thread, Event, Lock
 import signal
 import sys
 
@@ -17,6 +18,7 @@ from raven.transport.http import HTTPTransport
 from rq.contrib.sentry import register_sentry
 
 from kryptos.logger import setup_logging, logger_group
+from kryptos.settings import ENQUEUED_CHANNEL, STRAT_PROGRESS_CHANNEL, STRAT_COMPLETED_KEY
 
 client = Client(transport=HTTPTransport)
 
@@ -32,31 +34,108 @@ client = Client(transport=HTTPTransport)
 # but this seems to not work correctly from outside the job
 # https://github.com/rq/rq/issues/684
 
-KILL_KEY = "rq:jobs:kill"
+# each started job blocks on its own control list instead of polling a shared set,
+# so requests sent before the listener is ready are not lost
+KILL_KEY = "rq:jobs:kill:{}"
+KILL_LATENCY_KEY = "rq:jobs:kill:latency"
+KILL_KEY_TTL = 60 * 60 * 24
+KILL_LATENCY_HISTORY = 1000
+
+# seconds between checks of the listener stop flag
+KILL_WAIT_TIMEOUT = 5
+
+
+def kill_job(conn, job_id, action="kill"):
+    """Sends a control request to a started job
+
+    Arguments:
+        conn {redis.Redis}
+        job_id {str}
+
+    Keyword Arguments:
+        action {str} -- "kill" or "pause", paused jobs are flagged as PAUSED in their meta
+    """
+    key = KILL_KEY.format(job_id)
+    pipe = conn.pipeline()
+    pipe.rpush(key, json.dumps({"action": action, "requested_at": time.time()}))
+    pipe.expire(key, KILL_KEY_TTL)
+    pipe.execute()
+
+
+def kill_latencies(conn, count=100):
+    """Returns the most recent seconds between kill requests and job shutdowns"""
+    return [float(v) for v in conn.lrange(KILL_LATENCY_KEY, 0, count - 1)]
 
 
 class StratJob(Job):
-    def kill(self):
+    def kill(self, action="kill"):
         """ Force kills the current job causing it to fail """
         if self.is_started:
-            self.connection.sadd(KILL_KEY, self.get_id())
+            kill_job(self.connection, self.get_id(), action=action)
+
+    def _listen_for_kill(self, stop, lock):
+        # the blocking pop holds its own pooled connection while waiting
+        key = KILL_KEY.format(self.get_id())
+        while not stop.is_set():
+            item = self.connection.blpop(key, timeout=KILL_WAIT_TIMEOUT)
+            if item is None:
+                continue
+
+            # stop is set under the lock once the job has returned, a request
+            # popped after that must not interrupt the work horse
+            with lock:
+                if stop.is_set():
+                    return
+                request = json.loads(item[1])
+                self._kill_request = request
+                if request["action"] == "pause":
+                    self.meta["PAUSED"] = True
+                    self.save_meta()
+                os.kill(os.getpid(), signal.SIGINT)
+            return
+
+    def _record_kill_latency(self):
+        request = getattr(self, "_kill_request", None)
+        if request is None:
+            return
+        latency = time.time() - request["requested_at"]
+        self.meta["kill_latency"] = latency
+        self.save_meta()
+
+        pipe = self.connection.pipeline()
+        pipe.lpush(KILL_LATENCY_KEY, latency)
+        pipe.ltrim(KILL_LATENCY_KEY, 0, KILL_LATENCY_HISTORY - 1)
+        pipe.execute()
+
+    def publish_status(self, status):
+        # strategy jobs use the strat id as job id
+        msg = {"strat_id": self.get_id(), "status": status}
+        self.connection.publish(STRAT_PROGRESS_CHANNEL.format(self.get_id()), json.dumps(msg))
 
     def _execute(self):
-        def check_kill(conn, id, interval=1):
-            while True:
-                res = conn.srem(KILL_KEY, id)
-                if res > 0:
-                    os.kill(os.getpid(), signal.SIGINT)
-                time.sleep(interval)
-
-        t = Thread(target=check_kill, args=(self.connection, self.get_id()))
+        self._kill_request = None
+        stop, lock = Event(), Lock()
+        t = Thread(target=self._listen_for_kill, args=(stop, lock), daemon=True)
         t.start()
-        return super()._execute()
+        self.publish_status("started")
+        try:
+            return super()._execute()
+        finally:
+            with lock:
+                stop.set()
+            self._record_kill_latency()
+            self.connection.delete(KILL_KEY.format(self.get_id()))
 
 
 class StratQueue(Queue):
     job_class = StratJob
 
+    def enqueue_job(self, job, pipeline=None, at_front=False):
+        job = super().enqueue_job(job, pipeline=pipeline, at_front=at_front)
+        # wakes up the worker manager so it can add a slot if needed
+        self.connection.publish(ENQUEUED_CHANNEL, self.name)
+        return job
+
 
 class StratWorker(Worker):
     imminent_shutdown_delay = 20
@@ -71,6 +150,17 @@ class StratWorker(Worker):
         logger_group.add_logger(self.logger)
         setup_logging()
 
+    def perform_job(self, job, queue, *args, **kw):
+        result = super().perform_job(job, queue, *args, **kw)
+        # published once rq has saved the final status and result
+        if isinstance(job, StratJob):
+            status = job.get_status()
+            job.publish_status(status)
+            if status in ["finished", "failed"]:
+                # kept until the web app has saved the result, even if nobody watches the strategy
+                self.connection.lpush(STRAT_COMPLETED_KEY, job.get_id())
+        return result
+
     def shutdown_job(self):
         self.logger.warning("Suspending worker connection")
         suspend(self.connection)
@@ -0,0 +1,151 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logbook import Logger
+import ccxt
+import pandas as pd
+
+from kryptos import logger_group
+from kryptos.data import market_cache
+from kryptos.settings import MARKET_POLL_INTERVAL
+
+
+log = Logger("MARKET_DATA")
+logger_group.add_logger(log)
+
+
+def ccxt_pair(symbol):
+    base, quote = symbol.split("_")
+    return f"{base.upper()}/{quote.upper()}"
+
+
+# timeframes of ccxt's fetch_ohlcv, other frequencies are resampled from minute bars
+CCXT_TIMEFRAMES = {
+    pd.Timedelta(minutes=1): "1m",
+    pd.Timedelta(minutes=3): "3m",
+    pd.Timedelta(minutes=5): "5m",
+    pd.Timedelta(minutes=15): "15m",
+    pd.Timedelta(minutes=30): "30m",
+    pd.Timedelta(hours=1): "1h",
+    pd.Timedelta(hours=2): "2h",
+    pd.Timedelta(hours=4): "4h",
+    pd.Timedelta(hours=6): "6h",
+    pd.Timedelta(hours=8): "8h",
+    pd.Timedelta(hours=12): "12h",
+    pd.Timedelta(days=1): "1d",
+    pd.Timedelta(days=3): "3d",
+    pd.Timedelta(weeks=1): "1w",
+}
+
+# most exchanges return at most this many bars per request
+OHLCV_LIMIT = 1000
+
+
+def ccxt_timeframe(freq):
+    """Returns the ccxt timeframe of a catalyst frequency, None if ccxt has none"""
+    return CCXT_TIMEFRAMES.get(market_cache.freq_to_delta(freq))
+
+
+class ExchangePoller(object):
+
+    def __init__(self, exchange):
+        """Polls all subscribed pairs of one exchange through a single ccxt client
+
+        ccxt's built in rate limiter spaces out the requests, so the exchange
+        load depends on the number of distinct pairs, not of strategies.
+        """
+        self.exchange = exchange
+        self.client = getattr(ccxt, exchange)({"enableRateLimit": True})
+
+    def fetch_ohlcv(self, symbol, timeframe, delta, bar_count):
+        """Fetches the last bar_count bars of delta, over as many requests as the exchange's limit requires"""
+        if bar_count <= OHLCV_LIMIT:
+            return self.client.fetch_ohlcv(ccxt_pair(symbol), timeframe, limit=bar_count)
+
+        now = pd.Timestamp.utcnow()
+        since = int((now - delta * bar_count).value // 10 ** 6)
+        ohlcv = []
+        while len(ohlcv) < bar_count:
+            page = self.client.fetch_ohlcv(ccxt_pair(symbol), timeframe, since=since, limit=OHLCV_LIMIT)
+            if not page:
+                break
+            ohlcv.extend(page)
+            since = page[-1][0] + int(delta.value // 10 ** 6)
+            if since > now.value // 10 ** 6:
+                break
+        return ohlcv[-bar_count:]
+
+    def fetch_history(self, symbol, freq, bar_count):
+        timeframe, delta = ccxt_timeframe(freq), market_cache.freq_to_delta(freq)
+        resample = timeframe not in (self.client.timeframes or {})
+        if resample:
+            # fetch minute bars and build the requested bars from them
+            timeframe = "1m"
+            bar_count = bar_count * int(delta / pd.Timedelta(minutes=1))
+            delta = pd.Timedelta(minutes=1)
+
+        ohlcv = self.fetch_ohlcv(symbol, timeframe, delta, bar_count)
+        df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
+        df.index = pd.to_datetime(df.pop("timestamp"), unit="ms", utc=True)
+
+        if resample:
+            df = df.resample(freq, label="left", closed="left").agg(
+                {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+            ).dropna()
+
+        # catalyst labels bars by their close time
+        df.index = df.index + market_cache.freq_to_delta(freq)
+        df["price"] = df["close"]
+        return df[market_cache.HISTORY_COLUMNS]
+
+    def fetch_ticker(self, symbol):
+        ticker = self.client.fetch_ticker(ccxt_pair(symbol))
+        return {
+            "price": ticker["last"],
+            "close": ticker["close"],
+            "volume": ticker["baseVolume"],
+            "timestamp": time.time(),
+        }
+
+    def poll(self, subs):
+        for symbol in sorted({s[0] for s in subs}):
+            try:
+                market_cache.set_ticker(self.exchange, symbol, self.fetch_ticker(symbol))
+            except Exception as e:
+                log.error(f"Failed to fetch {self.exchange} {symbol} ticker")
+                log.exception(e)
+
+        for symbol, freq, bar_count in subs:
+            try:
+                df = self.fetch_history(symbol, freq, bar_count)
+                market_cache.set_history(self.exchange, symbol, freq, df)
+            except Exception as e:
+                log.error(f"Failed to fetch {self.exchange} {symbol} {freq} history")
+                log.exception(e)
+
+
+def run():
+    pollers = {}
+    with ThreadPoolExecutor() as pool:
+        while True:
+            started = time.time()
+
+            by_exchange = {}
+            for exchange, symbol, freq, bar_count in market_cache.subscriptions():
+                by_exchange.setdefault(exchange, []).append((symbol, freq, bar_count))
+
+            futures = []
+            for exchange, subs in by_exchange.items():
+                if exchange not in pollers:
+                    pollers[exchange] = ExchangePoller(exchange)
+                futures.append(pool.submit(pollers[exchange].poll, subs))
+
+            for f in futures:
+                f.result()
+
+            log.debug(f"Polled {sum(len(s) for s in by_exchange.values())} pairs, cache stats: {market_cache.stats()}")
+            time.sleep(max(MARKET_POLL_INTERVAL - (time.time() - started), 0))
+
+
+if __name__ == "__main__":
+    log.info("Starting market data service")
+    run()
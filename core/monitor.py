@@ -1,8 +1,10 @@
 import logging
-from flask import Flask
+from flask import Flask, jsonify
+import numpy as np
 import redis
 
 from kryptos.settings import REDIS_HOST, REDIS_PORT
+from kryptos.worker.worker import kill_latencies
 
 
 app = Flask(__name__)
@@ -17,6 +19,21 @@ def index():
     return 'Visitor number: {}'.format(value), 200
 
 
+@app.route('/kill_latency')
+def kill_latency():
+    """Seconds between kill requests and job shutdowns, over the recent kills"""
+    latencies = kill_latencies(redis_client, count=1000)
+    if not latencies:
+        return jsonify({'count': 0}), 200
+    return jsonify({
+        'count': len(latencies),
+        'last': latencies[0],
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95)),
+        'max': max(latencies),
+    }), 200
+
+
 @app.errorhandler(500)
 def server_error(e):
     logging.exception('An error occurred during a request.')
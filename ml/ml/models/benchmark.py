@@ -0,0 +1,77 @@
+"""Microbenchmark of the single row predict paths
+
+Compares xgboost_test/lightgbm_test (pandas frame per call) with
+TreePredictor (pre-resolved columns and reused input buffer).
+
+Usage:
+    python -m ml.models.benchmark
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from ml.models.xgb import xgboost_train, xgboost_test
+from ml.models.lgb import lightgbm_train, lightgbm_test
+from ml.models.predictor import TreePredictor
+from ml.settings import MLConfig as CONFIG
+
+
+N_TRAIN_ROWS = 2000
+N_FEATURES = 120
+N_BOOST_ROUNDS = 100
+N_CALLS = 500
+BATCH_ROWS = 8
+
+
+def _random_data():
+    rng = np.random.RandomState(17)
+    columns = ["feature_{}".format(i) for i in range(N_FEATURES)]
+    X = pd.DataFrame(rng.rand(N_TRAIN_ROWS + BATCH_ROWS, N_FEATURES), columns=columns)
+
+    if CONFIG.CLASSIFICATION_TYPE == 1:
+        y = pd.Series(rng.randn(N_TRAIN_ROWS))
+    elif CONFIG.CLASSIFICATION_TYPE == 2:
+        y = pd.Series(rng.randint(0, 2, N_TRAIN_ROWS))
+    else:
+        y = pd.Series(rng.randint(0, 3, N_TRAIN_ROWS))
+
+    return X.iloc[:N_TRAIN_ROWS], y, X.iloc[N_TRAIN_ROWS:]
+
+
+def _time_per_call(func):
+    return timeit.timeit(func, number=N_CALLS) / N_CALLS * 1e6
+
+
+def run():
+    X_train, y_train, X_test = _random_data()
+    X_row = X_test.iloc[[-1]]
+
+    models = {
+        "XGBOOST": (xgboost_train(X_train, y_train, num_boost_rounds=N_BOOST_ROUNDS), xgboost_test),
+        "LIGHTGBM": (lightgbm_train(X_train, y_train, num_boost_rounds=N_BOOST_ROUNDS), lightgbm_test),
+    }
+
+    print(f"{N_FEATURES} features, {N_BOOST_ROUNDS} rounds, {N_CALLS} calls (microseconds per call)")
+    for name, (model, test_func) in models.items():
+        predictor = TreePredictor(name, model, X_train.columns)
+
+        if not np.isclose(test_func(model, X_row), predictor.predict_one(X_row)):
+            raise AssertionError(f"{name} predictions differ between predict paths")
+
+        current = _time_per_call(lambda: test_func(model, X_row))
+        fast = _time_per_call(lambda: predictor.predict_one(X_row))
+        batch = _time_per_call(lambda: predictor.predict(X_test))
+        batch_current = _time_per_call(
+            lambda: [test_func(model, X_test.iloc[[i]]) for i in range(BATCH_ROWS)]
+        )
+
+        print(f"{name}")
+        print(f"  {name.lower()}_test, 1 row:        {current:10.1f}")
+        print(f"  TreePredictor, 1 row:        {fast:10.1f}  ({current / fast:.1f}x)")
+        print(f"  {name.lower()}_test, {BATCH_ROWS} rows:       {batch_current:10.1f}")
+        print(f"  TreePredictor, {BATCH_ROWS} rows:       {batch:10.1f}  ({batch_current / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,135 @@
+import numpy as np
+import xgboost as xgb
+
+from ml.settings import MLConfig as CONFIG
+
+
+# Max number of rows predicted in a single call without reallocating the input buffer
+MAX_BATCH_ROWS = 16
+
+
+class TreePredictor(object):
+
+    def __init__(self, name, model, columns, max_rows=MAX_BATCH_ROWS):
+        """Low latency predict path for trained XGBOOST and LIGHTGBM boosters
+
+        xgboost_test and lightgbm_test build a DMatrix from a pandas
+        frame (or go through lightgbm's pandas path) on every call,
+        which costs more than the inference itself for a single row.
+
+        The predictor copies rows into a numpy buffer of the booster's
+        dtype, in training column order, and predicts from it. The column
+        order and the buffer are kept for the predictor's later calls,
+        which only helps when one predictor serves several predictions,
+        such as a batch of rows or the loop of the microbenchmark.
+
+        Arguments:
+            name {str} -- XGBOOST or LIGHTGBM
+            model {xgb.Booster|lgb.Booster} -- trained booster
+            columns {list} -- feature columns in training order
+
+        Keyword Arguments:
+            max_rows {int} -- initial size of the input buffer (default: {MAX_BATCH_ROWS})
+        """
+        if name not in ["XGBOOST", "LIGHTGBM"]:
+            raise NotImplementedError
+
+        self.name = name
+        self.model = model
+        self.columns = list(columns)
+
+        # xgboost stores features as float32, lightgbm thresholds are doubles
+        self.dtype = np.float32 if name == "XGBOOST" else np.float64
+        self.num_iteration = getattr(model, "best_iteration", None)
+
+        self._buffer = np.empty((max_rows, len(self.columns)), dtype=self.dtype)
+        self._positions = {}
+
+    def _column_positions(self, columns):
+        """Caches the positions of the model features for an input column layout"""
+        key = tuple(columns)
+        positions = self._positions.get(key)
+        if positions is None:
+            if list(columns) == self.columns:
+                # rows already in training order can be copied as is
+                positions = slice(None)
+            else:
+                positions = columns.get_indexer(self.columns)
+                if (positions < 0).any():
+                    missing = [c for c, p in zip(self.columns, positions) if p < 0]
+                    raise KeyError(f"Missing model features: {missing}")
+            self._positions[key] = positions
+        return positions
+
+    def _fill(self, X):
+        """Copies rows of X into the input buffer in training column order
+
+        Arguments:
+            X {pandas.DataFrame|numpy.ndarray} -- rows to predict.
+                Arrays must already be in training column order.
+
+        Returns:
+            numpy.ndarray -- view of the filled buffer rows
+        """
+        if hasattr(X, "columns"):
+            values = X.values
+            positions = self._column_positions(X.columns)
+        else:
+            values = np.atleast_2d(X)
+            positions = slice(None)
+
+        n_rows = values.shape[0]
+        if n_rows > self._buffer.shape[0]:
+            self._buffer = np.empty((n_rows, len(self.columns)), dtype=self.dtype)
+
+        out = self._buffer[:n_rows]
+        out[:] = values[:, positions]
+        return out
+
+    def predict_raw(self, X):
+        """Returns the booster outputs for every row of X"""
+        data = self._fill(X)
+        if self.name == "XGBOOST":
+            dtest = xgb.DMatrix(data, missing=np.nan, nthread=1)
+            return self.model.predict(dtest, validate_features=False)
+
+        return self.model.predict(data, num_iteration=self.num_iteration)
+
+    def _to_label(self, y_pred):
+        """Applies the same post processing as xgboost_test/lightgbm_test to a row output"""
+        if CONFIG.CLASSIFICATION_TYPE == 1:
+            return y_pred
+        elif CONFIG.CLASSIFICATION_TYPE == 2:
+            if y_pred > CONFIG.THRESHOLD and y_pred <= 1.0:
+                return 1
+            elif y_pred < CONFIG.THRESHOLD and y_pred >= 0.0:
+                return 0
+            else:
+                raise ValueError('Internal Error: Value of CONFIG.CLASSIFICATION_TYPE should be 1, 2 or 3')
+        elif CONFIG.CLASSIFICATION_TYPE == 3:
+            if self.name == "LIGHTGBM":
+                return int(np.argmax(y_pred))
+            return int(y_pred)
+        else:
+            raise ValueError('Internal Error: Value of CONFIG.CLASSIFICATION_TYPE should be 1, 2 or 3')
+
+    def predict(self, X):
+        """Returns the post processed prediction of every row of X"""
+        return [self._to_label(y) for y in self.predict_raw(X)]
+
+    def predict_one(self, X):
+        """Drop-in replacement of xgboost_test/lightgbm_test for a single row"""
+        return self.predict(X)[0]
+
+
+def predict_all(predictors, X):
+    """Predicts the same rows with several models
+
+    Arguments:
+        predictors {dict} -- model name to TreePredictor
+        X {pandas.DataFrame} -- rows to predict
+
+    Returns:
+        dict -- model name to list of post processed predictions
+    """
+    return {name: p.predict(X) for name, p in predictors.items()}
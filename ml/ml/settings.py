@@ -39,6 +39,8 @@ class MLConfig(object):
 
     MIN_ROWS_TO_ML = 50 # Minimum number of rows in the dataset to apply Machine Learning
 
+    RESULTS_STORE_TTL = 60 * 60 * 24 * 7 # Seconds to keep processed rows and predictions in redis
+
     ## NORMALIZE DATA
     NORMALIZATION = {
         'enabled': True,
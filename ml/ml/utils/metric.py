@@ -4,6 +4,18 @@ from sklearn.metrics import confusion_matrix, classification_report, cohen_kappa
 
 from ml.utils import get_algo_dir
 
+
+# risk metrics computed by kryptos.analysis.utils.risk_metrics and passed in extra_results
+RISK_METRIC_LABELS = [
+    ('sharpe_ratio', 'Sharpe Ratio'),
+    ('sortino_ratio', 'Sortino Ratio'),
+    ('sharpe_ratio_benchmark', 'Sharpe Ratio (Bitcoin Benchmark)'),
+    ('sortino_ratio_benchmark', 'Sortino Ratio (Bitcoin Benchmark)'),
+    ('max_drawdown', 'Max Drawdown'),
+    ('exposure', 'Average Exposure'),
+]
+
+
 def classification_metrics(namespace, file_name, y_true, y_pred, extra_results, y_pred_proba=False):
     target_names = ['KEEP', 'UP', 'DOWN']
     algo_dir = get_algo_dir(namespace)
@@ -28,8 +40,6 @@ def classification_metrics(namespace, file_name, y_true, y_pred, extra_results,
             f.write(str(confusion_matrix(y_true, y_pred)))
             f.write('\n')
             f.write('Return Profit Percentage: {}'.format(extra_results['return_profit_pct']) + '\n')
-            f.write('Sharpe Ratio: {}'.format(extra_results['sharpe_ratio']) + '\n')
-            f.write('Sortino Ratio: {}'.format(extra_results['sortino_ratio']) + '\n')
-            f.write('Sharpe Ratio (Bitcoin Benchmark): {}'.format(extra_results['sharpe_ratio_benchmark']) + '\n')
-            f.write('Sortino Ratio (Bitcoin Benchmark): {}'.format(extra_results['sortino_ratio_benchmark']) + '\n')
+            for key, label in RISK_METRIC_LABELS:
+                f.write('{}: {}'.format(label, extra_results.get(key, '')) + '\n')
             f.close()
@@ -5,7 +5,6 @@ pd.options.mode.chained_assignment = None # Disable chained assignments
 from ml.settings import MLConfig as CONFIG
 from ml.utils.feature_engineering import add_ta_features, add_ta_features2, add_dates_features, add_utils_features, add_tsfresh_features, add_fbprophet_features
 from ml.utils import merge_two_dicts
-from ml.models import xgb
 
 def labeling_regression_data(df, data_freq, to_optimize=False):
     """Preprocessing data to resolve a regression machine learning problem.
@@ -56,6 +55,7 @@ def clean_params(params, method):
         params['max_depth'] = int(params['max_depth'])
 
     if method == 'XGBOOST':
+        from ml.models import xgb
         fixed_params_default = xgb.FIXED_PARAMS_DEFAULT
 
     elif method == 'LIGHTGBM':
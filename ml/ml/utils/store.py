@@ -0,0 +1,71 @@
+import json
+import pandas as pd
+
+from ml.settings import MLConfig as CONFIG
+
+
+class ResultsStore(object):
+
+    def __init__(self, conn, namespace, name):
+        """Append-only store of the rows processed by an ML indicator
+
+        Keeps the strategy's processed rows (df_final) and per-bar
+        predictions (df_results) in redis lists, so they don't need to be
+        sent back and forth between the strategy and the ML worker
+        at every iteration.
+
+        Each list item is a chunk of rows in pandas "split" json format.
+        Rows are appended at every calculate() call and only read
+        once by analyze().
+
+        Arguments:
+            conn {redis.Redis} -- redis connection
+            namespace {str} -- strategy id, unique to each run
+            name {str} -- model name (XGBOOST or LIGHTGBM)
+        """
+        self.conn = conn
+        self.namespace = namespace
+        self.name = name
+
+    @property
+    def final_key(self):
+        return f"ml:store:{self.namespace}:{self.name}:final"
+
+    @property
+    def results_key(self):
+        return f"ml:store:{self.namespace}:{self.name}:results"
+
+    def reset(self):
+        """Removes rows stored by a previous run with the same namespace"""
+        self.conn.delete(self.final_key, self.results_key)
+
+    def _append(self, key, df):
+        if df.empty:
+            return
+        pipe = self.conn.pipeline()
+        pipe.rpush(key, df.to_json(orient="split"))
+        pipe.expire(key, CONFIG.RESULTS_STORE_TTL)
+        pipe.execute()
+
+    def _read(self, key, columns=None):
+        index, data = [], []
+        for raw in self.conn.lrange(key, 0, -1):
+            chunk = json.loads(raw)
+            if columns is None:
+                columns = chunk["columns"]
+            index.extend(chunk["index"])
+            data.extend(chunk["data"])
+
+        return pd.DataFrame(data, index=pd.to_datetime(index, unit="ms"), columns=columns)
+
+    def append_final(self, df):
+        self._append(self.final_key, df)
+
+    def append_results(self, df):
+        self._append(self.results_key, df)
+
+    def read_final(self):
+        return self._read(self.final_key)
+
+    def read_results(self):
+        return self._read(self.results_key, columns=["pred"])
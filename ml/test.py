@@ -4,19 +4,17 @@ from worker import *
 
 # read data
 df = pd.read_csv('data/datas.csv', index_col="index", sep=',')
-df_final = pd.DataFrame()
 
 # prepare data
 df = df.to_json()
 name = 'LIGHTGBM' # 'XGBOOST' # 'LIGHTGBM'
 idx = 0
 current_datetime = pd.tslib.Timestamp('2016-03-03 00:00:00')
-df_final_json = df_final.to_json()
 data_freq = 'minute'
 hyper_params = None
 namespace = 'inventado'
 
 # calculate
-results = calculate(namespace, df, 'LIGHTGBM', idx, current_datetime, df_final_json, data_freq, hyper_params)
-results = calculate(namespace, df, 'XGBOOST', idx, current_datetime, df_final_json, data_freq, hyper_params)
+results = calculate(namespace, df, 'LIGHTGBM', idx, current_datetime, data_freq, hyper_params)
+results = calculate(namespace, df, 'XGBOOST', idx, current_datetime, data_freq, hyper_params)
 print('final')
@@ -2,7 +2,6 @@ import os
 import multiprocessing
 import time
 import sys
-import logging
 import redis
 from rq import Connection, Queue
 from rq.worker import HerokuWorker as Worker
@@ -12,17 +11,8 @@ from raven.transport.http import HTTPTransport
 from rq.contrib.sentry import register_sentry
 import pandas as pd
 
-import matplotlib
-
-matplotlib.use("agg")
-import matplotlib.pyplot as plt
-
-from ml.models.xgb import xgboost_train, xgboost_test, optimize_xgboost_params
-from ml.models.lgb import lightgbm_train, lightgbm_test, optimize_lightgbm_params
-from ml.feature_selection.xgb import xgb_embedded_feature_selection
-from ml.feature_selection.lgb import lgb_embedded_feature_selection
-from ml.feature_selection.filter import filter_feature_selection
-from ml.feature_selection.wrapper import wrapper_feature_selection
+# model, feature selection and report modules import xgboost, lightgbm, hyperopt,
+# shap and pandas-profiling, they are imported where used to keep workers starting fast
 from ml.utils.preprocessing import (
     labeling_multiclass_data,
     labeling_binary_data,
@@ -32,8 +22,7 @@ from ml.utils.preprocessing import (
     inverse_normalize_data,
 )
 from ml.utils.metric import classification_metrics
-from ml.utils.feature_exploration import visualize_model
-from ml.utils.input_data_report import profile_report
+from ml.utils.store import ResultsStore
 from ml.settings import MLConfig as CONFIG, get_from_datastore
 
 log = logbook.Logger("ML_INDICATOR")
@@ -82,10 +71,14 @@ def _optimize_hyper_params(df, name, data_freq, idx, hyper_params):
             )
 
         if name == "XGBOOST":
+            from ml.models.xgb import optimize_xgboost_params
+
             params = optimize_xgboost_params(
                 X_train_optimize, y_train_optimize, X_test_optimize[0:-1], y_test_optimize[0:-1]
             )
         elif name == "LIGHTGBM":
+            from ml.models.lgb import optimize_lightgbm_params
+
             params = optimize_lightgbm_params(
                 X_train_optimize, y_train_optimize, X_test_optimize[0:-1], y_test_optimize[0:-1]
             )
@@ -108,15 +101,24 @@ def _set_feature_selection(name, X_train, y_train, X_test, idx, hyper_params, nu
         method = CONFIG.FEATURE_SELECTION["method"]
         if method == "embedded":
             if name == "XGBOOST":
+                from ml.models.xgb import xgboost_train
+                from ml.feature_selection.xgb import xgb_embedded_feature_selection
+
                 model = xgboost_train(X_train, y_train, hyper_params, num_boost_rounds)
                 feature_selected_columns = xgb_embedded_feature_selection(model, "all", 0.8)
             elif name == "LIGHTGBM":
+                from ml.feature_selection.lgb import lgb_embedded_feature_selection
+
                 feature_selected_columns = lgb_embedded_feature_selection(X_train, y_train)
             else:
                 raise NotImplementedError
         elif method == "filter":
+            from ml.feature_selection.filter import filter_feature_selection
+
             feature_selected_columns = filter_feature_selection(X_train, y_train, 0.8)
         elif method == "wrapper":
+            from ml.feature_selection.wrapper import wrapper_feature_selection
+
             feature_selected_columns = wrapper_feature_selection(X_train, y_train, 0.4)
         else:
             raise ValueError(
@@ -126,19 +128,29 @@ def _set_feature_selection(name, X_train, y_train, X_test, idx, hyper_params, nu
     return feature_selected_columns
 
 
+# every call trains a new booster in a work horse forked for the job, so the
+# predictors are not cached, they only avoid the pandas predict path
+
+
 def lgb_train_test(X_train, y_train, X_test, hyper_params, num_boost_rounds):
+    from ml.models.lgb import lightgbm_train
+    from ml.models.predictor import TreePredictor
+
     # Train
     model = lightgbm_train(X_train, y_train, hyper_params, num_boost_rounds)
     #  Predict
-    result = lightgbm_test(model, X_test)
+    result = TreePredictor("LIGHTGBM", model, X_train.columns).predict_one(X_test)
     return model, result
 
 
 def xgb_train_test(X_train, y_train, X_test, hyper_params, num_boost_rounds):
+    from ml.models.xgb import xgboost_train
+    from ml.models.predictor import TreePredictor
+
     # Train
     model = xgboost_train(X_train, y_train, hyper_params, num_boost_rounds)
     #  Predict
-    result = xgboost_test(model, X_test)
+    result = TreePredictor("XGBOOST", model, X_train.columns).predict_one(X_test)
     return model, result
 
 
@@ -202,21 +214,29 @@ def calculate(
     name,
     idx,
     current_datetime,
-    df_final_json,
     data_freq,
     hyper_params,
     **kw,
 ):
     df_current = pd.read_json(df_current_json)
-    df_final = pd.read_json(df_final_json)
+    store = ResultsStore(CONN, namespace, name)
 
     if CONFIG.DEBUG:
         log.info(hyper_params)
         log.info(str(idx) + " - " + str(current_datetime) + " - " + str(df_current.iloc[-1].price))
         log.info("from " + str(df_current.iloc[0].name) + " - to " + str(df_current.iloc[-1].name))
 
+    # Fill store to analyze at end
+    if idx == 0:
+        store.reset()
+        store.append_final(df_current)
+    else:
+        store.append_final(df_current.iloc[[-1]])
+
     # Dataframe size is enough to apply Machine Learning
     if df_current.shape[0] > CONFIG.MIN_ROWS_TO_ML:
+        from ml.utils.feature_exploration import visualize_model
+        from ml.utils.input_data_report import profile_report
 
         profile_report(df_current, idx, namespace, name, CONFIG.PROFILING_REPORT)
         num_boost_rounds, hyper_params = _optimize_hyper_params(
@@ -261,29 +281,24 @@ def calculate(
             result = inverse_normalize_data(result, scaler_y, CONFIG.NORMALIZATION["method"])
 
         df_results = write_results_to_df(result, current_datetime)
+        store.append_results(df_results)
 
         visualize_model(model, X_train, idx, CONFIG.VISUALIZE_MODEL, namespace, name)
 
     else:
-        model_result = 0
+        result = 0
 
     buy = signals_buy(result)
     sell = signals_sell(result)
 
-    # Fill df to analyze at end
-    if idx == 0:
-        df_final = df_current
-    else:
-        df_final.loc[df_current.index[-1]] = df_current.iloc[-1]
-
     log.info(f"Result: {result}")
-    logging.info(result, df_results.to_json(), df_final.to_json(), buy, sell)
-    return result, df_results.to_json(), df_final.to_json(), buy, sell, hyper_params
+    return result, buy, sell, hyper_params
 
 
-def analyze(namespace, name, df_final_json, df_results_json, data_freq, extra_results):
-    df_final = pd.read_json(df_final_json)
-    df_results = pd.read_json(df_results_json)
+def analyze(namespace, name, data_freq, extra_results):
+    store = ResultsStore(CONN, namespace, name)
+    df_final = store.read_final()
+    df_results = store.read_results()
 
     if CONFIG.CLASSIFICATION_TYPE == 1:
         # Post processing of target column
@@ -328,35 +343,37 @@ def analyze(namespace, name, df_final_json, df_results_json, data_freq, extra_re
         )
 
 
-def manage_workers():
-    # import before starting worker to loading during worker process
-    # from kryptos.strategy import Strategy
-    # from app.extensions import jsonrpc
-    # from kryptos.utils.outputs import in_docker
+def _work(burst=False):
+    # model and feature selection modules are loaded once per worker process,
+    # the work horses forked for each job inherit them
+    import ml.models.xgb
+    import ml.models.lgb
+    import ml.models.predictor
+    import ml.feature_selection.xgb
+    import ml.feature_selection.lgb
+    import ml.feature_selection.filter
+    import ml.feature_selection.wrapper
 
-    # start main worker
     with Connection(CONN):
-        log.info("Starting initial ML worker")
-
-        backtest_worker = Worker(["ml"])
-        register_sentry(client, backtest_worker)
-        multiprocessing.Process(
-            target=backtest_worker.work, kwargs={"logging_level": "ERROR"}
-        ).start()
-
-        while True:
-            q = Queue("ml", connection=CONN)
-            required = len(q)
-            # log.info(f"{required} workers required for {q.name}")
-            for i in range(required):
-                log.info(f"Creating {q.name} worker")
-                worker = Worker([q.name])
-                register_sentry(client, worker)
-                multiprocessing.Process(
-                    target=worker.work, kwargs={"burst": True, "logging_level": "ERROR"}
-                ).start()
-
-            time.sleep(5)
+        worker = Worker(["ml"])
+        register_sentry(client, worker)
+        worker.work(burst=burst, logging_level="ERROR")
+
+
+def manage_workers():
+    # start main worker
+    log.info("Starting initial ML worker")
+    multiprocessing.Process(target=_work).start()
+
+    while True:
+        q = Queue("ml", connection=CONN)
+        required = len(q)
+        # log.info(f"{required} workers required for {q.name}")
+        for i in range(required):
+            log.info(f"Creating {q.name} worker")
+            multiprocessing.Process(target=_work, kwargs={"burst": True}).start()
+
+        time.sleep(5)
 
 
 if __name__ == "__main__":